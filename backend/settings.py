@@ -301,6 +301,91 @@ CACHES = {
     }
 }
 
+# Device data ingest
+DEVICE_DATA_MAX_BATCH_SIZE = 500  # readings accepted per batch submit request
+
+# Write-behind mode: routine readings are buffered in-process and written with
+# bulk_create; alert/tamper readings are always written immediately
+DEVICE_INGEST_WRITE_BEHIND = os.getenv("DEVICE_INGEST_WRITE_BEHIND", "False") == "True"
+DEVICE_INGEST_BUFFER = {
+    'MAX_SIZE': 5000,
+    'FLUSH_SIZE': 200,
+    'FLUSH_INTERVAL': 2.0,  # seconds
+}
+
+# Analytics response cache (in CACHES['default']); entries are keyed on data
+# versions bumped on ingest, so they stay valid until new readings arrive
+DEVICE_ANALYTICS_CACHE = {
+    'ENABLED': os.getenv("DEVICE_ANALYTICS_CACHE", "True") == "True",
+    'TIMEOUT': 60 * 60 * 24,  # seconds; safety net only
+    'CLOCK_SECONDS': 60,      # refresh rate of views with relative windows (last 24h, online)
+}
+
+# In-process Device lookup cache used by the ingest and heartbeat endpoints
+DEVICE_REGISTRY_CACHE = {
+    'MAX_ENTRIES': 10000,
+    'TTL': 300,  # seconds
+}
+
+# Expo push notifications (override EXPO_PUSH_URL to point at a local stand-in)
+EXPO_PUSH_URL = os.getenv("EXPO_PUSH_URL", "https://exp.host/--/api/v2/push/send")
+EXPO_PUSH_BATCH_SIZE = 100
+EXPO_ACCESS_TOKEN = os.getenv("EXPO_ACCESS_TOKEN")
+
+# Notification outbox: when enabled, ingest only records notifications and
+# `manage.py dispatch_notifications` delivers them (WebSocket + push)
+NOTIFICATION_OUTBOX_ENABLED = os.getenv("NOTIFICATION_OUTBOX_ENABLED", "False") == "True"
+NOTIFICATION_OUTBOX = {
+    'BATCH_SIZE': 50,
+    'MAX_ATTEMPTS': 8,
+    'BACKOFF_BASE': 5,  # seconds, doubled per attempt
+    'BACKOFF_MAX': 900,
+    'LEASE_SECONDS': 300,
+}
+
+# Optional monthly partitioning of DeviceData (Postgres). Convert once with
+# `manage.py manage_partitions --convert`, then run `manage.py manage_partitions` daily
+DEVICE_DATA_PARTITIONS = {
+    'MONTHS_AHEAD': 3,
+    'RETENTION_MONTHS': None,  # keep everything
+    'DROP_EXPIRED': False,  # detach expired months instead of dropping them
+}
+
+# Retention (days, None = keep forever), applied by `manage.py apply_retention`.
+# Analytics read the rollups for anything older than RAW_DAYS.
+DEVICE_DATA_RETENTION = {
+    'RAW_DAYS': None,
+    'HOURLY_DAYS': None,
+    'DAILY_DAYS': None,
+    'BATCH_SIZE': 5000,
+    'BATCH_PAUSE': 0.0,  # seconds between delete batches
+}
+
+# Notification retention per type (days; types not listed are kept forever),
+# applied by `manage.py purge_notifications`. With 'read_only', unread
+# notifications of that type are kept regardless of age.
+NOTIFICATION_RETENTION = {
+    'RULES': {
+        'info': {'days': 7, 'read_only': True},
+        'success': {'days': 7, 'read_only': True},
+        'critical': {'days': 90},
+    },
+    'BATCH_SIZE': 1000,
+    'BATCH_PAUSE': 0.0,  # seconds between delete batches
+}
+
+# Chunked background deletes (clear-all notifications, device deletion),
+# run by a `manage.py run_background_jobs` worker. Deployments without a
+# worker (Vercel, see vercel.json) set BACKGROUND_JOBS_INLINE=True to run
+# each job inside the request that queues it.
+BACKGROUND_JOBS = {
+    'CHUNK_SIZE': 5000,
+    'CHUNK_PAUSE': 0.0,  # seconds between chunks
+    'LEASE_SECONDS': 300,
+    'MAX_ATTEMPTS': 5,
+    'RUN_INLINE': os.getenv("BACKGROUND_JOBS_INLINE", "False") == "True",
+}
+
 # If you want to use Redis-backed sessions:
 SESSION_ENGINE = "django.contrib.sessions.backends.cache"
 SESSION_CACHE_ALIAS = "default"
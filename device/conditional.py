@@ -0,0 +1,63 @@
+import functools
+import hashlib
+import logging
+
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+
+logger = logging.getLogger(__name__)
+
+
+def make_etag(request, *parts):
+    """Strong ETag for a representation of `request` built from `parts` (e.g. data versions)"""
+    raw = repr((request.get_full_path(), parts))
+    return quote_etag(hashlib.md5(raw.encode('utf-8')).hexdigest())
+
+
+def not_modified(request, etag):
+    """A 304 response if the request's If-None-Match matches `etag`, else None"""
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        tag_response(response, etag)
+    return response
+
+
+def tag_response(response, etag):
+    response['ETag'] = etag
+    # Clients may keep the body but must revalidate it; shared caches must not store it
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def conditional_get(version_func):
+    """
+    ETag support for a function-based GET view. `version_func(request, *args,
+    **kwargs)` returns the cheap version parts the response is derived from; a
+    matching If-None-Match is answered with 304 before the view runs. Apply it
+    below @api_view/@permission_classes so authentication runs first.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+
+            try:
+                # Read before the view runs, so a change made meanwhile can only make the tag older
+                versions = version_func(request, *args, **kwargs)
+            except Exception as e:
+                logger.warning(f"Could not compute ETag: {str(e)}")
+                return view(request, *args, **kwargs)
+
+            etag = make_etag(request, *versions)
+            response = not_modified(request, etag)
+            if response is not None:
+                return response
+
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200:
+                tag_response(response, etag)
+            return response
+
+        return wrapper
+    return decorator
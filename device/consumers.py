@@ -62,6 +62,7 @@ from urllib.parse import parse_qs
 from rest_framework_simplejwt.tokens import AccessToken
 from django.contrib.auth import get_user_model
 from .models import Device, Notification
+from .services.recipients import user_group
 
 User = get_user_model()
 
@@ -80,7 +81,7 @@ class NotificationConsumer(AsyncWebsocketConsumer):
                 self.user = await self.get_user(user_id)
                 
                 if self.user and not isinstance(self.user, AnonymousUser):
-                    self.group_name = f'notifications_{self.user.id}'
+                    self.group_name = user_group(self.user.id)
                     
                     # Join user-specific notification group
                     await self.channel_layer.group_add(
@@ -125,11 +126,8 @@ class NotificationConsumer(AsyncWebsocketConsumer):
             pass
 
     async def notification_message(self, event):
-        # Send notification to WebSocket
-        await self.send(text_data=json.dumps({
-            'type': 'notification',
-            'content': event['content']
-        }))
+        # Send notification to WebSocket; the sender pre-serializes the frame once for all recipients
+        await self.send(text_data=event['text'])
 
     @database_sync_to_async
     def get_user(self, user_id):
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from device.services.retention import purge_expired, retention_settings
+
+
+class Command(BaseCommand):
+    help = ("Expire raw readings and reading rollups per DEVICE_DATA_RETENTION. Deletes in small batches; "
+            "safe to interrupt and re-run")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--raw-days', type=int, help="Days of raw DeviceData to keep")
+        parser.add_argument('--hourly-days', type=int, help="Days of hourly rollups to keep")
+        parser.add_argument('--daily-days', type=int, help="Days of daily rollups to keep")
+        parser.add_argument('--batch-size', type=int, help="Rows deleted per statement")
+        parser.add_argument('--pause', type=float, help="Seconds to sleep between batches")
+        parser.add_argument('--dry-run', action='store_true', help="Only report how many rows are due")
+
+    def handle(self, *args, **options):
+        overrides = {
+            'RAW_DAYS': options['raw_days'],
+            'HOURLY_DAYS': options['hourly_days'],
+            'DAILY_DAYS': options['daily_days'],
+            'BATCH_SIZE': options['batch_size'],
+            'BATCH_PAUSE': options['pause'],
+        }
+        config = {**retention_settings(), **{key: value for key, value in overrides.items() if value is not None}}
+
+        # Rollups serve the ranges raw readings no longer cover, so they must outlive them
+        raw_days = config['RAW_DAYS']
+        for tier in ('HOURLY_DAYS', 'DAILY_DAYS'):
+            if raw_days is not None and config[tier] is not None and config[tier] < raw_days:
+                raise CommandError(f"{tier} ({config[tier]}) must not be shorter than RAW_DAYS ({raw_days})")
+        if config['BATCH_SIZE'] < 1:
+            raise CommandError("--batch-size must be at least 1")
+
+        result = purge_expired(config, dry_run=options['dry_run'])
+        if not result:
+            self.stdout.write("No retention configured; nothing to do")
+            return
+
+        for name in result.pop('raw_partitions', []):
+            self.stdout.write(f"Dropped partition {name}")
+        verb = "due for deletion" if options['dry_run'] else "deleted"
+        for tier, count in result.items():
+            self.stdout.write(f"{tier}: {count} rows {verb}")
+        self.stdout.write(self.style.SUCCESS("Retention applied" if not options['dry_run'] else "Dry run complete"))
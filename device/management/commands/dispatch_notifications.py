@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from device.services.outbox import dispatch_pending, outbox_settings
+
+
+class Command(BaseCommand):
+    help = "Deliver queued notifications from the outbox (WebSocket + Expo push), with retries and backoff"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Process due rows until none are left, then exit")
+        parser.add_argument('--batch-size', type=int, default=None, help="Rows claimed per batch")
+        parser.add_argument('--poll-interval', type=float, default=1.0, help="Seconds to sleep when the outbox is empty")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size'] or outbox_settings()['BATCH_SIZE']
+        self.stdout.write(f"Dispatching notifications (batch size {batch_size})")
+
+        try:
+            while True:
+                close_old_connections()
+                delivered, not_delivered = dispatch_pending(batch_size)
+                if delivered or not_delivered:
+                    self.stdout.write(f"Delivered {delivered}, rescheduled/failed {not_delivered}")
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping notification dispatcher")
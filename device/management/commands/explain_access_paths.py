@@ -0,0 +1,81 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from device.models import Device, DeviceData, Notification
+
+# Indexes added for these access paths (migration 0014)
+ACCESS_PATH_INDEXES = [
+    'devicedata_device_ts_idx',
+    'devicedata_ts_brin',
+    'notif_priority_created_idx',
+    'notif_unread_created_idx',
+]
+
+
+class Command(BaseCommand):
+    help = "EXPLAIN the queries behind the analytics/notification views, optionally with and without their indexes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--device', type=int, help="Device id for the per-device queries (default: the busiest)")
+        parser.add_argument('--analyze', action='store_true', help="Run EXPLAIN ANALYZE (executes the queries)")
+        parser.add_argument('--compare', action='store_true',
+                            help="Also plan each query with the access-path indexes dropped inside a rolled-back "
+                                 "transaction (takes an exclusive lock on the tables while it runs)")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError("explain_access_paths needs PostgreSQL")
+
+        device_id = options['device'] or self._busiest_device()
+        if device_id is None:
+            raise CommandError("No devices to benchmark against")
+
+        explain_options = {'analyze': True, 'buffers': True} if options['analyze'] else {}
+        queries = self._queries(device_id)
+
+        for label, queryset in queries:
+            self.stdout.write(self.style.MIGRATE_HEADING(label))
+            self.stdout.write(self.style.SUCCESS("-- with indexes"))
+            self.stdout.write(queryset.explain(**explain_options))
+            if options['compare']:
+                self.stdout.write(self.style.WARNING("-- without access-path indexes"))
+                self.stdout.write(self._explain_without_indexes(queryset, explain_options))
+            self.stdout.write("")
+
+    def _busiest_device(self):
+        busiest = (
+            DeviceData.objects.values('device_id')
+            .annotate(readings=Count('id'))
+            .order_by('-readings')
+            .values_list('device_id', flat=True)
+            .first()
+        )
+        return busiest or Device.objects.order_by('id').values_list('id', flat=True).first()
+
+    def _queries(self, device_id):
+        now = timezone.now()
+        readings = DeviceData.objects.filter(device_id=device_id)
+        return [
+            ("Latest reading for a device", readings.order_by('-timestamp')[:1]),
+            ("Device history page", readings.order_by('-timestamp')[:100]),
+            ("Device readings in the last 7 days", readings.filter(timestamp__gte=now - timedelta(days=7)).values('id')),
+            ("Fleet readings in the last 24 hours",
+             DeviceData.objects.filter(timestamp__gte=now - timedelta(hours=24)).values('id')),
+            ("Notifications by priority", Notification.objects.all()[:50]),
+            ("Unread notifications", Notification.objects.filter(is_read=False).order_by('-created_at')[:50]),
+            ("Unread notification count", Notification.objects.filter(is_read=False).values('id')),
+        ]
+
+    def _explain_without_indexes(self, queryset, explain_options):
+        quote = connection.ops.quote_name
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                for name in ACCESS_PATH_INDEXES:
+                    cursor.execute(f"DROP INDEX IF EXISTS {quote(name)}")
+            plan = queryset.explain(**explain_options)
+            transaction.set_rollback(True)
+        return plan
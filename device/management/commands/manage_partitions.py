@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from device.services.partitions import (
+    convert_to_partitioned, ensure_partitions, expire_partitions, is_partitioned, list_partitions,
+    partition_settings,
+)
+
+
+class Command(BaseCommand):
+    help = "Manage monthly DeviceData partitions: create upcoming months, detach or drop expired ones"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--convert', action='store_true',
+                            help="Convert the plain DeviceData table to a partitioned one first (locks the table)")
+        parser.add_argument('--months-ahead', type=int, default=None, help="Future months to create ahead of time")
+        parser.add_argument('--retention-months', type=int, default=None,
+                            help="Whole months kept before the current one; older partitions expire")
+        parser.add_argument('--drop', action='store_true', help="Drop expired partitions instead of detaching them")
+        parser.add_argument('--list', action='store_true', help="Only list the attached partitions")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError("DeviceData partitioning needs PostgreSQL")
+
+        if options['convert']:
+            self.stdout.write("Converting DeviceData to a partitioned table...")
+            copied = convert_to_partitioned(options['months_ahead'])
+            self.stdout.write(self.style.SUCCESS(f"Copied {copied} readings into monthly partitions"))
+        elif not is_partitioned():
+            raise CommandError("DeviceData is not partitioned; run with --convert first")
+
+        if options['list']:
+            for month, name in list_partitions():
+                self.stdout.write(f"{month:%Y-%m}  {name}")
+            return
+
+        for name in ensure_partitions(options['months_ahead']):
+            self.stdout.write(f"Created {name}")
+
+        config = partition_settings()
+        retention_months = options['retention_months']
+        if retention_months is None:
+            retention_months = config['RETENTION_MONTHS']
+        drop = options['drop'] or config['DROP_EXPIRED']
+        for name in expire_partitions(retention_months, drop):
+            self.stdout.write(f"{'Dropped' if drop else 'Detached'} {name}")
+
+        self.stdout.write(self.style.SUCCESS(f"{len(list_partitions())} monthly partition(s) attached"))
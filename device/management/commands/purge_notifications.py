@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from device.services.notification_retention import (
+    notification_retention_settings, purge_notifications, rule_errors
+)
+
+
+class Command(BaseCommand):
+    help = ("Delete notifications older than their type's NOTIFICATION_RETENTION rule. Deletes in small "
+            "batches without table locks; safe to run every few minutes and to interrupt")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help="Rows deleted per statement")
+        parser.add_argument('--pause', type=float, help="Seconds to sleep between batches")
+        parser.add_argument('--dry-run', action='store_true', help="Only report how many notifications are due")
+
+    def handle(self, *args, **options):
+        overrides = {
+            'BATCH_SIZE': options['batch_size'],
+            'BATCH_PAUSE': options['pause'],
+        }
+        config = {**notification_retention_settings(), **{key: value for key, value in overrides.items() if value is not None}}
+
+        errors = rule_errors(config['RULES'])
+        if errors:
+            raise CommandError("Invalid NOTIFICATION_RETENTION rules: " + "; ".join(errors))
+        if config['BATCH_SIZE'] < 1:
+            raise CommandError("--batch-size must be at least 1")
+
+        result = purge_notifications(config, dry_run=options['dry_run'])
+        if not result:
+            self.stdout.write("No notification retention configured; nothing to do")
+            return
+
+        verb = "due for deletion" if options['dry_run'] else "deleted"
+        for notification_type, count in result.items():
+            self.stdout.write(f"{notification_type}: {count} notifications {verb}")
+        self.stdout.write(self.style.SUCCESS("Retention applied" if not options['dry_run'] else "Dry run complete"))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from device.models import Device
+from device.services.device_state import rebuild_device_state
+
+
+class Command(BaseCommand):
+    help = "Rebuild the DeviceState latest-reading table from DeviceData history"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--device', type=int, action='append', dest='devices',
+                            help="Only rebuild this device id (repeatable)")
+
+    def handle(self, *args, **options):
+        device_ids = options['devices'] or list(Device.objects.order_by('id').values_list('id', flat=True))
+        rebuilt = rebuild_device_state(device_ids)
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt state for {rebuilt} device(s); {len(device_ids) - rebuilt} without readings"
+        ))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from device.services.notification_counters import rebuild_notification_counters, unread_counts
+
+
+class Command(BaseCommand):
+    help = "Rebuild the unread NotificationCounter table from the Notification table"
+
+    def handle(self, *args, **options):
+        rebuilt = rebuild_notification_counters()
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {rebuilt} counter(s); {unread_counts()['count']} unread notification(s)"
+        ))
@@ -0,0 +1,41 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from device.models import Device
+from device.services.rollups import rebuild_rollups, rebuild_start
+
+
+class Command(BaseCommand):
+    help = "Rebuild the hourly and daily reading rollups from DeviceData history"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--device', type=int, action='append', dest='devices',
+                            help="Only rebuild this device id (repeatable)")
+        parser.add_argument('--since', help="Only rebuild buckets from this UTC date (YYYY-MM-DD)")
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = date.fromisoformat(options['since'])
+            except ValueError:
+                raise CommandError("--since must be a date in YYYY-MM-DD format")
+
+        start = rebuild_start(since)
+        if start != since:
+            self.stdout.write(self.style.WARNING(
+                f"Raw readings before {start} are past retention; keeping the rollups older than that"
+            ))
+
+        device_ids = options['devices'] or list(Device.objects.order_by('id').values_list('id', flat=True))
+        hourly_total = daily_total = 0
+        for device_id in device_ids:
+            hourly, daily = rebuild_rollups(device_id, since)
+            hourly_total += hourly
+            daily_total += daily
+            self.stdout.write(f"Device {device_id}: {hourly} hourly, {daily} daily buckets")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {hourly_total} hourly and {daily_total} daily buckets for {len(device_ids)} device(s)"
+        ))
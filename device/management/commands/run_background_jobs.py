@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from device.services.jobs import run_pending_job
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs (clearing notifications, deleting devices) in chunks, resuming interrupted ones"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Run due jobs until none are left, then exit")
+        parser.add_argument('--poll-interval', type=float, default=2.0, help="Seconds to sleep when no job is queued")
+
+    def handle(self, *args, **options):
+        self.stdout.write("Running background jobs")
+
+        try:
+            while True:
+                close_old_connections()
+                job = run_pending_job()
+                if job is not None:
+                    self.stdout.write(f"Job #{job.pk} {job.kind}: {job.status} {job.progress}")
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping background job runner")
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.1 on 2026-10-17 19:17
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('device', '0009_alter_notification_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='devicedata',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
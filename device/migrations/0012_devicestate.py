@@ -0,0 +1,29 @@
+# Generated by Django 5.2.1 on 2026-10-17 19:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('device', '0011_notificationoutbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeviceState',
+            fields=[
+                ('device', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='state', serialize=False, to='device.device')),
+                ('alert', models.CharField(max_length=20)),
+                ('count', models.IntegerField()),
+                ('refer_val', models.IntegerField()),
+                ('tamper', models.CharField(max_length=10)),
+                ('timestamp', models.DateTimeField(help_text='Timestamp of the latest reading')),
+                ('status', models.CharField(choices=[('critical', 'Critical'), ('tamper', 'Tamper'), ('low', 'Low'), ('medium', 'Medium'), ('high', 'High'), ('normal', 'Normal')], default='normal', max_length=20)),
+                ('first_timestamp', models.DateTimeField(help_text='Timestamp of the first reading')),
+                ('last_status_change', models.DateTimeField(blank=True, help_text='Timestamp of the latest reading if its alert/tamper differ from the reading before it', null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.1 on 2026-10-17 19:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('device', '0012_devicestate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyReadingRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('low', models.PositiveIntegerField(default=0)),
+                ('medium', models.PositiveIntegerField(default=0)),
+                ('high', models.PositiveIntegerField(default=0)),
+                ('tamper', models.PositiveIntegerField(default=0)),
+                ('critical', models.PositiveIntegerField(default=0, help_text='LOW alert and tamper in the same reading')),
+                ('bucket', models.DateField(help_text='UTC date')),
+                ('device', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='device.device')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('device', 'bucket'), name='daily_rollup_device_bucket_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='HourlyReadingRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('low', models.PositiveIntegerField(default=0)),
+                ('medium', models.PositiveIntegerField(default=0)),
+                ('high', models.PositiveIntegerField(default=0)),
+                ('tamper', models.PositiveIntegerField(default=0)),
+                ('critical', models.PositiveIntegerField(default=0, help_text='LOW alert and tamper in the same reading')),
+                ('bucket', models.DateTimeField(help_text='Start of the hour (UTC)')),
+                ('device', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='device.device')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('device', 'bucket'), name='hourly_rollup_device_bucket_uniq')],
+            },
+        ),
+    ]
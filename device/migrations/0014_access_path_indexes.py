@@ -0,0 +1,33 @@
+# Generated by Django 5.2.1 on 2026-10-17 19:28
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Build the indexes without locking out ingest writes on existing tables
+    atomic = False
+
+    dependencies = [
+        ('device', '0013_reading_rollups'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='devicedata',
+            index=models.Index(fields=['device', '-timestamp'], name='devicedata_device_ts_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='devicedata',
+            index=django.contrib.postgres.indexes.BrinIndex(fields=['timestamp'], name='devicedata_ts_brin'),
+        ),
+        AddIndexConcurrently(
+            model_name='notification',
+            index=models.Index(fields=['-priority', '-created_at'], name='notif_priority_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('is_read', False)), fields=['-created_at'], name='notif_unread_created_idx'),
+        ),
+    ]
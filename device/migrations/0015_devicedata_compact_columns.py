@@ -0,0 +1,35 @@
+# Generated by Django 5.2.1 on 2026-10-17 20:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """
+    Expand step of the compact DeviceData schema: new columns with constant
+    database defaults, which Postgres adds without rewriting the table and
+    which fill them in for rows the previous release still inserts without
+    them. The database defaults go away again in 0017.
+    Backfilled by 0016, old columns dropped by 0017.
+    """
+
+    dependencies = [
+        ('device', '0014_access_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='devicedata',
+            name='alert_code',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'Other'), (1, 'LOW'), (2, 'MEDIUM'), (3, 'HIGH')], default=0, db_default=0),
+        ),
+        migrations.AddField(
+            model_name='devicedata',
+            name='alert_text',
+            field=models.CharField(blank=True, default='', db_default='', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='devicedata',
+            name='tamper_flag',
+            field=models.BooleanField(default=False, db_default=False),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.1 on 2026-10-17 20:05
+
+from django.db import migrations, transaction
+
+BATCH_SIZE = 10000
+
+BACKFILL_SQL = """
+    UPDATE {table} SET
+        alert_code = CASE alert WHEN 'LOW' THEN 1 WHEN 'MEDIUM' THEN 2 WHEN 'HIGH' THEN 3 ELSE 0 END,
+        alert_text = CASE WHEN alert IN ('LOW', 'MEDIUM', 'HIGH') THEN '' ELSE COALESCE(alert, '') END,
+        tamper_flag = (tamper = 'true')
+    WHERE id >= %s AND id < %s
+"""
+
+
+def backfill(apps, schema_editor):
+    """
+    Copy alert/tamper into the compact columns in id ranges of BATCH_SIZE,
+    each committed on its own so ingest keeps writing while this runs. Rows
+    inserted meanwhile are picked up by re-reading max(id) until caught up.
+    """
+    DeviceData = apps.get_model('device', 'DeviceData')
+    connection = schema_editor.connection
+    table = connection.ops.quote_name(DeviceData._meta.db_table)
+    sql = BACKFILL_SQL.format(table=table)
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT min(id), max(id) FROM {table}")
+        low, high = cursor.fetchone()
+        if low is None:
+            return
+        while True:
+            while low <= high:
+                with transaction.atomic(using=connection.alias):
+                    cursor.execute(sql, [low, low + BATCH_SIZE])
+                low += BATCH_SIZE
+            cursor.execute(f"SELECT max(id) FROM {table}")
+            latest = cursor.fetchone()[0]
+            if latest is None or latest < low:
+                return
+            high = latest
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('device', '0015_devicedata_compact_columns'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
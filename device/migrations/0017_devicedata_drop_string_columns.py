@@ -0,0 +1,98 @@
+# Generated by Django 5.2.1 on 2026-10-17 20:05
+
+from django.db import migrations, models
+
+CATCH_UP_SQL = """
+    UPDATE {table} SET
+        alert_code = CASE alert WHEN 'LOW' THEN 1 WHEN 'MEDIUM' THEN 2 WHEN 'HIGH' THEN 3 ELSE 0 END,
+        alert_text = CASE WHEN alert IN ('LOW', 'MEDIUM', 'HIGH') THEN '' ELSE COALESCE(alert, '') END,
+        tamper_flag = (tamper = 'true')
+    WHERE id > COALESCE(
+        (SELECT max(id) FROM {table} WHERE alert_code <> 0 OR alert_text <> '' OR tamper_flag), 0
+    )
+"""
+
+RESTORE_SQL = """
+    UPDATE {table} SET
+        alert = CASE alert_code WHEN 1 THEN 'LOW' WHEN 2 THEN 'MEDIUM' WHEN 3 THEN 'HIGH' ELSE alert_text END,
+        tamper = CASE WHEN tamper_flag THEN 'true' ELSE 'false' END
+"""
+
+
+def catch_up(apps, schema_editor):
+    """Backfill rows written after 0016 finished, with writers blocked until the columns are swapped"""
+    DeviceData = apps.get_model('device', 'DeviceData')
+    connection = schema_editor.connection
+    table = connection.ops.quote_name(DeviceData._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(f"LOCK TABLE {table} IN SHARE MODE")
+        cursor.execute(CATCH_UP_SQL.format(table=table))
+
+
+def restore_strings(apps, schema_editor):
+    DeviceData = apps.get_model('device', 'DeviceData')
+    connection = schema_editor.connection
+    table = connection.ops.quote_name(DeviceData._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(RESTORE_SQL.format(table=table))
+
+
+class Migration(migrations.Migration):
+    """Contract step: drop the string columns and switch DeviceState.tamper to a boolean"""
+
+    dependencies = [
+        ('device', '0016_backfill_devicedata_compact_columns'),
+    ]
+
+    operations = [
+        migrations.RunPython(catch_up, restore_strings),
+        # Defaults only so that unapplying can re-add the columns to existing rows
+        migrations.AlterField(
+            model_name='devicedata',
+            name='alert',
+            field=models.CharField(default='', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='devicedata',
+            name='tamper',
+            field=models.CharField(default='false', max_length=10),
+        ),
+        migrations.RemoveField(
+            model_name='devicedata',
+            name='alert',
+        ),
+        migrations.RemoveField(
+            model_name='devicedata',
+            name='tamper',
+        ),
+        migrations.RenameField(
+            model_name='devicedata',
+            old_name='tamper_flag',
+            new_name='tamper',
+        ),
+        # Every writer sets the compact columns now; drop the expand-step database defaults
+        migrations.AlterField(
+            model_name='devicedata',
+            name='alert_code',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'Other'), (1, 'LOW'), (2, 'MEDIUM'), (3, 'HIGH')], default=0),
+        ),
+        migrations.AlterField(
+            model_name='devicedata',
+            name='alert_text',
+            field=models.CharField(blank=True, default='', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='devicedata',
+            name='tamper',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunSQL(
+            "UPDATE device_devicestate SET tamper = CASE WHEN tamper = 'true' THEN 'true' ELSE 'false' END",
+            migrations.RunSQL.noop,
+        ),
+        migrations.AlterField(
+            model_name='devicestate',
+            name='tamper',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.1 on 2026-10-17 19:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('device', '0017_devicedata_drop_string_columns'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='devicedata',
+            index=models.Index(fields=['-timestamp', '-id'], name='devicedata_ts_id_idx'),
+        ),
+    ]
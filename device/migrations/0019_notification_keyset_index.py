@@ -0,0 +1,20 @@
+# Generated by Django 5.2.1 on 2026-10-17 21:05
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Build the index without locking out notification writes
+    atomic = False
+
+    dependencies = [
+        ('device', '0018_devicedata_keyset_index'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='notification',
+            index=models.Index(fields=['-created_at', '-id'], name='notif_created_id_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.1 on 2026-10-17 20:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_counters(apps, schema_editor):
+    Notification = apps.get_model('device', 'Notification')
+    NotificationCounter = apps.get_model('device', 'NotificationCounter')
+    rows = (
+        Notification.objects.filter(is_read=False)
+        .values('device_id', 'notification_type').annotate(unread=Count('id')).order_by()
+    )
+    NotificationCounter.objects.bulk_create([NotificationCounter(**row) for row in rows], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('device', '0019_notification_keyset_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('notification_type', models.CharField(max_length=20)),
+                ('unread', models.IntegerField(default=0)),
+                ('device', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='device.device')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('device', 'notification_type'), name='notif_counter_device_type_uniq')],
+            },
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.1 on 2026-10-17 20:25
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Serves the purge_notifications scan by (notification_type, created_at);
+    # built concurrently because the table keeps taking alerts meanwhile
+    atomic = False
+
+    dependencies = [
+        ('device', '0021_background_jobs'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='notification',
+            index=models.Index(fields=['notification_type', 'created_at'], name='notif_type_created_idx'),
+        ),
+    ]
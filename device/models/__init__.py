@@ -1,8 +1,14 @@
 # device/models/__init__.py
 
 from .device import Device
-from .device_data import DeviceData
+from .device_data import DeviceData, AlertLevel
 from .notification import Notification
+from .notification_counter import NotificationCounter
 from .push_token import ExpoPushToken
+from .outbox import NotificationOutbox
+from .device_state import DeviceState
+from .rollups import HourlyReadingRollup, DailyReadingRollup
+from .background_job import BackgroundJob
 
-__all__ = ['Device', 'DeviceData', 'Notification', 'ExpoPushToken']
+__all__ = ['Device', 'DeviceData', 'AlertLevel', 'Notification', 'NotificationCounter', 'ExpoPushToken',
+           'NotificationOutbox', 'DeviceState', 'HourlyReadingRollup', 'DailyReadingRollup', 'BackgroundJob']
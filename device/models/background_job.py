@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.db import models
+
+
+class BackgroundJob(models.Model):
+    """
+    A long-running delete (clearing notifications, removing a device with its
+    history) requested over HTTP and carried out by `manage.py run_background_jobs`
+    in primary-key-ordered chunks. `step` and `progress` are saved with every
+    chunk, so a job picked up again after a crash carries on where it stopped.
+    """
+    KIND_CHOICES = [
+        ('clear_notifications', 'Clear notifications'),
+        ('delete_device', 'Delete device'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=40, choices=KIND_CHOICES)
+    params = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    step = models.PositiveSmallIntegerField(default=0, help_text="Index of the step being worked on")
+    progress = models.JSONField(default=dict, blank=True, help_text="Rows deleted so far, per step")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default='')
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'id'], name='bgjob_status_id_idx'),
+        ]
+
+    def __str__(self):
+        return f"Job #{self.id} {self.kind} ({self.status})"
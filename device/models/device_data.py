@@ -1,5 +1,7 @@
 # device_data.py
+from django.contrib.postgres.indexes import BrinIndex
 from django.db import models
+from django.utils import timezone
 from .device import Device   # << Add this line
 # other imports if needed
 
@@ -16,13 +18,63 @@ from .device import Device   # << Add this line
 
 
 
+class AlertLevel(models.IntegerChoices):
+    """Alert levels reported by the dispensers, stored as a small integer"""
+    OTHER = 0, 'Other'
+    LOW = 1, 'LOW'
+    MEDIUM = 2, 'MEDIUM'
+    HIGH = 3, 'HIGH'
+
+    @classmethod
+    def parse(cls, value):
+        """Return (code, text) for an alert string; text is only kept for unknown values"""
+        for level in (cls.LOW, cls.MEDIUM, cls.HIGH):
+            if value == level.label:
+                return level, ''
+        return cls.OTHER, '' if value is None else str(value)
+
+    @classmethod
+    def to_string(cls, code, text):
+        """Inverse of parse(): the alert string for a stored (code, text) pair"""
+        return text if code == cls.OTHER else cls(code).label
+
+
 class DeviceData(models.Model):
     device = models.ForeignKey(Device, on_delete=models.CASCADE)
-    timestamp = models.DateTimeField(auto_now_add=True)
-    alert = models.CharField(max_length=20)
+    # Stamped when the reading is built (not when it is written) so buffered
+    # readings keep their arrival time
+    timestamp = models.DateTimeField(default=timezone.now)
+    # The alert string is split into a code and, for values outside
+    # AlertLevel only, the original text; read and write it through `alert`
+    alert_code = models.PositiveSmallIntegerField(choices=AlertLevel.choices, default=AlertLevel.OTHER)
+    alert_text = models.CharField(max_length=20, blank=True, default='')
     count = models.IntegerField()
     refer_val = models.IntegerField()
-    tamper = models.CharField(max_length=10)
+    tamper = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            # Per-device history/latest reading and per-device time ranges
+            models.Index(fields=['device', '-timestamp'], name='devicedata_device_ts_idx'),
+            # Keyset pagination over all readings, newest first
+            models.Index(fields=['-timestamp', '-id'], name='devicedata_ts_id_idx'),
+            # Fleet-wide time ranges; rows arrive roughly in timestamp order so
+            # a BRIN index stays tiny compared to a B-tree
+            BrinIndex(fields=['timestamp'], name='devicedata_ts_brin'),
+        ]
+
+    @property
+    def alert(self):
+        return AlertLevel.to_string(self.alert_code, self.alert_text)
+
+    @alert.setter
+    def alert(self, value):
+        self.alert_code, self.alert_text = AlertLevel.parse(value)
+
+    @property
+    def tamper_text(self):
+        """Tamper flag as the "true"/"false" string the API has always returned"""
+        return 'true' if self.tamper else 'false'
 
     def __str__(self):
         return f"{self.device.name} @ {self.timestamp}"
\ No newline at end of file
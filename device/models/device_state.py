@@ -0,0 +1,50 @@
+from django.db import models
+from .device import Device
+
+
+def derive_status(alert, tamper):
+    """Current status of a dispenser from its latest alert string and tamper flag"""
+    if tamper and alert == "LOW":
+        return "critical"
+    if tamper:
+        return "tamper"
+    if alert == "LOW":
+        return "low"
+    if alert == "MEDIUM":
+        return "medium"
+    if alert == "HIGH":
+        return "high"
+    return "normal"
+
+
+class DeviceState(models.Model):
+    """
+    Latest reading of each device, upserted on every ingest so status views
+    read one row per device instead of scanning DeviceData.
+    Rebuild from history with `manage.py rebuild_device_state`.
+    """
+    STATUS_CHOICES = [
+        ('critical', 'Critical'),
+        ('tamper', 'Tamper'),
+        ('low', 'Low'),
+        ('medium', 'Medium'),
+        ('high', 'High'),
+        ('normal', 'Normal'),
+    ]
+
+    device = models.OneToOneField(Device, on_delete=models.CASCADE, primary_key=True, related_name='state')
+    alert = models.CharField(max_length=20)
+    count = models.IntegerField()
+    refer_val = models.IntegerField()
+    tamper = models.BooleanField(default=False)
+    timestamp = models.DateTimeField(help_text="Timestamp of the latest reading")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='normal')
+    first_timestamp = models.DateTimeField(help_text="Timestamp of the first reading")
+    last_status_change = models.DateTimeField(
+        null=True, blank=True,
+        help_text="Timestamp of the latest reading if its alert/tamper differ from the reading before it"
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.device} is {self.status} @ {self.timestamp}"
@@ -49,6 +49,18 @@ class Notification(models.Model):
 
     class Meta:
         ordering = ['-priority', '-created_at']
+        indexes = [
+            models.Index(fields=['-priority', '-created_at'], name='notif_priority_created_idx'),
+            # Keyset pagination of the notification list, newest first
+            models.Index(fields=['-created_at', '-id'], name='notif_created_id_idx'),
+            # Retention purges walk one type at a time, oldest first
+            models.Index(fields=['notification_type', 'created_at'], name='notif_type_created_idx'),
+            # Only unread rows are indexed, so the unread count/list stays small
+            models.Index(
+                fields=['-created_at'], name='notif_unread_created_idx',
+                condition=models.Q(is_read=False),
+            ),
+        ]
 
     def __str__(self):
         return f"{self.notification_type.upper()}: {self.device} - {self.title}"
\ No newline at end of file
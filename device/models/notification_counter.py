@@ -0,0 +1,22 @@
+from django.db import models
+from .device import Device
+
+
+class NotificationCounter(models.Model):
+    """
+    Unread notifications per device and type, kept in step with Notification
+    by device.services.notification_counters so the unread badge is a read of
+    a few small rows instead of a COUNT over all notifications.
+    Rebuild with `manage.py rebuild_notification_counters`.
+    """
+    device = models.ForeignKey(Device, on_delete=models.CASCADE, related_name='+')
+    notification_type = models.CharField(max_length=20)
+    unread = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['device', 'notification_type'], name='notif_counter_device_type_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.device_id} {self.notification_type}: {self.unread} unread"
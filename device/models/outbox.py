@@ -0,0 +1,39 @@
+from django.db import models
+from django.utils import timezone
+from .notification import Notification
+
+
+class NotificationOutbox(models.Model):
+    """
+    Pending WebSocket/push fan-out for a Notification, written in the same
+    transaction as the Notification and delivered by `manage.py dispatch_notifications`.
+    Rows are deleted once delivered.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('failed', 'Failed'),
+    ]
+
+    # No DB constraint and DO_NOTHING so deleting notifications never has to
+    # visit the outbox (keeps Notification deletes on the fast path)
+    notification = models.ForeignKey(
+        Notification, on_delete=models.DO_NOTHING, db_constraint=False,
+        null=True, blank=True, related_name='+'
+    )
+    payload = models.JSONField(help_text="WebSocket content and push message, serialized at enqueue time")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    websocket_sent = models.BooleanField(default=False)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_status_next_idx'),
+        ]
+
+    def __str__(self):
+        return f"Outbox #{self.id} ({self.status}) for notification {self.notification_id}"
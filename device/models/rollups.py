@@ -0,0 +1,37 @@
+from django.db import models
+from .device import Device
+
+
+class ReadingRollup(models.Model):
+    """Per-device reading counts for one time bucket (see HourlyReadingRollup / DailyReadingRollup)"""
+    device = models.ForeignKey(Device, on_delete=models.CASCADE, related_name='+')
+    total = models.PositiveIntegerField(default=0)
+    low = models.PositiveIntegerField(default=0)
+    medium = models.PositiveIntegerField(default=0)
+    high = models.PositiveIntegerField(default=0)
+    tamper = models.PositiveIntegerField(default=0)
+    critical = models.PositiveIntegerField(default=0, help_text="LOW alert and tamper in the same reading")
+
+    class Meta:
+        abstract = True
+
+    def __str__(self):
+        return f"{self.device_id} @ {self.bucket}: {self.total} readings"
+
+
+class HourlyReadingRollup(ReadingRollup):
+    bucket = models.DateTimeField(help_text="Start of the hour (UTC)")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['device', 'bucket'], name='hourly_rollup_device_bucket_uniq'),
+        ]
+
+
+class DailyReadingRollup(ReadingRollup):
+    bucket = models.DateField(help_text="UTC date")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['device', 'bucket'], name='daily_rollup_device_bucket_uniq'),
+        ]
@@ -11,14 +11,17 @@ from .data_serializers import DeviceDataSerializer
 
 # device/serializers/__init__.py
 from .device_serializers import DeviceSerializer
-from .notification_serializers import NotificationSerializer, ExpoPushTokenSerializer
+from .notification_serializers import NotificationSerializer, NotificationSlimSerializer, ExpoPushTokenSerializer
 from .data_serializers import *  # Include any existing data serializers
+from .job_serializers import BackgroundJobSerializer
 
 __all__ = [
     'DeviceSerializer',
     'NotificationSerializer',
+    'NotificationSlimSerializer',
     'DeviceDataSerializer',
 
     'ExpoPushTokenSerializer',
+    'BackgroundJobSerializer',
     # Add other serializers you want to export
 ]
\ No newline at end of file
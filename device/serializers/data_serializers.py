@@ -2,6 +2,10 @@ from rest_framework import serializers
 from device.models import DeviceData
 
 class DeviceDataSerializer(serializers.ModelSerializer):
+    # Stored as a code and a boolean, returned as the strings devices sent
+    alert = serializers.CharField()
+    tamper = serializers.CharField(source='tamper_text', read_only=True)
+
     class Meta:
         model = DeviceData
-        fields = '__all__'
+        fields = ['id', 'timestamp', 'alert', 'count', 'refer_val', 'tamper', 'device']
\ No newline at end of file
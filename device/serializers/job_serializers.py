@@ -0,0 +1,20 @@
+from rest_framework import serializers
+from ..models import BackgroundJob
+
+
+class BackgroundJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = BackgroundJob
+        fields = [
+            'id',
+            'kind',
+            'params',
+            'status',
+            'step',
+            'progress',
+            'attempts',
+            'last_error',
+            'created_at',
+            'finished_at',
+        ]
+        read_only_fields = fields
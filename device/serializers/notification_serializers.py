@@ -1,6 +1,6 @@
 
 from rest_framework import serializers
-from ..models import Notification, ExpoPushToken
+from ..models import Device, Notification, ExpoPushToken
 from .device_serializers import DeviceSerializer
 
 
@@ -37,6 +37,18 @@ class NotificationSerializer(serializers.ModelSerializer):
         return data
 
 
+class NotificationDeviceSerializer(serializers.ModelSerializer):
+    """Just enough of the device to label a notification"""
+    class Meta:
+        model = Device
+        fields = ['id', 'name', 'room_number', 'floor_number']
+
+
+class NotificationSlimSerializer(NotificationSerializer):
+    """NotificationSerializer with a compact device instead of the full DeviceSerializer"""
+    device = NotificationDeviceSerializer(read_only=True)
+
+
 class ExpoPushTokenSerializer(serializers.ModelSerializer):
     class Meta:
         model = ExpoPushToken
@@ -0,0 +1,10 @@
+# device/services/__init__.py
+from .ingest import build_reading, save_readings
+from .notifications import evaluate_notifications, send_notifications
+
+__all__ = [
+    'build_reading',
+    'save_readings',
+    'evaluate_notifications',
+    'send_notifications',
+]
@@ -0,0 +1,242 @@
+# device/services/analytics_cache.py
+"""
+Response cache for the analytics views, keyed on data versions rather than
+TTLs. Every committed ingest bumps a global version and one per device, so a
+cached result stays valid exactly until new readings arrive:
+
+- views scoped to one device (a `device_id` query parameter) key on that
+  device's version, so other devices reporting do not evict them;
+- all other views key on the global version;
+- every key also carries an epoch, bumped by maintenance that rewrites
+  history (retention, partition expiry, rollup rebuilds, device edits).
+
+Views whose output depends on the clock ("last 24 hours", "online within 5
+minutes") additionally key on the current CLOCK_SECONDS slot.
+
+On a miss, identical concurrent requests are coalesced: within a process
+they wait on the one in-flight computation (SingleFlight), and across
+workers the first to take a short lock in the cache computes while the others
+poll for its result.
+
+Responses carry an ETag derived from the same key, so a client polling with
+If-None-Match gets a 304 without the view or even the cached entry being read.
+
+Pass `?nocache=1` (or send `Cache-Control: no-cache`) to bypass the cache.
+"""
+import functools
+import hashlib
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.response import Response
+
+from device.conditional import make_etag, not_modified, tag_response
+from .single_flight import SingleFlight
+from .versions import bump_after_commit, get_versions, incr
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ANALYTICS_CACHE_SETTINGS = {
+    'ENABLED': True,
+    'CACHE_ALIAS': 'default',
+    'TIMEOUT': 60 * 60 * 24,  # safety net only; entries normally go stale by version
+    'CLOCK_SECONDS': 60,      # granularity of views that depend on the current time
+    'LOCK_TIMEOUT': 30,       # seconds a cross-worker computation lock is held at most
+    'WAIT_TIMEOUT': 10,       # seconds to wait for another computation before computing anyway
+    'POLL_INTERVAL': 0.05,    # seconds between checks for another worker's result
+}
+
+KEY_PREFIX = 'analytics'
+EPOCH_KEY = f'{KEY_PREFIX}:epoch'
+GLOBAL_VERSION_KEY = f'{KEY_PREFIX}:version'
+STATS_EVENTS = ('hit', 'miss', 'coalesced', 'not_modified', 'bypass')
+
+# Names of the views wrapped by cached_analytics, for the stats endpoint
+CACHED_VIEWS = []
+
+_flights = SingleFlight()
+
+
+def analytics_cache_settings():
+    return {**DEFAULT_ANALYTICS_CACHE_SETTINGS, **getattr(settings, 'DEVICE_ANALYTICS_CACHE', {})}
+
+
+def _cache():
+    return caches[analytics_cache_settings()['CACHE_ALIAS']]
+
+
+def device_version_key(device_id):
+    return f'{KEY_PREFIX}:version:{device_id}'
+
+
+def _stats_key(view_name, event):
+    return f'{KEY_PREFIX}:stats:{view_name}:{event}'
+
+
+def bump_data_version(device_ids):
+    """Invalidate cached analytics for these devices and the fleet, once the current transaction commits"""
+    keys = [GLOBAL_VERSION_KEY] + [device_version_key(device_id) for device_id in sorted(set(device_ids))]
+    bump_after_commit(keys, _cache())
+
+
+def invalidate_analytics():
+    """Invalidate every cached analytics result, once the current transaction commits"""
+    bump_after_commit([EPOCH_KEY], _cache())
+
+
+def _versions(cache, device_id):
+    """(epoch, data version) that cache keys for this scope are built from"""
+    version_key = GLOBAL_VERSION_KEY if device_id is None else device_version_key(device_id)
+    return get_versions([EPOCH_KEY, version_key], cache)
+
+
+def _record(cache, view_name, event):
+    try:
+        incr(cache, _stats_key(view_name, event), initial=1)
+    except Exception:
+        pass
+
+
+def _bypass_requested(request):
+    if request.GET.get('nocache', '').lower() in ('1', 'true', 'yes'):
+        return True
+    return 'no-cache' in request.META.get('HTTP_CACHE_CONTROL', '').lower()
+
+
+def _respond(data, state):
+    response = Response(data)
+    response['X-Analytics-Cache'] = state
+    return response
+
+
+def _wait_for_peer(cache, key, lock_key, config):
+    """Poll for the result of another worker holding `lock_key` (None if it never arrives)"""
+    deadline = time.monotonic() + config['WAIT_TIMEOUT']
+    while time.monotonic() < deadline:
+        time.sleep(config['POLL_INTERVAL'])
+        data = cache.get(key)
+        if data is not None:
+            return data
+        if cache.get(lock_key) is None:
+            # The other worker finished without caching (an error response) or died
+            return cache.get(key)
+    return None
+
+
+def _compute(cache, key, view_name, config, call):
+    """Run the view once across workers: take the lock and compute, or wait for whoever holds it"""
+    lock_key = f'{key}:lock'
+    try:
+        locked = cache.add(lock_key, 1, timeout=config['LOCK_TIMEOUT'])
+        if not locked:
+            data = _wait_for_peer(cache, key, lock_key, config)
+            if data is not None:
+                _record(cache, view_name, 'coalesced')
+                return _respond(data, 'COALESCED')
+    except Exception as e:
+        logger.warning(f"Analytics cache lock unavailable: {str(e)}")
+        locked = False
+
+    try:
+        _record(cache, view_name, 'miss')
+        response = call()
+        if isinstance(response, Response) and response.status_code == 200:
+            try:
+                cache.set(key, response.data, timeout=config['TIMEOUT'])
+            except Exception as e:
+                logger.warning(f"Could not store analytics response: {str(e)}")
+        response['X-Analytics-Cache'] = 'MISS'
+        return response
+    finally:
+        if locked:
+            try:
+                cache.delete(lock_key)
+            except Exception:
+                pass
+
+
+def cached_analytics(clock=False):
+    """
+    Cache the data of successful responses of a function-based analytics
+    view. Apply it below @api_view/@permission_classes so authentication
+    runs first. Set `clock` for views whose output depends on the current time.
+    """
+    def decorator(view):
+        view_name = view.__name__
+        CACHED_VIEWS.append(view_name)
+
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            config = analytics_cache_settings()
+            if not config['ENABLED']:
+                return view(request, *args, **kwargs)
+
+            cache = _cache()
+            if _bypass_requested(request):
+                _record(cache, view_name, 'bypass')
+                response = view(request, *args, **kwargs)
+                response['X-Analytics-Cache'] = 'BYPASS'
+                return response
+
+            device_id = kwargs.get('device_id') or request.GET.get('device_id') or None
+            params = sorted((name, value) for name, value in request.GET.lists() if name != 'nocache')
+            try:
+                epoch, version = _versions(cache, device_id)
+                parts = [view_name, epoch, version, device_id or '*', repr(params)]
+                if clock:
+                    parts.append(int(time.time()) // config['CLOCK_SECONDS'])
+                key = f'{KEY_PREFIX}:{view_name}:' + hashlib.md5(repr(parts).encode('utf-8')).hexdigest()
+
+                # The key already names this exact result, so it doubles as the ETag
+                etag = make_etag(request, key)
+                response = not_modified(request, etag)
+                if response is not None:
+                    _record(cache, view_name, 'not_modified')
+                    return response
+
+                data = cache.get(key)
+            except Exception as e:
+                logger.warning(f"Analytics cache unavailable: {str(e)}")
+                return view(request, *args, **kwargs)
+
+            if data is not None:
+                _record(cache, view_name, 'hit')
+                return tag_response(_respond(data, 'HIT'), etag)
+
+            response, shared = _flights.do(
+                key,
+                lambda: _compute(cache, key, view_name, config, lambda: view(request, *args, **kwargs)),
+                timeout=config['WAIT_TIMEOUT'],
+            )
+            if shared:
+                if response.status_code != 200:
+                    return view(request, *args, **kwargs)
+                # Each waiter renders its own Response; only the data is shared
+                _record(cache, view_name, 'coalesced')
+                response = _respond(response.data, 'COALESCED')
+            if response.status_code == 200:
+                tag_response(response, etag)
+            return response
+
+        return wrapper
+    return decorator
+
+
+def cache_stats():
+    """Hit/miss/bypass counters per cached view, plus the current epoch and global version"""
+    cache = _cache()
+    keys = [_stats_key(view_name, event) for view_name in CACHED_VIEWS for event in STATS_EVENTS]
+    values = cache.get_many(keys + [EPOCH_KEY, GLOBAL_VERSION_KEY])
+    views = {
+        view_name: {event: values.get(_stats_key(view_name, event), 0) for event in STATS_EVENTS}
+        for view_name in CACHED_VIEWS
+    }
+    return {
+        'enabled': analytics_cache_settings()['ENABLED'],
+        'in_flight': _flights.in_flight(),
+        'epoch': values.get(EPOCH_KEY, 0),
+        'global_version': values.get(GLOBAL_VERSION_KEY, 0),
+        'views': views,
+    }
@@ -0,0 +1,167 @@
+# device/services/device_registry.py
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db.models import F, Func, JSONField, Value
+from django.db.models.functions import Coalesce
+
+from device.models import Device
+from .versions import bump_resource
+
+DEFAULT_REGISTRY_SETTINGS = {
+    'MAX_ENTRIES': 10000,
+    'TTL': 300,  # seconds
+}
+
+
+def normalize_device_id(device_id):
+    """Normalize an ESP32 device_id (MAC address): uppercase, no ':' or '-' separators"""
+    return str(device_id).upper().replace(':', '').replace('-', '')
+
+
+def merge_device_metadata(pk, patch):
+    """
+    Merge `patch` into Device.metadata with a single UPDATE (jsonb ||), so
+    callers holding a cached Device never write back stale columns.
+    Heartbeats land here, so this bumps 'device_metadata' rather than
+    'devices': only the device list shows metadata.
+    """
+    updated = Device.objects.filter(pk=pk).update(
+        metadata=Func(
+            Coalesce(F('metadata'), Value({}, output_field=JSONField())),
+            Value(patch, output_field=JSONField()),
+            template='%(expressions)s',
+            arg_joiner=' || ',
+            output_field=JSONField(),
+        )
+    )
+    bump_resource('device_metadata')
+    return updated
+
+
+class DeviceRegistry:
+    """
+    In-process LRU + TTL cache of Device rows, addressable by primary key
+    (the DID sent with readings) or by normalized device_id (MAC address).
+
+    Entries are invalidated from Device post_save/post_delete signals in the
+    process that made the change; other workers converge within TTL seconds.
+    Lookups return copies, so callers may mutate what they get back.
+    """
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # pk -> (expires_at, device)
+        self._pk_by_device_id = {}
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def get_by_pk(self, pk):
+        """Return the Device with this pk; raises Device.DoesNotExist like .get()"""
+        try:
+            pk = int(pk)
+        except (TypeError, ValueError):
+            raise Device.DoesNotExist(f"Invalid device pk: {pk!r}")
+
+        device = self._lookup(pk)
+        if device is None:
+            device = Device.objects.get(pk=pk)
+            self.put(device)
+        return copy.deepcopy(device)
+
+    def get_by_device_id(self, device_id):
+        """Return the Device with this device_id (normalized first); raises Device.DoesNotExist"""
+        device_id = normalize_device_id(device_id)
+        with self._lock:
+            pk = self._pk_by_device_id.get(device_id)
+        device = self._lookup(pk) if pk is not None else None
+        if device is None:
+            if pk is None:
+                self._count('misses')
+            device = Device.objects.get(device_id=device_id)
+            self.put(device)
+        return copy.deepcopy(device)
+
+    def get_many(self, pks):
+        """Return {pk: Device} for the given pks, fetching all misses in one query"""
+        found = {}
+        missing = []
+        for pk in pks:
+            device = self._lookup(pk)
+            if device is None:
+                missing.append(pk)
+            else:
+                found[pk] = device
+        if missing:
+            for pk, device in Device.objects.in_bulk(missing).items():
+                self.put(device)
+                found[pk] = device
+        return {pk: copy.deepcopy(device) for pk, device in found.items()}
+
+    def put(self, device):
+        if device.get_deferred_fields():
+            # Partially loaded instances (.only()/.defer()) must not be served as full rows
+            return
+        cached = copy.deepcopy(device)
+        with self._lock:
+            self._discard(device.pk)
+            self._entries[device.pk] = (time.monotonic() + self.ttl, cached)
+            if cached.device_id:
+                self._pk_by_device_id[cached.device_id] = cached.pk
+            while len(self._entries) > self.max_entries:
+                oldest_pk = next(iter(self._entries))
+                self._discard(oldest_pk)
+                self._counters['evictions'] += 1
+
+    def invalidate(self, pk):
+        with self._lock:
+            self._discard(pk)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._pk_by_device_id.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self._counters,
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+            }
+
+    def _lookup(self, pk):
+        with self._lock:
+            entry = self._entries.get(pk)
+            if entry is None:
+                self._counters['misses'] += 1
+                return None
+            expires_at, device = entry
+            if expires_at <= time.monotonic():
+                self._discard(pk)
+                self._counters['misses'] += 1
+                return None
+            self._entries.move_to_end(pk)
+            self._counters['hits'] += 1
+            return device
+
+    def _discard(self, pk):
+        # Called with self._lock held
+        entry = self._entries.pop(pk, None)
+        if entry is not None:
+            device_id = entry[1].device_id
+            if device_id and self._pk_by_device_id.get(device_id) == pk:
+                del self._pk_by_device_id[device_id]
+
+    def _count(self, counter):
+        with self._lock:
+            self._counters[counter] += 1
+
+
+_config = {**DEFAULT_REGISTRY_SETTINGS, **getattr(settings, 'DEVICE_REGISTRY_CACHE', {})}
+device_registry = DeviceRegistry(max_entries=_config['MAX_ENTRIES'], ttl=_config['TTL'])
@@ -0,0 +1,103 @@
+# device/services/device_state.py
+from collections import defaultdict
+
+from django.db import transaction
+
+from device.models import Device, DeviceData, DeviceState
+from device.models.device_state import derive_status
+
+STATE_UPDATE_FIELDS = [
+    'alert', 'count', 'refer_val', 'tamper', 'timestamp', 'status',
+    'first_timestamp', 'last_status_change', 'updated_at',
+]
+
+
+def _apply_reading(state, reading):
+    """Advance `state` (or start one if None) with a reading; returns the new state"""
+    if state is None:
+        state = DeviceState(device_id=reading.device_id, first_timestamp=reading.timestamp)
+        state.last_status_change = None
+    elif reading.timestamp < state.timestamp:
+        # Older than what we already have (late or re-ordered write)
+        state.first_timestamp = min(state.first_timestamp, reading.timestamp)
+        return state
+    else:
+        changed = (state.alert, state.tamper) != (reading.alert, reading.tamper)
+        state.last_status_change = reading.timestamp if changed else None
+
+    state.alert = reading.alert
+    state.count = reading.count
+    state.refer_val = reading.refer_val
+    state.tamper = reading.tamper
+    state.timestamp = reading.timestamp
+    state.status = derive_status(reading.alert, reading.tamper)
+    return state
+
+
+def _lock_devices(device_ids):
+    """
+    Serialize state updates per device until the current transaction ends: a
+    concurrent ingest for the same device waits here, then reads the state
+    this one wrote instead of a stale copy. The Device rows are locked (a
+    DeviceState row may not exist yet) with FOR NO KEY UPDATE, which does not
+    block the foreign key checks of DeviceData inserts.
+    """
+    list(
+        Device.objects.select_for_update(no_key=True)
+        .filter(pk__in=device_ids).order_by('pk').values_list('pk', flat=True)
+    )
+
+
+def _upsert(states):
+    return DeviceState.objects.bulk_create(
+        states,
+        update_conflicts=True,
+        unique_fields=['device'],
+        update_fields=STATE_UPDATE_FIELDS,
+    )
+
+
+def update_device_state(readings):
+    """Upsert DeviceState for the devices in a batch of saved readings (three queries)"""
+    by_device = defaultdict(list)
+    for reading in readings:
+        by_device[reading.device_id].append(reading)
+    if not by_device:
+        return []
+
+    with transaction.atomic():
+        _lock_devices(list(by_device))
+        states = DeviceState.objects.in_bulk(list(by_device))
+        for device_id, device_readings in by_device.items():
+            state = states.get(device_id)
+            for reading in sorted(device_readings, key=lambda r: (r.timestamp, r.pk or 0)):
+                state = _apply_reading(state, reading)
+            states[device_id] = state
+
+        return _upsert([states[device_id] for device_id in by_device])
+
+
+def rebuild_device_state(device_ids):
+    """Recompute DeviceState for the given devices from DeviceData history"""
+    rebuilt = 0
+    for device_id in device_ids:
+        with transaction.atomic():
+            # Ingest for this device waits until the rebuilt row is committed
+            _lock_devices([device_id])
+            history = DeviceData.objects.filter(device_id=device_id)
+            last_two = list(history.order_by('-timestamp', '-id')[:2])
+            if not last_two:
+                DeviceState.objects.filter(device_id=device_id).delete()
+                continue
+
+            first = history.order_by('timestamp', 'id').values_list('timestamp', flat=True).first()
+            state = None
+            for reading in reversed(last_two):
+                state = _apply_reading(state, reading)
+            state.first_timestamp = first
+            if len(last_two) == 1:
+                state.last_status_change = None
+
+            _upsert([state])
+        rebuilt += 1
+    return rebuilt
@@ -0,0 +1,106 @@
+# device/services/downsampling.py
+"""
+Downsampled reading series for charts. A chart only needs a few hundred
+points, so rather than shipping a device's whole history we either pick the
+visually significant readings (largest-triangle-three-buckets) or let the
+database reduce the range to fixed-width min/max buckets.
+"""
+from array import array
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db.models import Avg, Count, FloatField, Func, IntegerField, Max, Min, Value
+from django.db.models.functions import Cast, Floor
+
+from .exports import EXPORT_CHUNK_SIZE
+
+DEFAULT_HISTORY_POINTS = 300
+MAX_HISTORY_POINTS = 2000
+# LTTB scans every reading of the range in Python; longer ranges use minmax
+MAX_LTTB_RANGE = timedelta(days=31)
+
+
+class Epoch(Func):
+    """Seconds since the Unix epoch of a datetime expression (PostgreSQL)"""
+    template = 'EXTRACT(EPOCH FROM %(expressions)s)'
+    output_field = FloatField()
+
+
+def lttb(xs, ys, threshold):
+    """
+    Largest-triangle-three-buckets: the indices of `threshold` points of the
+    series (xs ascending) that best preserve its visual shape. The first and
+    last points are always kept.
+    """
+    size = len(xs)
+    if threshold >= size or threshold < 3:
+        return list(range(size))
+
+    selected = [0]
+    every = (size - 2) / (threshold - 2)
+    previous = 0
+    for bucket in range(threshold - 2):
+        # Average of the next bucket is the third corner of the triangle
+        next_start = int((bucket + 1) * every) + 1
+        next_end = min(int((bucket + 2) * every) + 1, size)
+        next_count = next_end - next_start
+        avg_x = sum(xs[next_start:next_end]) / next_count
+        avg_y = sum(ys[next_start:next_end]) / next_count
+
+        start = int(bucket * every) + 1
+        end = int((bucket + 1) * every) + 1
+        prev_x, prev_y = xs[previous], ys[previous]
+        best, best_area = start, -1.0
+        for index in range(start, end):
+            area = abs((prev_x - avg_x) * (ys[index] - prev_y) - (prev_x - xs[index]) * (avg_y - prev_y))
+            if area > best_area:
+                best, best_area = index, area
+        selected.append(best)
+        previous = best
+
+    selected.append(size - 1)
+    return selected
+
+
+def lttb_series(readings, field, points):
+    """
+    ([(timestamp, value)], readings scanned): `readings` reduced to at most
+    `points` with LTTB.
+    Readings are streamed in time order into two float arrays, 16 bytes per
+    reading; the selected timestamps are rebuilt from the epoch seconds. The
+    selection itself is a pure Python loop over every reading, so callers
+    bound the range (see MAX_LTTB_RANGE).
+    """
+    xs, ys = array('d'), array('d')
+    rows = readings.order_by('timestamp', 'id').values_list('timestamp', field)
+    for timestamp, value in rows.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        xs.append(timestamp.timestamp())
+        ys.append(value)
+    series = [
+        (datetime.fromtimestamp(xs[index], tz=dt_timezone.utc), int(ys[index])) for index in lttb(xs, ys, points)
+    ]
+    return series, len(xs)
+
+
+def minmax_series(readings, field, since, until, points):
+    """
+    Per-bucket min/max/avg of `field` over `points` equal slices of
+    [since, until), aggregated in the database. Empty buckets are omitted.
+    """
+    width = (until - since).total_seconds() / points
+    bucket = Cast(
+        Floor((Epoch('timestamp') - Value(since.timestamp())) / Value(width)),
+        IntegerField(),
+    )
+    rows = readings.annotate(bucket=bucket).values('bucket').annotate(
+        minimum=Min(field), maximum=Max(field), average=Avg(field), readings=Count('id'),
+    ).order_by('bucket')
+    return [
+        {
+            'start': since + (until - since) * row['bucket'] / points,
+            'min': row['minimum'],
+            'max': row['maximum'],
+            'avg': round(row['average'], 2),
+            'readings': row['readings'],
+        }
+        for row in rows
+    ]
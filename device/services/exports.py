@@ -0,0 +1,131 @@
+# device/services/exports.py
+"""
+Generators for file exports. Rows are produced from server-side cursors
+(`.iterator(chunk_size=...)`) and encoded a chunk at a time, so a
+StreamingHttpResponse starts sending immediately and memory stays flat
+whatever the export size.
+
+The app is served over ASGI, where Django buffers a synchronous iterator in
+full before sending anything; wrap streams in `async_stream()` so each chunk
+is sent as soon as it is produced.
+"""
+import csv
+import json
+import zlib
+
+from asgiref.sync import sync_to_async
+
+from device.models import AlertLevel, Device, DeviceData
+
+EXPORT_CHUNK_SIZE = 2000  # rows fetched per server-side cursor round trip
+ROWS_PER_WRITE = 500      # rows encoded into one response chunk
+
+READING_EXPORT_HEADER = [
+    'Reading ID', 'Device ID', 'Device Name', 'Room', 'Floor',
+    'Timestamp', 'Alert', 'Count', 'Refer Val', 'Tamper',
+]
+
+
+class Echo:
+    """File-like object whose write() returns what it is given, for csv.writer"""
+
+    def write(self, value):
+        return value
+
+
+def async_stream(chunks):
+    """
+    Async iterator over a blocking chunk generator. Each chunk is produced in
+    the request's sync thread, where the view's database connection (and so
+    its server-side cursor) lives.
+    """
+    chunks = iter(chunks)
+    next_chunk = sync_to_async(next, thread_sensitive=True)
+    done = object()
+
+    async def stream():
+        try:
+            while (chunk := await next_chunk(chunks, done)) is not done:
+                yield chunk
+        finally:
+            # Client gone or stream finished: release the cursor in the same thread
+            if hasattr(chunks, 'close'):
+                await sync_to_async(chunks.close, thread_sensitive=True)()
+
+    return stream()
+
+
+def csv_stream(header, rows):
+    """Yield CSV text: the header on its own (so bytes go out at once), then ROWS_PER_WRITE rows per chunk"""
+    writer = csv.writer(Echo())
+    yield writer.writerow(header)
+    chunk = []
+    for row in rows:
+        chunk.append(writer.writerow(row))
+        if len(chunk) >= ROWS_PER_WRITE:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+
+
+def ndjson_stream(records):
+    """Yield newline-delimited JSON, one record per line, ROWS_PER_WRITE lines per chunk"""
+    chunk = []
+    for record in records:
+        chunk.append(json.dumps(record, ensure_ascii=False, separators=(',', ':'), default=str) + '\n')
+        if len(chunk) >= ROWS_PER_WRITE:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+
+
+def gzip_stream(chunks, level=6):
+    """
+    Gzip a stream of text chunks on the fly. Every chunk is sync-flushed so
+    the client can decompress what it has received so far.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits=31: gzip header and trailer
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8')) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def filter_readings(device_ids=None, floor=None, room=None, since=None, until=None):
+    readings = DeviceData.objects.all()
+    if device_ids:
+        readings = readings.filter(device_id__in=device_ids)
+    if floor is not None:
+        readings = readings.filter(device__floor_number=floor)
+    if room is not None:
+        readings = readings.filter(device__room_number=room)
+    if since is not None:
+        readings = readings.filter(timestamp__gte=since)
+    if until is not None:
+        readings = readings.filter(timestamp__lt=until)
+    return readings
+
+
+def iter_reading_rows(readings):
+    """
+    Yield READING_EXPORT_HEADER rows for a DeviceData queryset, per device and
+    newest first (the order of the (device, -timestamp) index, so no sort).
+    """
+    devices = {
+        device_id: (name, room, floor)
+        for device_id, name, room, floor in Device.objects.values_list('id', 'name', 'room_number', 'floor_number')
+    }
+    rows = readings.order_by('device_id', '-timestamp').values_list(
+        'id', 'device_id', 'timestamp', 'alert_code', 'alert_text', 'count', 'refer_val', 'tamper'
+    )
+    for reading_id, device_id, timestamp, alert_code, alert_text, count, refer_val, tamper in rows.iterator(
+        chunk_size=EXPORT_CHUNK_SIZE
+    ):
+        name, room, floor = devices.get(device_id, ('', '', ''))
+        yield [
+            reading_id, device_id, name, room, floor, timestamp.isoformat(),
+            AlertLevel.to_string(alert_code, alert_text), count, refer_val, 'true' if tamper else 'false',
+        ]
@@ -0,0 +1,41 @@
+# device/services/ingest.py
+from django.db import transaction
+
+from device.models import DeviceData
+from .analytics_cache import bump_data_version
+from .device_state import update_device_state
+from .rollups import update_rollups
+
+READING_FIELDS = ['DID', 'ALERT', 'count', 'REFER_Val', 'TAMPER']
+
+
+def normalize_tamper(value):
+    """ESP32 firmware sends TAMPER as a bool or a string; only true/"true" means tampered."""
+    return str(value).lower() == 'true'
+
+
+def build_reading(device, payload):
+    """Build an unsaved DeviceData row from a raw ESP32 payload"""
+    return DeviceData(
+        device=device,
+        alert=payload.get('ALERT'),
+        count=payload.get('count'),
+        refer_val=payload.get('REFER_Val'),
+        tamper=normalize_tamper(payload.get('TAMPER'))
+    )
+
+
+def save_readings(readings):
+    """
+    Persist a list of unsaved DeviceData rows with a single INSERT and fold
+    them into the derived per-device tables in the same transaction. Cached
+    analytics of the affected devices are invalidated once it commits.
+    """
+    if not readings:
+        return []
+    with transaction.atomic():
+        saved = DeviceData.objects.bulk_create(readings)
+        update_device_state(saved)
+        update_rollups(saved)
+        bump_data_version(reading.device_id for reading in saved)
+    return saved
@@ -0,0 +1,193 @@
+# device/services/ingest_buffer.py
+import atexit
+import logging
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .ingest import save_readings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUFFER_SETTINGS = {
+    'MAX_SIZE': 5000,        # hard cap on buffered readings (backpressure beyond this)
+    'FLUSH_SIZE': 200,       # flush as soon as this many readings are waiting
+    'FLUSH_INTERVAL': 2.0,   # ...or when the oldest reading has waited this many seconds
+}
+
+
+class IngestBuffer:
+    """
+    Bounded write-behind buffer for DeviceData rows.
+
+    Readings are appended in the request thread and written with bulk_create
+    by a background flusher thread once FLUSH_SIZE rows are waiting or the
+    oldest row is FLUSH_INTERVAL seconds old. When the buffer is full the
+    caller flushes synchronously instead of dropping data.
+    """
+
+    def __init__(self, max_size, flush_size, flush_interval):
+        self.max_size = max_size
+        self.flush_size = min(flush_size, max_size)
+        self.flush_interval = flush_interval
+
+        self._items = deque()
+        self._oldest_at = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._flush_lock = threading.Lock()  # serializes writers so rows land in arrival order
+        self._thread = None
+        self._closed = False
+
+        self._counters = {
+            'accepted': 0,
+            'flushed': 0,
+            'flushes': 0,
+            'failed_flushes': 0,
+            'dropped': 0,
+            'max_depth': 0,
+            'last_flush_size': 0,
+            'last_flush_latency_ms': 0.0,
+            'max_flush_latency_ms': 0.0,
+            'total_flush_latency_ms': 0.0,
+        }
+
+    def add(self, reading):
+        """Queue an unsaved DeviceData row for a later bulk insert"""
+        with self._lock:
+            closed = self._closed
+            if not closed:
+                self._ensure_thread()
+                if not self._items:
+                    self._oldest_at = time.monotonic()
+                self._items.append(reading)
+                self._counters['accepted'] += 1
+                self._counters['max_depth'] = max(self._counters['max_depth'], len(self._items))
+                full = len(self._items) >= self.max_size
+                if len(self._items) >= self.flush_size:
+                    self._wakeup.notify()
+
+        if closed:
+            # Shutting down: write straight through
+            save_readings([reading])
+        elif full:
+            self.flush()
+
+    def flush(self):
+        """Write everything currently buffered. Returns the number of rows written."""
+        with self._flush_lock:
+            with self._lock:
+                batch = list(self._items)
+                self._items.clear()
+                self._oldest_at = None
+            if not batch:
+                return 0
+
+            started = time.monotonic()
+            try:
+                save_readings(batch)
+            except Exception as e:
+                logger.exception(f"Ingest buffer flush of {len(batch)} readings failed: {e}")
+                self._requeue(batch)
+                return 0
+
+            latency_ms = (time.monotonic() - started) * 1000
+            with self._lock:
+                counters = self._counters
+                counters['flushed'] += len(batch)
+                counters['flushes'] += 1
+                counters['last_flush_size'] = len(batch)
+                counters['last_flush_latency_ms'] = round(latency_ms, 2)
+                counters['max_flush_latency_ms'] = round(max(counters['max_flush_latency_ms'], latency_ms), 2)
+                counters['total_flush_latency_ms'] += latency_ms
+            return len(batch)
+
+    def close(self):
+        """Stop the flusher thread and drain whatever is still buffered"""
+        with self._lock:
+            self._closed = True
+            self._wakeup.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval * 2)
+        self.flush()
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+            depth = len(self._items)
+            oldest_age = time.monotonic() - self._oldest_at if self._oldest_at else 0.0
+        total_latency = counters.pop('total_flush_latency_ms')
+        counters['avg_flush_latency_ms'] = round(total_latency / counters['flushes'], 2) if counters['flushes'] else 0.0
+        counters.update({
+            'depth': depth,
+            'oldest_age_seconds': round(oldest_age, 3),
+            'max_size': self.max_size,
+            'flush_size': self.flush_size,
+            'flush_interval': self.flush_interval,
+        })
+        return counters
+
+    def _requeue(self, batch):
+        with self._lock:
+            self._counters['failed_flushes'] += 1
+            room = self.max_size - len(self._items)
+            if room < len(batch):
+                # Keep the newest readings; the oldest are the least useful
+                self._counters['dropped'] += len(batch) - max(room, 0)
+                batch = batch[len(batch) - max(room, 0):]
+            self._items.extendleft(reversed(batch))
+            if self._items and self._oldest_at is None:
+                self._oldest_at = time.monotonic()
+
+    def _ensure_thread(self):
+        # Called with self._lock held
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='device-ingest-flusher', daemon=True)
+            self._thread.start()
+
+    def _due(self):
+        if not self._items:
+            return False
+        if len(self._items) >= self.flush_size:
+            return True
+        return time.monotonic() - self._oldest_at >= self.flush_interval
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._closed and not self._due():
+                    timeout = self.flush_interval
+                    if self._oldest_at is not None:
+                        timeout = max(self.flush_interval - (time.monotonic() - self._oldest_at), 0.01)
+                    self._wakeup.wait(timeout)
+                if self._closed:
+                    return
+            close_old_connections()
+            self.flush()
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def write_behind_enabled():
+    return getattr(settings, 'DEVICE_INGEST_WRITE_BEHIND', False)
+
+
+def get_ingest_buffer():
+    """Process-wide buffer, created on first use and drained at interpreter exit"""
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                config = {**DEFAULT_BUFFER_SETTINGS, **getattr(settings, 'DEVICE_INGEST_BUFFER', {})}
+                _buffer = IngestBuffer(
+                    max_size=config['MAX_SIZE'],
+                    flush_size=config['FLUSH_SIZE'],
+                    flush_interval=config['FLUSH_INTERVAL'],
+                )
+                atexit.register(_buffer.close)
+    return _buffer
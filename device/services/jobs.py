@@ -0,0 +1,241 @@
+# device/services/jobs.py
+"""
+Background jobs for deletes too large to run inside a request (clearing all
+notifications, removing a device with its reading history).
+
+A job kind is a list of steps. Each call of a step deletes one chunk of rows
+in primary-key order with a single raw DELETE ... RETURNING, so rows are never
+loaded by the delete collector and no per-row signals fire; the job's step
+and progress are saved in the same transaction as the chunk. A worker that
+dies mid-job leaves it 'running' with a stale lease, and the next worker to
+claim it carries on with the following chunk.
+
+Deployments without a worker process (serverless) set RUN_INLINE: each job
+then runs to the end in the request that queued it, and a request that times
+out leaves the job to be resumed by the next identical request once its lease
+has expired.
+"""
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Max, Q
+from django.utils import timezone
+
+from device.models import (
+    BackgroundJob, Device, DeviceData, Notification, HourlyReadingRollup, DailyReadingRollup
+)
+from .analytics_cache import bump_data_version
+from .notification_counters import forget_deleted
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BACKGROUND_JOB_SETTINGS = {
+    'CHUNK_SIZE': 5000,
+    'CHUNK_PAUSE': 0.0,     # seconds between chunks, to leave room for other writers
+    'LEASE_SECONDS': 300,   # a running job whose lease is this old is re-claimable (crashed worker)
+    'MAX_ATTEMPTS': 5,
+    'RUN_INLINE': False,    # no worker: run each job in the request that queues it
+}
+
+
+class LeaseLost(Exception):
+    """Another worker re-claimed the job while this one was still running it"""
+
+
+def background_job_settings():
+    return {**DEFAULT_BACKGROUND_JOB_SETTINGS, **getattr(settings, 'BACKGROUND_JOBS', {})}
+
+
+def delete_chunk(queryset, chunk_size, returning=(), order_by=('pk',)):
+    """
+    Delete the first `chunk_size` rows of `queryset` (in primary-key order
+    unless `order_by` follows an index better) with one
+    DELETE ... WHERE pk IN (...) RETURNING. Cascades and signals are
+    skipped, so only use it on rows nothing else references. Returns the
+    values of the `returning` fields (the primary key by default) per deleted row.
+    """
+    model = queryset.model
+    quote = connection.ops.quote_name
+    pk_column = quote(model._meta.pk.column)
+    columns = [quote(model._meta.get_field(name).column) for name in returning] or [pk_column]
+    subquery, params = queryset.order_by(*order_by).values('pk')[:chunk_size].query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {quote(model._meta.db_table)} WHERE {pk_column} IN ({subquery}) "
+            f"RETURNING {', '.join(columns)}",
+            params,
+        )
+        return cursor.fetchall()
+
+
+def _notifications_step(notifications):
+    def run(chunk_size):
+        rows = delete_chunk(notifications, chunk_size, returning=('device', 'notification_type', 'is_read'))
+        forget_deleted(rows)
+        return len(rows)
+    return run
+
+
+def _readings_step(device_id):
+    def run(chunk_size):
+        deleted = len(delete_chunk(DeviceData.objects.filter(device_id=device_id), chunk_size))
+        if deleted:
+            bump_data_version([device_id])
+        return deleted
+    return run
+
+
+def _rows_step(queryset):
+    def run(chunk_size):
+        return len(delete_chunk(queryset, chunk_size))
+    return run
+
+
+def _device_step(device_id):
+    def run(chunk_size):
+        # Only small tables are left (state, counters, rows that arrived meanwhile);
+        # the ORM delete cascades them and fires the usual Device signals
+        return Device.objects.filter(pk=device_id).delete()[1].get(Device._meta.label, 0)
+    return run
+
+
+def _clear_notifications_steps(params):
+    notifications = Notification.objects.filter(pk__lte=params['max_id'])
+    return [('notifications', _notifications_step(notifications))]
+
+
+def _delete_device_steps(params):
+    device_id = params['device_id']
+    return [
+        ('readings', _readings_step(device_id)),
+        ('notifications', _notifications_step(Notification.objects.filter(device_id=device_id))),
+        ('hourly_rollups', _rows_step(HourlyReadingRollup.objects.filter(device_id=device_id))),
+        ('daily_rollups', _rows_step(DailyReadingRollup.objects.filter(device_id=device_id))),
+        ('device', _device_step(device_id)),
+    ]
+
+
+JOB_STEPS = {
+    'clear_notifications': _clear_notifications_steps,
+    'delete_device': _delete_device_steps,
+}
+
+
+def enqueue_job(kind, params, requested_by=None):
+    """Queue a job, or return the identical one that is already pending or running"""
+    existing = (
+        BackgroundJob.objects.filter(kind=kind, params=params, status__in=['pending', 'running'])
+        .order_by('id').first()
+    )
+    job = existing or BackgroundJob.objects.create(kind=kind, params=params, requested_by=requested_by)
+    if background_job_settings()['RUN_INLINE']:
+        return _run_inline(job)
+    return job
+
+
+def _run_inline(job):
+    """Run `job` now, unless it is still leased to whoever is running it"""
+    claimed = claim_job(pk=job.pk)
+    if claimed is None:
+        return job
+    run_job(claimed)
+    return claimed
+
+
+def enqueue_clear_notifications(requested_by=None):
+    # Only what exists now is cleared; notifications arriving while the job runs are kept
+    max_id = Notification.objects.aggregate(max_id=Max('id'))['max_id'] or 0
+    return enqueue_job('clear_notifications', {'max_id': max_id}, requested_by)
+
+
+def enqueue_delete_device(device, requested_by=None):
+    return enqueue_job('delete_device', {'device_id': device.pk}, requested_by)
+
+
+def claim_job(pk=None):
+    """
+    Claim the oldest pending job (or job `pk`), or a running one whose lease
+    expired, with SELECT ... FOR UPDATE SKIP LOCKED so concurrent workers
+    never take the same job.
+    """
+    config = background_job_settings()
+    now = timezone.now()
+    lease_expired = now - timedelta(seconds=config['LEASE_SECONDS'])
+
+    jobs = BackgroundJob.objects.all() if pk is None else BackgroundJob.objects.filter(pk=pk)
+    with transaction.atomic():
+        job = (
+            jobs
+            .select_for_update(skip_locked=True)
+            .filter(Q(status='pending') | Q(status='running', claimed_at__lt=lease_expired))
+            .order_by('id')
+            .first()
+        )
+        if job is None:
+            return None
+        BackgroundJob.objects.filter(pk=job.pk).update(
+            status='running', claimed_at=now, attempts=F('attempts') + 1
+        )
+    job.refresh_from_db()
+    return job
+
+
+def _save_chunk(job, lease, **fields):
+    """Record a chunk's progress and renew the lease, unless another worker has taken the job over"""
+    now = timezone.now()
+    updated = BackgroundJob.objects.filter(pk=job.pk, status='running', claimed_at=lease).update(
+        claimed_at=now, **fields
+    )
+    if not updated:
+        raise LeaseLost(f"Job #{job.pk} was re-claimed by another worker")
+    job.claimed_at = now
+    return now
+
+
+def run_job(job):
+    """Run a claimed job to the end. Returns True if it finished, False if it failed or was rescheduled."""
+    config = background_job_settings()
+    steps = JOB_STEPS[job.kind](job.params)
+    try:
+        while job.step < len(steps):
+            name, step = steps[job.step]
+            with transaction.atomic():
+                deleted = step(config['CHUNK_SIZE'])
+                progress = dict(job.progress)
+                if deleted:
+                    progress[name] = progress.get(name, 0) + deleted
+                    step_index = job.step
+                else:
+                    step_index = job.step + 1
+                _save_chunk(job, job.claimed_at, step=step_index, progress=progress)
+            job.step, job.progress = step_index, progress
+            if deleted and config['CHUNK_PAUSE']:
+                time.sleep(config['CHUNK_PAUSE'])
+    except LeaseLost as e:
+        logger.warning(str(e))
+        return False
+    except Exception as e:
+        job.status = 'failed' if job.attempts >= config['MAX_ATTEMPTS'] else 'pending'
+        job.last_error = str(e)
+        job.claimed_at = None
+        job.save(update_fields=['status', 'last_error', 'claimed_at'])
+        logger.error(f"Job #{job.pk} ({job.kind}) attempt {job.attempts} failed: {e}")
+        return False
+
+    job.status = 'done'
+    job.finished_at = timezone.now()
+    job.claimed_at = None
+    job.save(update_fields=['status', 'finished_at', 'claimed_at'])
+    logger.info(f"Job #{job.pk} ({job.kind}) done: {job.progress}")
+    return True
+
+
+def run_pending_job():
+    """Claim and run one job. Returns the job, or None if there was nothing to do."""
+    job = claim_job()
+    if job is not None:
+        run_job(job)
+    return job
@@ -0,0 +1,151 @@
+# device/services/notification_counters.py
+"""
+Unread notification counters per (device, type). Notifications are
+created, marked read and deleted through this module, which applies the row
+change and the counter change in one transaction.
+"""
+from collections import Counter
+
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+
+from device.models import Notification, NotificationCounter
+from .versions import bump_resource
+
+
+def _increment(deltas):
+    """Add positive `deltas` ({(device_id, type): n}) with one INSERT ... ON CONFLICT DO UPDATE"""
+    if not deltas:
+        return
+    table = connection.ops.quote_name(NotificationCounter._meta.db_table)
+    params = []
+    for (device_id, notification_type), delta in sorted(deltas.items()):
+        params.extend([device_id, notification_type, delta])
+    sql = (
+        f"INSERT INTO {table} (device_id, notification_type, unread) "
+        f"VALUES {', '.join(['(%s, %s, %s)'] * len(deltas))} "
+        f"ON CONFLICT (device_id, notification_type) DO UPDATE SET unread = {table}.unread + EXCLUDED.unread"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def _decrement(deltas):
+    """
+    Subtract `deltas` ({(device_id, type): n}) from existing counter rows only,
+    so a counter already removed with its device (cascade) is not re-created.
+    """
+    if not deltas:
+        return
+    table = connection.ops.quote_name(NotificationCounter._meta.db_table)
+    params = []
+    for (device_id, notification_type), delta in sorted(deltas.items()):
+        params.extend([device_id, notification_type, delta])
+    sql = (
+        f"UPDATE {table} SET unread = {table}.unread - deltas.n "
+        f"FROM (VALUES {', '.join(['(%s, %s, %s)'] * len(deltas))}) AS deltas (device_id, notification_type, n) "
+        f"WHERE {table}.device_id = deltas.device_id AND {table}.notification_type = deltas.notification_type"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def add_notification(**fields):
+    """Create a Notification and count it if unread"""
+    with transaction.atomic():
+        notification = Notification.objects.create(**fields)
+        if not notification.is_read:
+            _increment({(notification.device_id, notification.notification_type): 1})
+        bump_resource('notifications')
+    return notification
+
+
+def mark_read(notifications):
+    """
+    Mark a Notification queryset read with a single UPDATE ... RETURNING and
+    uncount the rows it changed. A row marked concurrently is re-checked by
+    Postgres after the other update commits, so it is never uncounted twice.
+    Returns the number of notifications that changed.
+    """
+    table = connection.ops.quote_name(Notification._meta.db_table)
+    subquery, params = notifications.filter(is_read=False).order_by().values('pk').query.sql_with_params()
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {table} SET is_read = true WHERE is_read = false AND id IN ({subquery}) "
+                f"RETURNING device_id, notification_type",
+                params,
+            )
+            rows = cursor.fetchall()
+        if not rows:
+            return 0
+        _decrement(Counter(rows))
+        bump_resource('notifications')
+    return len(rows)
+
+
+def delete_notifications(notifications):
+    """
+    Delete a Notification queryset with a single DELETE ... RETURNING and
+    uncount the unread rows it removed. A row marked read concurrently is
+    returned as it is after that update commits, so it is never uncounted
+    twice. Returns the number of notifications deleted.
+    """
+    table = connection.ops.quote_name(Notification._meta.db_table)
+    subquery, params = notifications.order_by().values('pk').query.sql_with_params()
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {table} WHERE id IN ({subquery}) RETURNING device_id, notification_type, is_read",
+                params,
+            )
+            rows = cursor.fetchall()
+        if not rows:
+            return 0
+        forget_deleted(rows)
+    return len(rows)
+
+
+def forget_deleted(rows):
+    """
+    Uncount notifications deleted directly in SQL (background jobs), given the
+    deleted rows as (device_id, notification_type, is_read). Call it in the
+    transaction that deleted them.
+    """
+    if not rows:
+        return
+    _decrement(Counter(
+        (device_id, notification_type) for device_id, notification_type, is_read in rows if not is_read
+    ))
+    bump_resource('notifications')
+
+
+def unread_counts(device_id=None):
+    """{'count': total unread, 'by_type': {type: unread}} from the counter rows"""
+    counters = NotificationCounter.objects.all()
+    if device_id is not None:
+        counters = counters.filter(device_id=device_id)
+    by_type = {
+        row['notification_type']: row['unread_sum']
+        for row in counters.values('notification_type').annotate(unread_sum=Sum('unread')).order_by()
+        if row['unread_sum']
+    }
+    return {'count': sum(by_type.values()), 'by_type': by_type}
+
+
+def rebuild_notification_counters():
+    """Recompute every counter from the Notification table. Returns the number of counter rows."""
+    with transaction.atomic():
+        # Hold off concurrent counter updates so none is lost between the count and the swap
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"LOCK TABLE {connection.ops.quote_name(NotificationCounter._meta.db_table)} IN EXCLUSIVE MODE"
+            )
+        NotificationCounter.objects.all().delete()
+        rows = (
+            Notification.objects.filter(is_read=False)
+            .values('device_id', 'notification_type').annotate(unread=Count('id')).order_by()
+        )
+        counters = NotificationCounter.objects.bulk_create([NotificationCounter(**row) for row in rows])
+        bump_resource('notifications')
+    return len(counters)
@@ -0,0 +1,88 @@
+# device/services/notification_retention.py
+"""
+Per-type retention for notifications, e.g. read `info` after 7 days and
+`critical` after 90 (NOTIFICATION_RETENTION['RULES']).
+
+Each type is purged oldest first along the (notification_type, created_at)
+index, one short transaction per batch. Batches pick their rows with
+FOR UPDATE SKIP LOCKED and delete with a raw DELETE ... RETURNING, so only
+the rows being deleted are locked: an overlapping run, a clear-all job or a
+user deleting notifications is skipped over rather than waited on. The
+unread counters are adjusted from the returned rows in the same transaction.
+"""
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from device.models import Notification
+from .jobs import delete_chunk
+from .notification_counters import forget_deleted
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_NOTIFICATION_RETENTION_SETTINGS = {
+    'RULES': {},           # {type: {'days': n, 'read_only': bool}}; unlisted types are kept forever
+    'BATCH_SIZE': 1000,    # rows deleted per statement
+    'BATCH_PAUSE': 0.0,    # seconds to sleep between batches
+}
+
+NOTIFICATION_TYPES = [choice for choice, _ in Notification.NOTIFICATION_TYPE_CHOICES]
+
+
+def notification_retention_settings():
+    return {**DEFAULT_NOTIFICATION_RETENTION_SETTINGS, **getattr(settings, 'NOTIFICATION_RETENTION', {})}
+
+
+def rule_errors(rules):
+    """Problems with a RULES mapping, as messages (empty if it is valid)"""
+    errors = []
+    for notification_type, rule in rules.items():
+        if notification_type not in NOTIFICATION_TYPES:
+            errors.append(f"Unknown notification type '{notification_type}'")
+        days = rule.get('days')
+        if not isinstance(days, int) or days < 0:
+            errors.append(f"'{notification_type}': days must be a non-negative integer, not {days!r}")
+    return errors
+
+
+def expired_notifications(notification_type, rule, now=None):
+    cutoff = (now or timezone.now()) - timedelta(days=rule['days'])
+    expired = Notification.objects.filter(notification_type=notification_type, created_at__lt=cutoff)
+    if rule.get('read_only'):
+        expired = expired.filter(is_read=True)
+    return expired
+
+
+def _purge(expired, batch_size, pause):
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            rows = delete_chunk(
+                expired.select_for_update(skip_locked=True), batch_size,
+                returning=('device', 'notification_type', 'is_read'), order_by=('created_at', 'id'),
+            )
+            forget_deleted(rows)
+        deleted += len(rows)
+        if len(rows) < batch_size:
+            return deleted
+        logger.info(f"Purged {deleted} notifications so far")
+        if pause:
+            time.sleep(pause)
+
+
+def purge_notifications(config=None, dry_run=False, now=None):
+    """Apply the retention rules. Returns {type: notifications removed (or due, with `dry_run`)}."""
+    config = {**notification_retention_settings(), **(config or {})}
+    now = now or timezone.now()
+    result = {}
+    for notification_type, rule in config['RULES'].items():
+        expired = expired_notifications(notification_type, rule, now)
+        if dry_run:
+            result[notification_type] = expired.count()
+        else:
+            result[notification_type] = _purge(expired, config['BATCH_SIZE'], config['BATCH_PAUSE'])
+    return result
@@ -0,0 +1,181 @@
+# device/services/notifications.py
+import asyncio
+import json
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import transaction
+
+from device.models import Notification, NotificationOutbox, ExpoPushToken
+from .notification_counters import add_notification
+from .push import ExpoPushClient, get_push_client
+from .recipients import recipient_groups
+
+logger = logging.getLogger(__name__)
+
+# Ticket errors worth another attempt; anything else (e.g. DeviceNotRegistered) is final
+RETRYABLE_PUSH_ERRORS = {'RequestFailed', 'MessageRateExceeded'}
+
+
+def outbox_enabled():
+    return getattr(settings, 'NOTIFICATION_OUTBOX_ENABLED', False)
+
+
+def evaluate_notifications(alert_status, is_tampered):
+    """Return the notifications a reading should raise (empty list if none)"""
+    is_low_alert = alert_status == "LOW"
+
+    if is_low_alert and is_tampered:
+        # Both conditions are true - CRITICAL
+        return [{
+            "type": "critical",
+            "notification_type": "critical",
+            "title": "CRITICAL Alert",
+            "message": "  Low tissue AND tampering detected!",
+            "priority": 100
+        }]
+    if is_low_alert:
+        return [{
+            "type": "low",
+            "notification_type": "low",
+            "title": "Low Tissue Alert",
+            "message": "Low tissue detected",
+            "priority": 80
+        }]
+    if is_tampered:
+        return [{
+            "type": "tamper",
+            "notification_type": "tamper",
+            "title": "Tamper Alert",
+            "message": " Device tampering detected",
+            "priority": 95
+        }]
+    return []
+
+
+def build_delivery_payload(notification, device, data, notif_data):
+    """Everything needed to deliver a notification, as plain JSON (stored in the outbox)"""
+    return {
+        "websocket": {
+            "id": notification.id,
+            "device_id": device.id,
+            "device": {
+                "id": device.id,
+                "name": device.name if hasattr(device, 'name') else f"Device {device.id}",
+                "device_id": device.id,
+                "room_number": device.room_number,
+                "floor_number": device.floor_number,
+            },
+            "room": device.room_number,
+            "floor": device.floor_number,
+            "timestamp": str(data.timestamp),
+            "alert": data.alert,
+            "tamper": data.tamper_text,
+            "type": notif_data["type"],
+            "notification_type": notif_data["notification_type"],
+            "title": notif_data["title"],
+            "message": notif_data["message"],
+            "priority": notif_data["priority"],
+            "created_at": str(notification.created_at),
+            "is_read": False,
+        },
+        "push": {
+            "title": notif_data["title"],
+            "body": notif_data["message"],
+            "data": {
+                "device_id": device.id,
+                "notification_id": notification.id,
+                "type": notif_data["type"],
+                "notification_type": notif_data["notification_type"],
+                "priority": notif_data["priority"],
+                "room": device.room_number,
+                "floor": device.floor_number,
+            },
+        },
+    }
+
+
+async def _group_send_all(channel_layer, groups, message):
+    await asyncio.gather(*(channel_layer.group_send(group, message) for group in groups))
+
+
+def deliver_websocket(content):
+    """
+    Send a notification to the sockets of the users interested in its device
+    (see recipients.py). The frame is serialized once here and the same
+    message goes to every group, so consumers only forward the text.
+    """
+    groups = recipient_groups(content["device_id"])
+    if not groups:
+        return
+    message = {
+        "type": "notification_message",
+        "text": json.dumps({"type": "notification", "content": content}),
+    }
+    async_to_sync(_group_send_all)(get_channel_layer(), groups, message)
+
+
+def deliver_push(push, tokens=None):
+    """
+    Send one push message per token in batched requests. `tokens` defaults to
+    every registered token. Returns the tokens whose delivery is worth retrying.
+    """
+    if tokens is None:
+        tokens = list(ExpoPushToken.objects.values_list('token', flat=True))
+    messages = [
+        ExpoPushClient.build_message(token, push["title"], push["body"], push["data"])
+        for token in tokens
+    ]
+    retry_tokens = []
+    for token, ticket in zip(tokens, get_push_client().send(messages)):
+        if ticket.get("status") == "error":
+            logger.warning(f"Failed to send push notification to {token}: {ticket.get('message')}")
+            if (ticket.get("details") or {}).get("error") in RETRYABLE_PUSH_ERRORS:
+                retry_tokens.append(token)
+    return retry_tokens
+
+
+def create_notification(device, data, notif_data):
+    return add_notification(
+        device=device,
+        message=notif_data["message"],
+        title=notif_data["title"],
+        notification_type=notif_data["type"],
+        alert=data.alert,
+        tamper=data.tamper_text,
+        priority=notif_data["priority"]
+    )
+
+
+def send_notifications(device, data, notifications):
+    """
+    Create Notification rows for a saved reading and fan them out (WebSocket + Expo push).
+
+    With NOTIFICATION_OUTBOX_ENABLED the fan-out is only recorded in the
+    outbox, in the same transaction as the Notification row, and delivered
+    later by `manage.py dispatch_notifications`.
+    """
+    if not notifications:
+        return notifications
+
+    if outbox_enabled():
+        with transaction.atomic():
+            for notif_data in notifications:
+                notification = create_notification(device, data, notif_data)
+                NotificationOutbox.objects.create(
+                    notification=notification,
+                    payload=build_delivery_payload(notification, device, data, notif_data)
+                )
+        return notifications
+
+    tokens = list(ExpoPushToken.objects.values_list('token', flat=True))
+    for notif_data in notifications:
+        notification = create_notification(device, data, notif_data)
+        payload = build_delivery_payload(notification, device, data, notif_data)
+        deliver_websocket(payload["websocket"])
+        # One batched push per notification, however many tokens are registered
+        deliver_push(payload["push"], tokens)
+
+    return notifications
@@ -0,0 +1,103 @@
+# device/services/outbox.py
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from device.models import NotificationOutbox
+from .notifications import deliver_websocket, deliver_push
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_OUTBOX_SETTINGS = {
+    'BATCH_SIZE': 50,
+    'MAX_ATTEMPTS': 8,
+    'BACKOFF_BASE': 5,       # seconds; doubled on every failed attempt
+    'BACKOFF_MAX': 900,      # seconds
+    'LEASE_SECONDS': 300,    # a claimed row is re-claimable after this long (crashed worker)
+}
+
+
+def outbox_settings():
+    return {**DEFAULT_OUTBOX_SETTINGS, **getattr(settings, 'NOTIFICATION_OUTBOX', {})}
+
+
+def backoff_delay(attempts, config=None):
+    config = config or outbox_settings()
+    return min(config['BACKOFF_BASE'] * (2 ** max(attempts - 1, 0)), config['BACKOFF_MAX'])
+
+
+def claim_batch(batch_size=None):
+    """
+    Claim up to `batch_size` due rows. Rows are locked with
+    SELECT ... FOR UPDATE SKIP LOCKED so concurrent workers never claim the
+    same row, then marked 'processing' so the lock is released before delivery.
+    """
+    config = outbox_settings()
+    batch_size = batch_size or config['BATCH_SIZE']
+    now = timezone.now()
+    lease_expired = now - timedelta(seconds=config['LEASE_SECONDS'])
+
+    with transaction.atomic():
+        ids = list(
+            NotificationOutbox.objects
+            .select_for_update(skip_locked=True)
+            .filter(
+                Q(status='pending', next_attempt_at__lte=now) |
+                Q(status='processing', claimed_at__lt=lease_expired)
+            )
+            .order_by('id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return []
+        NotificationOutbox.objects.filter(id__in=ids).update(
+            status='processing', claimed_at=now, attempts=F('attempts') + 1
+        )
+    return list(NotificationOutbox.objects.filter(id__in=ids).order_by('id'))
+
+
+def process_entry(entry):
+    """Deliver one claimed row. Returns True if it is done (delivered), False if rescheduled or failed."""
+    config = outbox_settings()
+    try:
+        if not entry.websocket_sent:
+            deliver_websocket(entry.payload["websocket"])
+            entry.websocket_sent = True
+
+        retry_tokens = deliver_push(entry.payload["push"], entry.payload.get("retry_tokens"))
+        if retry_tokens:
+            # Only the tokens that failed are retried
+            entry.payload["retry_tokens"] = retry_tokens
+            raise RuntimeError(f"Push delivery failed for {len(retry_tokens)} token(s)")
+    except Exception as e:
+        if entry.attempts >= config['MAX_ATTEMPTS']:
+            entry.status = 'failed'
+            logger.error(f"Outbox #{entry.id} failed permanently after {entry.attempts} attempts: {e}")
+        else:
+            entry.status = 'pending'
+            entry.next_attempt_at = timezone.now() + timedelta(seconds=backoff_delay(entry.attempts, config))
+            logger.warning(f"Outbox #{entry.id} attempt {entry.attempts} failed, retrying: {e}")
+        entry.last_error = str(e)
+        entry.claimed_at = None
+        entry.save(update_fields=[
+            'status', 'next_attempt_at', 'last_error', 'claimed_at', 'websocket_sent', 'payload'
+        ])
+        return False
+
+    entry.delete()
+    return True
+
+
+def dispatch_pending(batch_size=None):
+    """Claim and deliver one batch. Returns (delivered, not_delivered) counts."""
+    delivered = not_delivered = 0
+    for entry in claim_batch(batch_size):
+        if process_entry(entry):
+            delivered += 1
+        else:
+            not_delivered += 1
+    return delivered, not_delivered
@@ -0,0 +1,262 @@
+# device/services/partitions.py
+"""
+Optional monthly range partitioning of DeviceData on Postgres.
+
+`convert_to_partitioned()` turns the plain table into a table partitioned by
+RANGE (timestamp) with one partition per UTC month plus a default partition,
+and `ensure_partitions()` / `expire_partitions()` keep the window rolling
+(see `manage.py manage_partitions`). Dropping a month is then a DROP TABLE
+instead of a DELETE.
+
+Postgres requires the partition key in the primary key, so a partitioned
+table's primary key is (id, timestamp); ids still come from one sequence and
+stay unique. Later migrations touching DeviceData must not use
+AddIndexConcurrently (CONCURRENTLY is not supported on partitioned tables).
+"""
+import logging
+import re
+from datetime import date
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from device.models import DeviceData
+from .analytics_cache import invalidate_analytics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PARTITION_SETTINGS = {
+    'MONTHS_AHEAD': 3,          # future months created ahead of time
+    'RETENTION_MONTHS': None,   # whole months of raw readings kept (None = keep everything)
+    'DROP_EXPIRED': False,      # drop expired partitions instead of detaching them
+}
+
+PARTITION_SUFFIX = re.compile(r'_p(\d{4})(\d{2})$')
+
+
+def partition_settings():
+    return {**DEFAULT_PARTITION_SETTINGS, **getattr(settings, 'DEVICE_DATA_PARTITIONS', {})}
+
+
+def month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def add_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def current_month():
+    # timezone.now() is UTC, like the partition bounds
+    return month_start(timezone.now())
+
+
+def _table():
+    return DeviceData._meta.db_table
+
+
+def partition_name(month):
+    return f"{_table()}_p{month:%Y%m}"
+
+
+def default_partition_name():
+    return f"{_table()}_default"
+
+
+def _bound(month):
+    # Generated from a date, never from user input
+    return f"'{month:%Y-%m-%d} 00:00:00+00'"
+
+
+def is_partitioned():
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table p "
+            "JOIN pg_class c ON c.oid = p.partrelid "
+            "WHERE c.relname = %s AND c.relnamespace = current_schema()::regnamespace)",
+            [_table()],
+        )
+        return cursor.fetchone()[0]
+
+
+def list_partitions():
+    """Return [(month, partition name)] of the attached monthly partitions, oldest first"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits i "
+            "JOIN pg_class parent ON parent.oid = i.inhparent "
+            "JOIN pg_class child ON child.oid = i.inhrelid "
+            "WHERE parent.relname = %s AND parent.relnamespace = current_schema()::regnamespace",
+            [_table()],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+
+    partitions = []
+    for name in names:
+        match = PARTITION_SUFFIX.search(name)
+        if match:
+            partitions.append((date(int(match.group(1)), int(match.group(2)), 1), name))
+    return sorted(partitions)
+
+
+def _create_partition(cursor, month):
+    """
+    Create the partition for `month`. Readings that landed in the default
+    partition for that month are moved into it first, otherwise Postgres
+    refuses to add the range.
+    """
+    quote = connection.ops.quote_name
+    table, name, default = quote(_table()), quote(partition_name(month)), quote(default_partition_name())
+    lower, upper = _bound(month), _bound(add_months(month, 1))
+    in_range = f'"timestamp" >= {lower} AND "timestamp" < {upper}'
+
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL", [default_partition_name()])
+    has_default = cursor.fetchone()[0]
+    stray = False
+    if has_default:
+        cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {default} WHERE {in_range})")
+        stray = cursor.fetchone()[0]
+
+    if not stray:
+        cursor.execute(f"CREATE TABLE {name} PARTITION OF {table} FOR VALUES FROM ({lower}) TO ({upper})")
+        return
+
+    cursor.execute(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+    cursor.execute(
+        f"WITH moved AS (DELETE FROM {default} WHERE {in_range} RETURNING *) "
+        f"INSERT INTO {name} SELECT * FROM moved"
+    )
+    moved = cursor.rowcount
+    cursor.execute(f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES FROM ({lower}) TO ({upper})")
+    logger.info(f"Moved {moved} default-partition readings into {partition_name(month)}")
+
+
+def ensure_partitions(months_ahead=None, start=None):
+    """
+    Create missing monthly partitions from `start` (default: this month) up to
+    `months_ahead` months ahead. Returns the names of the partitions created.
+    """
+    months_ahead = partition_settings()['MONTHS_AHEAD'] if months_ahead is None else months_ahead
+    first = month_start(start) if start else current_month()
+    last = add_months(current_month(), months_ahead)
+    existing = {month for month, _ in list_partitions()}
+
+    created = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        month = first
+        while month <= last:
+            if month not in existing:
+                _create_partition(cursor, month)
+                created.append(partition_name(month))
+            month = add_months(month, 1)
+    return created
+
+
+def remove_partitions_before(cutoff, drop=False):
+    """
+    Detach (or drop) the monthly partitions that end on or before `cutoff`
+    (a date). Returns the names of the partitions removed.
+    """
+    quote = connection.ops.quote_name
+    expired = [name for month, name in list_partitions() if add_months(month, 1) <= cutoff]
+    with transaction.atomic(), connection.cursor() as cursor:
+        for name in expired:
+            if drop:
+                cursor.execute(f"DROP TABLE {quote(name)}")
+            else:
+                cursor.execute(f"ALTER TABLE {quote(_table())} DETACH PARTITION {quote(name)}")
+        if expired:
+            invalidate_analytics()
+    return expired
+
+
+def expire_partitions(retention_months=None, drop=None):
+    """
+    Detach (or drop) monthly partitions that end before the retention window,
+    which keeps `retention_months` whole months before the current one.
+    Returns the names of the partitions removed.
+    """
+    config = partition_settings()
+    retention_months = config['RETENTION_MONTHS'] if retention_months is None else retention_months
+    drop = config['DROP_EXPIRED'] if drop is None else drop
+    if retention_months is None:
+        return []
+    return remove_partitions_before(add_months(current_month(), -retention_months), drop)
+
+
+def convert_to_partitioned(months_ahead=None):
+    """
+    One-off conversion of the plain DeviceData table into a partitioned one.
+    Rows are copied month by month into new partitions under an exclusive
+    lock, so run it in a maintenance window. Returns the number of rows copied.
+    """
+    if is_partitioned():
+        return 0
+
+    quote = connection.ops.quote_name
+    table = _table()
+    legacy = f"{table}_unpartitioned"
+    sequence = f"{table}_id_seq"
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"LOCK TABLE {quote(table)} IN ACCESS EXCLUSIVE MODE")
+
+        # Secondary indexes and foreign keys, replayed on the new parent
+        cursor.execute(
+            "SELECT indexdef FROM pg_indexes WHERE schemaname = current_schema() AND tablename = %s "
+            "AND indexname NOT IN (SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass)",
+            [table, table],
+        )
+        index_defs = [row[0] for row in cursor.fetchall()]
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = %s::regclass AND contype = 'f'",
+            [table],
+        )
+        foreign_keys = cursor.fetchall()
+        cursor.execute(f"SELECT min(\"timestamp\"), max(id) FROM {quote(table)}")
+        oldest, max_id = cursor.fetchone()
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [table])
+        (old_sequence,) = cursor.fetchone()
+        last_value = 0
+        if old_sequence:
+            cursor.execute(f"SELECT last_value FROM {old_sequence}")
+            last_value = cursor.fetchone()[0]
+
+        cursor.execute(f"ALTER TABLE {quote(table)} RENAME TO {quote(legacy)}")
+        cursor.execute(
+            f"CREATE TABLE {quote(table)} (LIKE {quote(legacy)} INCLUDING DEFAULTS) "
+            f"PARTITION BY RANGE (\"timestamp\")"
+        )
+        cursor.execute(f"CREATE TABLE {quote(default_partition_name())} PARTITION OF {quote(table)} DEFAULT")
+
+        # Copy month by month into partitions covering the existing history
+        month = month_start(oldest) if oldest else current_month()
+        last = add_months(current_month(), partition_settings()['MONTHS_AHEAD'] if months_ahead is None else months_ahead)
+        copied = 0
+        while month <= last:
+            _create_partition(cursor, month)
+            cursor.execute(
+                f"INSERT INTO {quote(table)} SELECT * FROM {quote(legacy)} "
+                f"WHERE \"timestamp\" >= {_bound(month)} AND \"timestamp\" < {_bound(add_months(month, 1))}"
+            )
+            copied += cursor.rowcount
+            month = add_months(month, 1)
+        cursor.execute(f"INSERT INTO {quote(table)} SELECT * FROM {quote(legacy)} WHERE \"timestamp\" >= {_bound(month)}")
+        copied += cursor.rowcount
+
+        # Drops the old identity sequence, constraints and index names with it
+        cursor.execute(f"DROP TABLE {quote(legacy)}")
+
+        cursor.execute(f"CREATE SEQUENCE {quote(sequence)} OWNED BY {quote(table)}.id")
+        cursor.execute(f"ALTER TABLE {quote(table)} ALTER COLUMN id SET DEFAULT nextval('{sequence}'::regclass)")
+        cursor.execute("SELECT setval(%s, %s)", [sequence, max(max_id or 0, last_value, 1)])
+        cursor.execute(f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(table + '_pkey')} PRIMARY KEY (id, \"timestamp\")")
+        for index_def in index_defs:
+            cursor.execute(index_def)
+        for name, definition in foreign_keys:
+            cursor.execute(f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(name)} {definition}")
+
+    return copied
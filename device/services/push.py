@@ -0,0 +1,103 @@
+# device/services/push.py
+import logging
+import threading
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+EXPO_PUSH_URL = "https://exp.host/--/api/v2/push/send"
+EXPO_PUSH_BATCH_SIZE = 100  # Expo accepts at most 100 messages per request
+
+
+class ExpoPushClient:
+    """
+    Sends Expo push messages in batches over a pooled, keep-alive HTTP session.
+
+    `send()` takes any number of messages, posts them in chunks of
+    `batch_size` using Expo's array format, and returns one ticket per
+    message in the same order. A failed chunk yields error tickets for its
+    messages instead of raising, so one bad request never hides the rest.
+    """
+
+    def __init__(self, url=EXPO_PUSH_URL, batch_size=EXPO_PUSH_BATCH_SIZE, timeout=10,
+                 pool_size=10, access_token=None):
+        self.url = url
+        self.batch_size = batch_size
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({
+            'Accept': 'application/json',
+            'Accept-Encoding': 'gzip, deflate',
+            'Content-Type': 'application/json',
+        })
+        if access_token:
+            self.session.headers['Authorization'] = f'Bearer {access_token}'
+
+    @staticmethod
+    def build_message(to, title, body, data=None):
+        return {
+            "to": to,
+            "sound": "default",
+            "title": title,
+            "body": body,
+            "data": data or {}
+        }
+
+    def send(self, messages):
+        tickets = []
+        for start in range(0, len(messages), self.batch_size):
+            chunk = messages[start:start + self.batch_size]
+            tickets.extend(self._send_chunk(chunk))
+        return tickets
+
+    def close(self):
+        self.session.close()
+
+    def _send_chunk(self, chunk):
+        try:
+            response = self.session.post(self.url, json=chunk, timeout=self.timeout)
+            payload = response.json()
+        except (requests.RequestException, ValueError) as e:
+            logger.warning(f"Expo push request for {len(chunk)} messages failed: {e}")
+            return [self._error_ticket(str(e)) for _ in chunk]
+
+        tickets = payload.get('data') if isinstance(payload, dict) else None
+        if response.status_code >= 400 or not isinstance(tickets, list) or len(tickets) != len(chunk):
+            errors = payload.get('errors') if isinstance(payload, dict) else None
+            message = errors[0].get('message') if errors else f"HTTP {response.status_code}"
+            logger.warning(f"Expo push request for {len(chunk)} messages rejected: {message}")
+            return [self._error_ticket(message) for _ in chunk]
+        return tickets
+
+    @staticmethod
+    def _error_ticket(message):
+        return {
+            "status": "error",
+            "message": message,
+            "details": {"error": "RequestFailed"}
+        }
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_push_client():
+    """Process-wide client so every caller shares one connection pool"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = ExpoPushClient(
+                    url=getattr(settings, 'EXPO_PUSH_URL', EXPO_PUSH_URL),
+                    batch_size=getattr(settings, 'EXPO_PUSH_BATCH_SIZE', EXPO_PUSH_BATCH_SIZE),
+                    access_token=getattr(settings, 'EXPO_ACCESS_TOKEN', None),
+                )
+    return _client
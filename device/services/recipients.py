@@ -0,0 +1,52 @@
+# device/services/recipients.py
+"""
+Who receives a device's live notifications: every admin, plus the user who
+added the device (Device.added_by). Each user's sockets sit in their own
+`notifications_<user id>` group (see NotificationConsumer).
+
+Recipient lists are cached in the shared cache under the 'device_owners' and
+'user_roles' resource versions, bumped only when a device changes owner or a
+user changes role (see device.signals): every worker picks those up on the
+next alert, while heartbeats and other device or user edits leave the cache
+warm.
+"""
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+
+from device.models import Device
+from .versions import resource_versions
+
+KEY_PREFIX = 'recipients'
+TIMEOUT = 60 * 60  # safety net only; entries normally go stale by version
+
+
+def user_group(user_id):
+    return f'notifications_{user_id}'
+
+
+def _admin_ids(cache, roles_version):
+    key = f'{KEY_PREFIX}:admins:{roles_version}'
+    admin_ids = cache.get(key)
+    if admin_ids is None:
+        admin_ids = list(
+            get_user_model().objects.filter(role='admin', is_active=True).order_by('pk').values_list('pk', flat=True)
+        )
+        cache.set(key, admin_ids, timeout=TIMEOUT)
+    return admin_ids
+
+
+def recipient_ids(device_id):
+    """Sorted ids of the users who should get live notifications for this device"""
+    cache = caches['default']
+    owners_version, roles_version = resource_versions('device_owners', 'user_roles')
+    key = f'{KEY_PREFIX}:device:{device_id}:{owners_version}:{roles_version}'
+    user_ids = cache.get(key)
+    if user_ids is None:
+        owner_id = Device.objects.filter(pk=device_id).values_list('added_by_id', flat=True).first()
+        user_ids = sorted(set(_admin_ids(cache, roles_version)) | ({owner_id} - {None}))
+        cache.set(key, user_ids, timeout=TIMEOUT)
+    return user_ids
+
+
+def recipient_groups(device_id):
+    return [user_group(user_id) for user_id in recipient_ids(device_id)]
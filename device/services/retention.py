@@ -0,0 +1,146 @@
+# device/services/retention.py
+"""
+Tiered retention for readings: raw DeviceData for RAW_DAYS, hourly rollups for
+HOURLY_DAYS, daily rollups for DAILY_DAYS (None keeps a tier forever).
+
+Cutoffs are aligned to the start of a UTC day so the rollup buckets before a
+cutoff cover exactly the raw readings that were removed. `reading_counts()`
+stitches the tiers back together for the analytics views.
+"""
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime, time as dt_time, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Sum
+from django.utils import timezone
+
+from device.models import DeviceData, HourlyReadingRollup, DailyReadingRollup
+from .analytics_cache import invalidate_analytics
+from .partitions import is_partitioned, remove_partitions_before
+from .rollups import COUNTER_FIELDS, count_counters, hour_bucket, row_counters
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RETENTION_SETTINGS = {
+    'RAW_DAYS': None,
+    'HOURLY_DAYS': None,
+    'DAILY_DAYS': None,
+    'BATCH_SIZE': 5000,    # rows deleted per statement
+    'BATCH_PAUSE': 0.0,    # seconds to sleep between batches
+}
+
+
+def retention_settings():
+    return {**DEFAULT_RETENTION_SETTINGS, **getattr(settings, 'DEVICE_DATA_RETENTION', {})}
+
+
+def day_cutoff(days, now=None):
+    """Start of the UTC day `days` days ago (None if the tier is kept forever)"""
+    if days is None:
+        return None
+    day = ((now or timezone.now()) - timedelta(days=days)).astimezone(dt_timezone.utc).date()
+    return datetime.combine(day, dt_time.min, tzinfo=dt_timezone.utc)
+
+
+def raw_boundary(now=None):
+    """Oldest timestamp still served from raw DeviceData (None: raw keeps everything)"""
+    return day_cutoff(retention_settings()['RAW_DAYS'], now)
+
+
+def _empty_counters():
+    return dict.fromkeys(COUNTER_FIELDS, 0)
+
+
+def reading_counts(device_id=None, since=None, now=None):
+    """
+    Reading counters ({device_id: {total, low, medium, high, tamper, critical}})
+    from `since` (or all time). Readings newer than the raw boundary are
+    counted from DeviceData; older ones from the daily rollups, or the hourly
+    rollups (to the hour) when `since` falls before the boundary.
+    """
+    boundary = raw_boundary(now)
+    counts = defaultdict(_empty_counters)
+
+    raw = DeviceData.objects.all()
+    if device_id is not None:
+        raw = raw.filter(device_id=device_id)
+    raw_since = max(filter(None, [since, boundary]), default=None)
+    if raw_since is not None:
+        raw = raw.filter(timestamp__gte=raw_since)
+    for row in count_counters(raw.values('device_id')):
+        device_counts = counts[row['device_id']]
+        for field, value in row_counters(row).items():
+            device_counts[field] += value
+
+    if boundary is None or (since is not None and since >= boundary):
+        return counts
+
+    if since is None:
+        rollups = DailyReadingRollup.objects.filter(bucket__lt=boundary.date())
+    else:
+        rollups = HourlyReadingRollup.objects.filter(bucket__gte=hour_bucket(since), bucket__lt=boundary)
+    if device_id is not None:
+        rollups = rollups.filter(device_id=device_id)
+    rows = rollups.values('device_id').annotate(
+        **{f'{field}_sum': Sum(field) for field in COUNTER_FIELDS}
+    ).order_by()
+    for row in rows:
+        device_counts = counts[row['device_id']]
+        for field in COUNTER_FIELDS:
+            device_counts[field] += row[f'{field}_sum'] or 0
+    return counts
+
+
+def _delete_in_batches(queryset, batch_size, pause):
+    """
+    Delete `queryset` in primary-key ordered chunks, each in its own short
+    transaction, so locks are never held for long and an interrupted run
+    simply resumes where it stopped. Returns the number of rows deleted.
+    """
+    model = queryset.model
+    deleted = 0
+    while True:
+        ids = list(queryset.order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        count, _ = model.objects.filter(pk__in=ids).delete()
+        deleted += count
+        logger.info(f"Deleted {deleted} {model.__name__} rows so far")
+        if pause:
+            time.sleep(pause)
+
+
+def purge_expired(config=None, dry_run=False, now=None):
+    """
+    Apply the retention policy. Returns {tier: rows removed (or due, with
+    `dry_run`)}; dropped partitions are reported under 'raw_partitions'.
+    """
+    config = {**retention_settings(), **(config or {})}
+    now = now or timezone.now()
+    result = {}
+
+    tiers = [
+        ('raw', DeviceData.objects.all(), 'timestamp', day_cutoff(config['RAW_DAYS'], now)),
+        ('hourly', HourlyReadingRollup.objects.all(), 'bucket', day_cutoff(config['HOURLY_DAYS'], now)),
+        ('daily', DailyReadingRollup.objects.all(), 'bucket', day_cutoff(config['DAILY_DAYS'], now)),
+    ]
+    for tier, queryset, field, cutoff in tiers:
+        if cutoff is None:
+            continue
+        if tier == 'daily':
+            cutoff = cutoff.date()
+        expired = queryset.filter(**{f'{field}__lt': cutoff})
+        if dry_run:
+            result[tier] = expired.count()
+            continue
+
+        if tier == 'raw' and connection.vendor == 'postgresql' and is_partitioned():
+            # Whole months go as a DROP TABLE; only the partial month is deleted row by row
+            result['raw_partitions'] = remove_partitions_before(cutoff.date(), drop=True)
+        result[tier] = _delete_in_batches(expired, config['BATCH_SIZE'], config['BATCH_PAUSE'])
+    if not dry_run and any(result.values()):
+        invalidate_analytics()
+    return result
@@ -0,0 +1,146 @@
+# device/services/rollups.py
+from collections import defaultdict
+from datetime import timezone as dt_timezone
+
+from django.db import connection, transaction
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDate, TruncHour
+
+from device.models import AlertLevel, DeviceData, HourlyReadingRollup, DailyReadingRollup
+from .analytics_cache import invalidate_analytics
+
+COUNTER_FIELDS = ['total', 'low', 'medium', 'high', 'tamper', 'critical']
+
+# Same conditions the analytics views have always used on raw DeviceData
+COUNTER_FILTERS = {
+    'low': Q(alert_code=AlertLevel.LOW),
+    'medium': Q(alert_code=AlertLevel.MEDIUM),
+    'high': Q(alert_code=AlertLevel.HIGH),
+    'tamper': Q(tamper=True),
+    'critical': Q(alert_code=AlertLevel.LOW, tamper=True),
+}
+
+
+def count_counters(grouped):
+    """
+    Annotate a grouped DeviceData queryset (after `.values(...)`) with the
+    COUNTER_FIELDS counts of each group; read them back with `row_counters()`.
+    """
+    # Aggregates get a suffix so they never shadow the alert/tamper columns being filtered on
+    return grouped.annotate(
+        total_count=Count('id'),
+        **{f'{field}_count': Count('id', filter=condition) for field, condition in COUNTER_FILTERS.items()}
+    ).order_by()
+
+
+def row_counters(row):
+    """{field: count} of a row annotated by `count_counters()`"""
+    return {field: row[f'{field}_count'] for field in COUNTER_FIELDS}
+
+
+def reading_counters(reading):
+    return {
+        'total': 1,
+        'low': int(reading.alert_code == AlertLevel.LOW),
+        'medium': int(reading.alert_code == AlertLevel.MEDIUM),
+        'high': int(reading.alert_code == AlertLevel.HIGH),
+        'tamper': int(reading.tamper),
+        'critical': int(reading.alert_code == AlertLevel.LOW and reading.tamper),
+    }
+
+
+def hour_bucket(timestamp):
+    return timestamp.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def day_bucket(timestamp):
+    return timestamp.astimezone(dt_timezone.utc).date()
+
+
+def _increment(model, deltas):
+    """
+    Add `deltas` ({(device_id, bucket): {counter: n}}) to a rollup table with a
+    single INSERT ... ON CONFLICT DO UPDATE. Keys are sorted so concurrent
+    writers take row locks in the same order.
+    """
+    if not deltas:
+        return
+    table = connection.ops.quote_name(model._meta.db_table)
+    columns = ['device_id', 'bucket'] + COUNTER_FIELDS
+    row_placeholder = '(' + ', '.join(['%s'] * len(columns)) + ')'
+    params = []
+    for (device_id, bucket), counters in sorted(deltas.items()):
+        params.extend([device_id, bucket] + [counters[field] for field in COUNTER_FIELDS])
+    updates = ', '.join(f"{field} = {table}.{field} + EXCLUDED.{field}" for field in COUNTER_FIELDS)
+    sql = (
+        f"INSERT INTO {table} ({', '.join(columns)}) "
+        f"VALUES {', '.join([row_placeholder] * len(deltas))} "
+        f"ON CONFLICT (device_id, bucket) DO UPDATE SET {updates}"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def update_rollups(readings):
+    """Fold a batch of saved readings into the hourly and daily rollups (one statement each)"""
+    hourly = defaultdict(lambda: dict.fromkeys(COUNTER_FIELDS, 0))
+    daily = defaultdict(lambda: dict.fromkeys(COUNTER_FIELDS, 0))
+    for reading in readings:
+        counters = reading_counters(reading)
+        hour_counters = hourly[(reading.device_id, hour_bucket(reading.timestamp))]
+        day_counters = daily[(reading.device_id, day_bucket(reading.timestamp))]
+        for field, value in counters.items():
+            hour_counters[field] += value
+            day_counters[field] += value
+
+    _increment(HourlyReadingRollup, hourly)
+    _increment(DailyReadingRollup, daily)
+
+
+def _aggregate(queryset, trunc):
+    """Yield rollup row kwargs ({device_id, bucket, total, low, ...}) grouped by `trunc`"""
+    rows = count_counters(queryset.annotate(bucket=trunc).values('device_id', 'bucket'))
+    for row in rows:
+        yield {'device_id': row['device_id'], 'bucket': row['bucket'], **row_counters(row)}
+
+
+def rebuild_start(since=None):
+    """First UTC date `rebuild_rollups` may recompute: `since`, clamped to the raw retention boundary"""
+    from .retention import raw_boundary  # retention imports this module
+
+    boundary = raw_boundary()
+    if boundary is None:
+        return since
+    return max(since, boundary.date()) if since else boundary.date()
+
+
+def rebuild_rollups(device_id, since=None):
+    """
+    Recompute one device's rollups from DeviceData (from `since`, a UTC date,
+    onwards, or entirely). Returns the number of (hourly, daily) rows written.
+
+    Buckets older than the raw retention boundary are left alone: their
+    readings are gone, so the rollups are the only history left.
+    """
+    since = rebuild_start(since)
+    readings = DeviceData.objects.filter(device_id=device_id)
+    hourly = HourlyReadingRollup.objects.filter(device_id=device_id)
+    daily = DailyReadingRollup.objects.filter(device_id=device_id)
+    if since is not None:
+        readings = readings.filter(timestamp__date__gte=since)
+        hourly = hourly.filter(bucket__date__gte=since)
+        daily = daily.filter(bucket__gte=since)
+
+    with transaction.atomic():
+        hourly.delete()
+        daily.delete()
+        hourly_rows = HourlyReadingRollup.objects.bulk_create(
+            [HourlyReadingRollup(**row) for row in _aggregate(readings, TruncHour('timestamp', tzinfo=dt_timezone.utc))],
+            batch_size=1000,
+        )
+        daily_rows = DailyReadingRollup.objects.bulk_create(
+            [DailyReadingRollup(**row) for row in _aggregate(readings, TruncDate('timestamp', tzinfo=dt_timezone.utc))],
+            batch_size=1000,
+        )
+        invalidate_analytics()
+    return len(hourly_rows), len(daily_rows)
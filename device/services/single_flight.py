@@ -0,0 +1,49 @@
+# device/services/single_flight.py
+import threading
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key within a process: the first
+    caller computes, callers arriving while it runs wait for and share its
+    result instead of repeating the work.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+
+    def do(self, key, compute, timeout=None):
+        """
+        Return (result, shared). `shared` is True when the result came from a
+        computation started by another caller. A waiter whose leader fails or
+        takes longer than `timeout` seconds computes on its own.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            if flight.done.wait(timeout) and flight.result is not None:
+                return flight.result, True
+            return compute(), False
+
+        try:
+            flight.result = compute()
+            return flight.result, False
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._flights)
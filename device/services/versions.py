@@ -0,0 +1,76 @@
+# device/services/versions.py
+"""
+Version counters kept in the shared cache. Writers bump a counter once their
+transaction commits; readers fold the current values into cache keys and
+ETags, so anything derived from an older value is simply never matched again.
+"""
+import logging
+import time
+
+from django.core.cache import caches
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+RESOURCE_PREFIX = 'version:resource'
+
+
+def _default_cache():
+    return caches['default']
+
+
+def _seed():
+    # A counter that is missing (first use, or evicted) restarts from the clock
+    # in microseconds, so it never returns to a value something was keyed on
+    return time.time_ns() // 1000
+
+
+def incr(cache, key, initial=None):
+    """Atomically increment a counter that never expires, creating it if missing"""
+    try:
+        return cache.incr(key)
+    except ValueError:
+        if cache.add(key, _seed() if initial is None else initial, timeout=None):
+            return None
+        return cache.incr(key)
+
+
+def _bump(keys, cache):
+    try:
+        for key in keys:
+            incr(cache, key)
+    except Exception as e:
+        # A cache outage must never fail the write; derived entries age out by their timeout
+        logger.warning(f"Could not bump cache versions: {str(e)}")
+
+
+def bump_after_commit(keys, cache=None):
+    """Increment these counters once the current transaction commits (immediately outside one)"""
+    keys = list(keys)
+    cache = cache or _default_cache()
+    transaction.on_commit(lambda: _bump(keys, cache))
+
+
+def get_versions(keys, cache=None):
+    """Current values of these counters, in order; missing ones are seeded rather than read as 0"""
+    cache = cache or _default_cache()
+    values = cache.get_many(keys)
+    missing = [key for key in keys if key not in values]
+    if missing:
+        for key in missing:
+            cache.add(key, _seed(), timeout=None)
+        values = cache.get_many(keys)
+    return [values.get(key, 0) for key in keys]
+
+
+def resource_key(name):
+    return f'{RESOURCE_PREFIX}:{name}'
+
+
+def bump_resource(name):
+    """Mark a resource (e.g. 'devices', 'notifications') as changed once the current transaction commits"""
+    bump_after_commit([resource_key(name)])
+
+
+def resource_versions(*names):
+    return get_versions([resource_key(name) for name in names])
@@ -0,0 +1,67 @@
+# device/signals.py
+from django.conf import settings
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from device.models import Device
+from device.services.analytics_cache import invalidate_analytics
+from device.services.device_registry import device_registry
+from device.services.versions import bump_resource
+
+
+@receiver(post_save, sender=Device)
+@receiver(post_delete, sender=Device)
+def invalidate_device_registry(sender, instance, **kwargs):
+    device_registry.invalidate(instance.pk)
+
+
+@receiver(post_save, sender=Device)
+@receiver(post_delete, sender=Device)
+def invalidate_cached_analytics(sender, instance, **kwargs):
+    # Analytics responses embed device names and locations
+    invalidate_analytics()
+
+
+@receiver(post_save, sender=Device)
+@receiver(post_delete, sender=Device)
+def bump_device_list_version(sender, instance, **kwargs):
+    # Notifications embed their device and go with it, so their ETags depend on this too
+    bump_resource('devices')
+
+
+def _changes(sender, instance, fields, update_fields):
+    """Whether saving `instance` creates it or changes any of `fields` (attnames)"""
+    if instance._state.adding:
+        return True
+    if update_fields is not None and not set(update_fields) & {sender._meta.get_field(f).name for f in fields}:
+        return False
+    stored = sender._default_manager.filter(pk=instance.pk).values(*fields).first()
+    return stored is None or any(stored[field] != getattr(instance, field) for field in fields)
+
+
+# Live notification recipients depend only on device owners and user roles, so
+# they get their own versions; bumped after the save so no reader can cache
+# the old row under the new version.
+
+@receiver(pre_save, sender=Device)
+def detect_owner_change(sender, instance, update_fields=None, **kwargs):
+    instance._owner_changed = _changes(sender, instance, ['added_by_id'], update_fields)
+
+
+@receiver(post_save, sender=Device)
+@receiver(post_delete, sender=Device)
+def bump_device_owner_version(sender, instance, **kwargs):
+    if getattr(instance, '_owner_changed', True):
+        bump_resource('device_owners')
+
+
+@receiver(pre_save, sender=settings.AUTH_USER_MODEL)
+def detect_role_change(sender, instance, update_fields=None, **kwargs):
+    instance._role_changed = _changes(sender, instance, ['role', 'is_active'], update_fields)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def bump_user_role_version(sender, instance, **kwargs):
+    if getattr(instance, '_role_changed', True):
+        bump_resource('user_roles')
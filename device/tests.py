@@ -1,3 +1,1326 @@
-from django.test import TestCase
+import csv
+import gzip
+import json
+import threading
+import time
+import zlib
+from datetime import date, timedelta, timezone as dt_timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from importlib import import_module
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models.functions import TruncDate, TruncHour
+from django.core.management import CommandError, call_command
+from django.test import AsyncClient, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from device.models import (
+    AlertLevel, BackgroundJob, DailyReadingRollup, Device, DeviceData, DeviceState, ExpoPushToken, HourlyReadingRollup,
+    Notification, NotificationOutbox,
+)
+from device.services import save_readings
+from device.services import partitions
+from device.services.analytics_cache import analytics_cache_settings, _compute
+from device.services.device_registry import DeviceRegistry, device_registry, merge_device_metadata
+from device.services.device_state import rebuild_device_state
+from device.services.downsampling import lttb
+from device.services.exports import READING_EXPORT_HEADER
+from device.services.ingest_buffer import IngestBuffer
+from device.services.jobs import claim_job, run_job, run_pending_job
+from device.services.notifications import deliver_websocket, evaluate_notifications, send_notifications
+from device.services.recipients import recipient_ids
+from device.services.notification_counters import add_notification, delete_notifications, mark_read, unread_counts
+from device.services.outbox import backoff_delay, claim_batch, dispatch_pending
+from device.services.single_flight import SingleFlight
+from device.services.push import ExpoPushClient
+from device.services.rollups import _aggregate
+from device.views.data_views import MAX_BATCH_READINGS
+
+
+class FakeExpoHandler(BaseHTTPRequestHandler):
+    """Stand-in for Expo's push endpoint: returns one ok ticket per message"""
+    protocol_version = 'HTTP/1.1'  # keep-alive, so connection reuse is observable
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        messages = json.loads(body)
+        self.server.requests.append({'client_port': self.client_address[1], 'messages': messages})
+
+        if self.server.fail_next:
+            self.server.fail_next = False
+            status, payload = 500, {'errors': [{'code': 'INTERNAL', 'message': 'boom'}]}
+        else:
+            status, payload = 200, {'data': [
+                {'status': 'ok', 'id': f"ticket-{message['to']}"} for message in messages
+            ]}
+
+        response = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, *args):
+        pass
+
+
+class ExpoPushClientTests(SimpleTestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), FakeExpoHandler)
+        self.server.requests = []
+        self.server.fail_next = False
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.client = ExpoPushClient(url=f"http://127.0.0.1:{self.server.server_port}/push/send")
+
+    def tearDown(self):
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _messages(self, count):
+        return [
+            ExpoPushClient.build_message(f"ExponentPushToken[{i}]", "Low Tissue Alert", "Low tissue detected")
+            for i in range(count)
+        ]
+
+    def test_send_chunks_into_batches_of_100(self):
+        tickets = self.client.send(self._messages(250))
+
+        self.assertEqual([len(r['messages']) for r in self.server.requests], [100, 100, 50])
+        self.assertEqual(len(tickets), 250)
+        self.assertEqual(tickets[0]['id'], "ticket-ExponentPushToken[0]")
+        self.assertEqual(tickets[249]['id'], "ticket-ExponentPushToken[249]")
+
+    def test_connection_is_reused_across_batches(self):
+        self.client.send(self._messages(300))
+
+        self.assertEqual(len({r['client_port'] for r in self.server.requests}), 1)
+
+    def test_failed_batch_returns_error_tickets_for_its_messages_only(self):
+        self.server.fail_next = True
+        with self.assertLogs('device.services.push', 'WARNING'):
+            tickets = self.client.send(self._messages(150))
+
+        self.assertTrue(all(t['status'] == 'error' for t in tickets[:100]))
+        self.assertTrue(all(t['status'] == 'ok' for t in tickets[100:]))
+        self.assertEqual(tickets[0]['message'], 'boom')
+
+    def test_unreachable_server_returns_error_tickets(self):
+        self.server.shutdown()
+        self.server.server_close()
+        client = ExpoPushClient(url=f"http://127.0.0.1:{self.server.server_port}/push/send", timeout=1)
+
+        with self.assertLogs('device.services.push', 'WARNING'):
+            tickets = client.send(self._messages(2))
+
+        self.assertEqual([t['status'] for t in tickets], ['error', 'error'])
+
+
+class DeviceAPITestCase(TestCase):
+    """An authenticated API client on an empty cache, plus factories for the usual fixtures"""
+    username = 'tester'
+
+    def setUp(self):
+        cache.clear()
+        self.user = self.create_user(self.username)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    @staticmethod
+    def create_user(username, **fields):
+        return get_user_model().objects.create_user(
+            username=username, email=f'{username}@example.com', password='x', **fields
+        )
+
+    @staticmethod
+    def create_device(name="Dispenser", **fields):
+        return Device.objects.create(name=name, **{'room_number': '1', 'floor_number': 1, **fields})
+
+
+class IngestBufferTests(SimpleTestCase):
+    """The flusher is exercised against a recording save_readings, so no rows cross threads"""
+
+    def setUp(self):
+        self.batches = []
+        self.failures = 0
+        self.during_failure = lambda: None
+        self.flushed = threading.Event()
+        patcher = mock.patch('device.services.ingest_buffer.save_readings', side_effect=self._save)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _save(self, readings):
+        if self.failures:
+            self.failures -= 1
+            self.during_failure()
+            raise RuntimeError("database unavailable")
+        self.batches.append(list(readings))
+        self.flushed.set()
+
+    def _buffer(self, **config):
+        buffer = IngestBuffer(**{'max_size': 100, 'flush_size': 50, 'flush_interval': 60, **config})
+        self.addCleanup(buffer.close)
+        return buffer
+
+    def test_flushes_when_flush_size_is_reached(self):
+        buffer = self._buffer(flush_size=3)
+        for reading in range(3):
+            buffer.add(reading)
+
+        self.assertTrue(self.flushed.wait(5))
+        self.assertEqual(self.batches, [[0, 1, 2]])
+        self.assertEqual(buffer.stats()['depth'], 0)
+
+    def test_flushes_when_oldest_reading_is_flush_interval_old(self):
+        buffer = self._buffer(flush_interval=0.1)
+        buffer.add('a')
+        buffer.add('b')
+
+        self.assertTrue(self.flushed.wait(5))
+        self.assertEqual(self.batches, [['a', 'b']])
+
+    def test_failed_flush_requeues_in_order(self):
+        buffer = self._buffer()
+        buffer.add(1)
+        buffer.add(2)
+        self.failures = 1
+        with self.assertLogs('device.services.ingest_buffer', 'ERROR'):
+            self.assertEqual(buffer.flush(), 0)
+        buffer.add(3)
+
+        self.assertEqual(buffer.stats()['failed_flushes'], 1)
+        self.assertEqual(buffer.flush(), 3)
+        self.assertEqual(self.batches, [[1, 2, 3]])
+
+    def test_requeue_beyond_max_size_drops_oldest(self):
+        buffer = self._buffer(max_size=3, flush_size=3)
+        buffer.add(1)
+        buffer.add(2)
+        # Two newer readings arrive while the failing flush is running
+        self.failures = 1
+        self.during_failure = lambda: (buffer.add(3), buffer.add(4))
+        with self.assertLogs('device.services.ingest_buffer', 'ERROR'):
+            buffer.flush()
+
+        self.assertEqual(list(buffer._items), [2, 3, 4])
+        self.assertEqual(buffer.stats()['dropped'], 1)
+
+    def test_close_drains_and_later_readings_write_through(self):
+        buffer = self._buffer()
+        buffer.add(1)
+        buffer.add(2)
+        buffer.close()
+
+        self.assertEqual(self.batches, [[1, 2]])
+        buffer.add(3)
+        self.assertEqual(self.batches, [[1, 2], [3]])
+        self.assertEqual(buffer.stats()['accepted'], 2)
+
+
+@override_settings(NOTIFICATION_OUTBOX_ENABLED=True, NOTIFICATION_OUTBOX={'MAX_ATTEMPTS': 3})
+class NotificationOutboxTests(DeviceAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.device = self.create_device()
+        self.tokens = []
+        for name in ('phone', 'tablet'):
+            token = ExpoPushToken.objects.create(user=self.create_user(name), token=f"ExponentPushToken[{name}]")
+            self.tokens.append(token.token)
+        self.push = mock.Mock()
+        self.push.send.side_effect = lambda messages: [self.ticket(m['to']) for m in messages]
+        patcher = mock.patch('device.services.notifications.get_push_client', return_value=self.push)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.errors = {}  # token -> Expo error code for the next send
+
+        reading = DeviceData(device=self.device, alert='LOW', count=1, refer_val=5, tamper=False)
+        save_readings([reading])
+        send_notifications(self.device, reading, evaluate_notifications('LOW', False))
+        self.entry = NotificationOutbox.objects.get()
+
+    def ticket(self, token):
+        error = self.errors.get(token)
+        if error is None:
+            return {'status': 'ok', 'id': f'ticket-{token}'}
+        return {'status': 'error', 'message': error, 'details': {'error': error}}
+
+    def _make_due(self):
+        NotificationOutbox.objects.update(next_attempt_at=timezone.now())
+
+    def test_backoff_schedule(self):
+        self.assertEqual([backoff_delay(attempt) for attempt in range(1, 6)], [5, 10, 20, 40, 80])
+        self.assertEqual(backoff_delay(20), 900)
+
+    def test_transient_failure_retries_only_failed_tokens(self):
+        self.errors = {self.tokens[1]: 'MessageRateExceeded'}
+        with self.assertLogs('device.services', 'WARNING'):
+            self.assertEqual(dispatch_pending(), (0, 1))
+
+        entry = NotificationOutbox.objects.get()
+        self.assertEqual((entry.status, entry.attempts, entry.websocket_sent), ('pending', 1, True))
+        self.assertEqual(entry.payload['retry_tokens'], [self.tokens[1]])
+        self.assertAlmostEqual((entry.next_attempt_at - timezone.now()).total_seconds(), 5, delta=2)
+        self.assertEqual(dispatch_pending(), (0, 0))  # not due yet
+
+        self.errors = {}
+        self._make_due()
+        self.assertEqual(dispatch_pending(), (1, 0))
+        self.assertEqual([m['to'] for m in self.push.send.call_args.args[0]], [self.tokens[1]])
+        self.assertFalse(NotificationOutbox.objects.exists())
+
+    def test_permanent_token_error_is_not_retried(self):
+        self.errors = {self.tokens[0]: 'DeviceNotRegistered'}
+        with self.assertLogs('device.services', 'WARNING'):
+            self.assertEqual(dispatch_pending(), (1, 0))
+        self.assertFalse(NotificationOutbox.objects.exists())
+
+    def test_gives_up_after_max_attempts(self):
+        self.errors = {token: 'RequestFailed' for token in self.tokens}
+        with self.assertLogs('device.services', 'WARNING'):
+            for _ in range(3):
+                self._make_due()
+                dispatch_pending()
+
+        entry = NotificationOutbox.objects.get()
+        self.assertEqual((entry.status, entry.attempts), ('failed', 3))
+        self._make_due()
+        self.assertEqual(dispatch_pending(), (0, 0))
+
+    def test_claimed_rows_are_reclaimed_only_after_the_lease(self):
+        self.assertEqual([entry.pk for entry in claim_batch()], [self.entry.pk])
+        self.assertEqual(claim_batch(), [])
+
+        NotificationOutbox.objects.update(claimed_at=timezone.now() - timedelta(seconds=301))
+        reclaimed = claim_batch()
+        self.assertEqual((reclaimed[0].pk, reclaimed[0].attempts), (self.entry.pk, 2))
+
+
+class DeviceStateTests(TestCase):
+    def setUp(self):
+        self.device = Device.objects.create(name="Dispenser", room_number='1', floor_number=1)
+        self.now = timezone.now()
+
+    def _reading(self, minutes_ago, alert='HIGH', tamper=False):
+        return DeviceData(device=self.device, alert=alert, count=10, refer_val=5, tamper=tamper,
+                          timestamp=self.now - timedelta(minutes=minutes_ago))
+
+    def test_state_follows_readings_in_time_order(self):
+        save_readings([self._reading(30)])
+        state = DeviceState.objects.get(device=self.device)
+        self.assertEqual((state.status, state.first_timestamp, state.last_status_change),
+                         ('high', self.now - timedelta(minutes=30), None))
+
+        save_readings([self._reading(10, alert='LOW', tamper=True), self._reading(20)])
+        state.refresh_from_db()
+        self.assertEqual((state.status, state.alert, state.tamper), ('critical', 'LOW', True))
+        self.assertEqual(state.last_status_change, self.now - timedelta(minutes=10))
+
+        # A late reading only moves first_timestamp back
+        save_readings([self._reading(60, alert='MEDIUM')])
+        state.refresh_from_db()
+        self.assertEqual((state.status, state.first_timestamp), ('critical', self.now - timedelta(minutes=60)))
+
+    def test_rebuild_matches_incremental_state(self):
+        save_readings([self._reading(minutes, alert=alert) for minutes, alert in ((50, 'HIGH'), (40, 'LOW'), (5, 'MEDIUM'))])
+        fields = ('alert', 'status', 'timestamp', 'first_timestamp', 'last_status_change')
+        incremental = DeviceState.objects.values(*fields).get(device=self.device)
+
+        DeviceState.objects.all().delete()
+        call_command('rebuild_device_state', stdout=StringIO())
+        self.assertEqual(DeviceState.objects.values(*fields).get(device=self.device), incremental)
+
+        DeviceData.objects.all().delete()
+        self.assertEqual(rebuild_device_state([self.device.pk]), 0)
+        self.assertFalse(DeviceState.objects.exists())
+
+
+class DeviceStateConcurrencyTests(TransactionTestCase):
+    def test_concurrent_ingest_reads_the_committed_state(self):
+        device = Device.objects.create(name="Dispenser", room_number='1', floor_number=1)
+        now = timezone.now()
+        first_saved, release = threading.Event(), threading.Event()
+
+        def first_ingest():
+            try:
+                with transaction.atomic():
+                    save_readings([DeviceData(device=device, alert='LOW', count=1, refer_val=5, tamper=False,
+                                              timestamp=now - timedelta(minutes=5))])
+                    first_saved.set()
+                    release.wait(5)
+            finally:
+                connection.close()
+
+        def second_ingest():
+            try:
+                save_readings([DeviceData(device=device, alert='HIGH', count=10, refer_val=5, tamper=False,
+                                          timestamp=now)])
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=first_ingest), threading.Thread(target=second_ingest)]
+        threads[0].start()
+        self.assertTrue(first_saved.wait(5))
+        threads[1].start()
+        time.sleep(0.3)  # the second ingest is now waiting on the first one's lock
+        release.set()
+        for thread in threads:
+            thread.join(10)
+
+        state = DeviceState.objects.get(device=device)
+        self.assertEqual((state.alert, state.first_timestamp, state.last_status_change),
+                         ('HIGH', now - timedelta(minutes=5), now))
+
+
+class RollupTests(TestCase):
+    FIELDS = ('device_id', 'bucket', 'total', 'low', 'medium', 'high', 'tamper', 'critical')
+
+    def setUp(self):
+        self.devices = [Device.objects.create(name=f"Dispenser {i}", room_number='1', floor_number=1) for i in range(2)]
+        self.start = timezone.now().replace(minute=0, second=0, microsecond=0) - timedelta(days=2)
+
+    def _readings(self, device, offsets_minutes):
+        cycle = [('LOW', True), ('LOW', False), ('MEDIUM', False), ('HIGH', True), ('FULL', False)]
+        return [
+            DeviceData(device=device, alert=cycle[i % 5][0], tamper=cycle[i % 5][1], count=i, refer_val=5,
+                       timestamp=self.start + timedelta(minutes=offset))
+            for i, offset in enumerate(offsets_minutes)
+        ]
+
+    def _rows(self, model):
+        return sorted(model.objects.values_list(*self.FIELDS))
+
+    def _raw(self, trunc):
+        rows = _aggregate(DeviceData.objects.all(), trunc)
+        return sorted(tuple(row[field] for field in self.FIELDS) for row in rows)
+
+    def test_incremental_rollups_match_raw_aggregates(self):
+        # Several batches landing in the same buckets exercise the ON CONFLICT increment
+        for device in self.devices:
+            save_readings(self._readings(device, range(0, 3000, 37)))
+            save_readings(self._readings(device, range(5, 3000, 53)))
+
+        self.assertEqual(self._rows(HourlyReadingRollup), self._raw(TruncHour('timestamp', tzinfo=dt_timezone.utc)))
+        self.assertEqual(self._rows(DailyReadingRollup), self._raw(TruncDate('timestamp', tzinfo=dt_timezone.utc)))
+        first = HourlyReadingRollup.objects.get(device=self.devices[0], bucket=self.start)
+        self.assertEqual((first.total, first.low, first.tamper, first.critical), (4, 4, 2, 2))
+
+    def test_rebuild_reproduces_incremental_rollups(self):
+        save_readings(self._readings(self.devices[0], range(0, 2000, 41)))
+        hourly, daily = self._rows(HourlyReadingRollup), self._rows(DailyReadingRollup)
+
+        HourlyReadingRollup.objects.update(total=0)
+        DailyReadingRollup.objects.all().delete()
+        call_command('rebuild_rollups', stdout=StringIO())
+
+        self.assertEqual(self._rows(HourlyReadingRollup), hourly)
+        self.assertEqual(self._rows(DailyReadingRollup), daily)
+
+    @override_settings(DEVICE_DATA_RETENTION={'RAW_DAYS': 1, 'HOURLY_DAYS': 30})
+    def test_rebuild_keeps_rollups_past_raw_retention(self):
+        save_readings(self._readings(self.devices[0], range(0, 2000, 41)))
+        call_command('apply_retention', stdout=StringIO())
+        hourly, daily = self._rows(HourlyReadingRollup), self._rows(DailyReadingRollup)
+        self.assertLess(DeviceData.objects.count(), len(range(0, 2000, 41)))
+
+        out = StringIO()
+        call_command('rebuild_rollups', stdout=out)
+        call_command('rebuild_rollups', '--since', '2000-01-01', stdout=StringIO())
+
+        self.assertIn("past retention", out.getvalue())
+        self.assertEqual(self._rows(HourlyReadingRollup), hourly)
+        self.assertEqual(self._rows(DailyReadingRollup), daily)
+
+
+class PartitionTests(TestCase):
+    # Postgres DDL is transactional, so each test's conversion is rolled back
+
+    def setUp(self):
+        self.device = Device.objects.create(name="Dispenser", room_number='1', floor_number=1)
+
+    def _reading(self, timestamp):
+        return DeviceData.objects.create(device=self.device, alert='LOW', count=1, refer_val=5, timestamp=timestamp)
+
+    def test_month_arithmetic(self):
+        self.assertEqual(partitions.month_start(date(2024, 2, 29)), date(2024, 2, 1))
+        self.assertEqual(partitions.add_months(date(2024, 11, 1), 1), date(2024, 12, 1))
+        self.assertEqual(partitions.add_months(date(2024, 11, 1), 2), date(2025, 1, 1))
+        self.assertEqual(partitions.add_months(date(2024, 1, 1), -1), date(2023, 12, 1))
+        self.assertEqual(partitions.add_months(date(2024, 1, 1), -25), date(2021, 12, 1))
+        self.assertEqual(partitions.partition_name(date(2024, 3, 1)), f"{DeviceData._meta.db_table}_p202403")
+
+    def test_convert_and_command_are_idempotent(self):
+        this_month = partitions.current_month()
+        old = self._reading(timezone.now() - timedelta(days=62))
+        connection.check_constraints()  # fire the deferred FK check before the table is swapped
+        call_command('manage_partitions', '--convert', '--months-ahead', '1', stdout=StringIO())
+
+        self.assertTrue(partitions.is_partitioned())
+        months = [month for month, _ in partitions.list_partitions()]
+        self.assertEqual(months[0], partitions.month_start(old.timestamp))
+        self.assertEqual(months[-1], partitions.add_months(this_month, 1))
+        self.assertEqual(len(months), len(set(months)))
+        self.assertTrue(DeviceData.objects.filter(pk=old.pk).exists())
+
+        out = StringIO()
+        call_command('manage_partitions', '--months-ahead', '1', stdout=out)
+        self.assertNotIn("Created", out.getvalue())
+        self.assertEqual([month for month, _ in partitions.list_partitions()], months)
+        self.assertEqual(partitions.ensure_partitions(months_ahead=1), [])
+
+    def test_new_partition_takes_over_default_partition_rows(self):
+        partitions.convert_to_partitioned(months_ahead=0)
+        stray = self._reading(timezone.now() + timedelta(days=70))
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT count(*) FROM "{partitions.default_partition_name()}"')
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+        created = partitions.ensure_partitions(months_ahead=3)
+
+        self.assertIn(partitions.partition_name(partitions.month_start(stray.timestamp)), created)
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT count(*) FROM "{partitions.default_partition_name()}"')
+            self.assertEqual(cursor.fetchone()[0], 0)
+        self.assertEqual(DeviceData.objects.get(pk=stray.pk).timestamp, stray.timestamp)
+
+    def test_command_needs_a_partitioned_table(self):
+        with self.assertRaisesMessage(CommandError, "--convert"):
+            call_command('manage_partitions', stdout=StringIO())
+
+
+class CompactColumnBackfillTests(TestCase):
+    """The 0016/0017 SQL on a scratch table shaped like DeviceData between 0015 and 0017"""
+    ALERTS = ['LOW', 'MEDIUM', 'HIGH', 'FULL', 'low', '', None]
+
+    def setUp(self):
+        self.backfill = import_module('device.migrations.0016_backfill_devicedata_compact_columns')
+        self.contract = import_module('device.migrations.0017_devicedata_drop_string_columns')
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "CREATE TEMPORARY TABLE legacy_data (id serial PRIMARY KEY, alert varchar(20), tamper varchar(10), "
+                "alert_code smallint NOT NULL DEFAULT 0, alert_text varchar(20) NOT NULL DEFAULT '', "
+                "tamper_flag boolean NOT NULL DEFAULT false)"
+            )
+            for alert in self.ALERTS:
+                for tamper in ('true', 'false'):
+                    cursor.execute("INSERT INTO legacy_data (alert, tamper) VALUES (%s, %s)", [alert, tamper])
+
+    def _rows(self, *columns):
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT {', '.join(columns)} FROM legacy_data ORDER BY id")
+            return cursor.fetchall()
+
+    def _expected(self):
+        return [(*AlertLevel.parse(alert), tamper == 'true') for alert, tamper in self._rows('alert', 'tamper')]
+
+    def test_backfill_maps_the_old_strings(self):
+        with connection.cursor() as cursor:
+            cursor.execute(self.backfill.BACKFILL_SQL.format(table='legacy_data'), [0, 1000])
+
+        self.assertEqual(self._rows('alert_code', 'alert_text', 'tamper_flag'), self._expected())
+
+    def test_catch_up_finishes_a_partial_backfill(self):
+        with connection.cursor() as cursor:
+            cursor.execute(self.backfill.BACKFILL_SQL.format(table='legacy_data'), [0, 8])
+            cursor.execute(self.contract.CATCH_UP_SQL.format(table='legacy_data'))
+
+        self.assertEqual(self._rows('alert_code', 'alert_text', 'tamper_flag'), self._expected())
+
+    def test_restore_inverts_the_backfill(self):
+        with connection.cursor() as cursor:
+            cursor.execute(self.backfill.BACKFILL_SQL.format(table='legacy_data'), [0, 1000])
+            cursor.execute("UPDATE legacy_data SET alert = NULL, tamper = NULL")
+            cursor.execute(self.contract.RESTORE_SQL.format(table='legacy_data'))
+
+        expected = [(AlertLevel.to_string(code, text), 'true' if flag else 'false') for code, text, flag in self._expected()]
+        self.assertEqual(self._rows('alert', 'tamper'), expected)
+
+
+class DeviceRegistryTests(TestCase):
+    def setUp(self):
+        self.devices = [
+            Device.objects.create(name=f"Dispenser {i}", device_id=f"AABBCC00000{i}", room_number='1', floor_number=1)
+            for i in range(3)
+        ]
+
+    def test_hits_misses_and_copies(self):
+        registry = DeviceRegistry(max_entries=10, ttl=300)
+        with self.assertNumQueries(1):
+            registry.get_by_pk(self.devices[0].pk)
+            device = registry.get_by_device_id('aa-bb-cc-00-00-00')
+        device.name = "Changed by caller"
+
+        self.assertEqual(registry.get_by_pk(self.devices[0].pk).name, "Dispenser 0")
+        self.assertEqual({k: v for k, v in registry.stats().items() if k in ('hits', 'misses')},
+                         {'hits': 2, 'misses': 1})
+        with self.assertRaises(Device.DoesNotExist):
+            registry.get_by_pk(999999)
+
+    def test_evicts_least_recently_used(self):
+        registry = DeviceRegistry(max_entries=2, ttl=300)
+        first, second, third = self.devices
+        registry.get_many([first.pk, second.pk])
+        registry.get_by_pk(first.pk)  # second is now the least recently used
+        registry.get_by_pk(third.pk)
+
+        self.assertEqual(registry.stats()['evictions'], 1)
+        with self.assertNumQueries(0):
+            registry.get_many([first.pk, third.pk])
+        with self.assertNumQueries(1):
+            registry.get_by_pk(second.pk)
+
+    def test_expired_entries_are_reloaded(self):
+        registry = DeviceRegistry(max_entries=10, ttl=300)
+        registry.get_by_pk(self.devices[0].pk)
+        with mock.patch('device.services.device_registry.time.monotonic', return_value=time.monotonic() + 301):
+            with self.assertNumQueries(1):
+                registry.get_by_pk(self.devices[0].pk)
+
+    def test_save_and_delete_invalidate_the_shared_registry(self):
+        device_registry.clear()
+        device = self.devices[0]
+        device_registry.get_by_pk(device.pk)
+
+        device.name = "Renamed"
+        device.save()
+        self.assertEqual(device_registry.get_by_pk(device.pk).name, "Renamed")
+
+        device.delete()
+        with self.assertRaises(Device.DoesNotExist):
+            device_registry.get_by_pk(device.pk)
+        with self.assertRaises(Device.DoesNotExist):
+            device_registry.get_by_device_id("AA:BB:CC:00:00:00")
+
+
+class BatchIngestTests(DeviceAPITestCase):
+    URL = '/api/device/device-data/submit/batch/'
+
+    def setUp(self):
+        super().setUp()
+        self.device = self.create_device()
+
+    def _reading(self, **fields):
+        return {'DID': self.device.id, 'ALERT': 'HIGH', 'count': 10, 'REFER_Val': 5, 'TAMPER': False, **fields}
+
+    def test_valid_batch_is_recorded(self):
+        response = self.client.post(self.URL, {'readings': [
+            self._reading(), self._reading(ALERT='LOW', count=1),
+        ]}, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        body = response.json()
+        self.assertEqual((body['created'], body['failed']), (2, 0))
+        self.assertEqual([r['notification_types'] for r in body['results']], [[], ['low']])
+        self.assertEqual(DeviceData.objects.filter(device=self.device).count(), 2)
+        self.assertEqual(Notification.objects.filter(device=self.device).count(), 1)
+
+    def test_invalid_items_and_unknown_devices_fail_individually(self):
+        response = self.client.post(self.URL, [
+            self._reading(),
+            self._reading(count='many'),
+            {'DID': self.device.id},
+            'reading',
+            self._reading(DID=999999),
+        ], format='json')
+
+        self.assertEqual(response.status_code, 201)
+        results = response.json()['results']
+        self.assertEqual([r['status'] for r in results], ['created', 'error', 'error', 'error', 'error'])
+        self.assertEqual(results[1]['error'], "DID, count and REFER_Val must be integers")
+        self.assertTrue(results[2]['error'].startswith("Missing fields: ALERT"))
+        self.assertEqual(results[3]['error'], "Reading must be an object")
+        self.assertEqual(results[4]['error'], "Device not found")
+        self.assertEqual(DeviceData.objects.count(), 1)
+
+    def test_rejects_empty_oversized_or_all_invalid_batches(self):
+        self.assertEqual(self.client.post(self.URL, {'readings': []}, format='json').status_code, 400)
+        oversized = self.client.post(self.URL, [self._reading()] * (MAX_BATCH_READINGS + 1), format='json')
+        self.assertEqual(oversized.status_code, 400)
+        self.assertIn("Batch too large", oversized.json()['error'])
+        self.assertEqual(self.client.post(self.URL, [self._reading(DID=999999)], format='json').status_code, 400)
+        self.assertEqual(DeviceData.objects.count(), 0)
+
+
+@override_settings(DEVICE_ANALYTICS_CACHE={'ENABLED': False})
+class AnalyticsQueryCountTests(DeviceAPITestCase):
+    """The per-device analytics endpoints must cost the same number of queries for any fleet size"""
+    ENDPOINTS = {
+        '/api/device/device-analytics/': 2,
+        '/api/device/device-analytics/summary/': 5,
+        '/api/device/device-analytics/realtime-status/': 1,
+        '/api/device/device-analytics/status-summary/': 1,
+        '/api/device/device-analytics/status-distribution/': 3,
+    }
+
+    def setUp(self):
+        super().setUp()
+        self.now = timezone.now()
+
+    def _add_devices(self, count):
+        readings = []
+        for _ in range(count):
+            device = self.create_device(f"Dispenser {Device.objects.count()}")
+            readings += [
+                DeviceData(device=device, alert='HIGH', count=10, refer_val=5, tamper=False,
+                           timestamp=self.now - timedelta(days=3)),
+                DeviceData(device=device, alert='LOW', count=1, refer_val=5, tamper=True,
+                           timestamp=self.now - timedelta(hours=1)),
+            ]
+        save_readings(readings)
+
+    def _query_count(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_devices(self):
+        self._add_devices(2)
+        small_fleet = {url: self._query_count(url) for url in self.ENDPOINTS}
+        self._add_devices(8)
+        large_fleet = {url: self._query_count(url) for url in self.ENDPOINTS}
+
+        self.assertEqual(small_fleet, large_fleet)
+        self.assertEqual(large_fleet, self.ENDPOINTS)
+
+    def test_status_distribution_counts(self):
+        self._add_devices(1)
+        device = self.client.get('/api/device/device-analytics/status-distribution/').json()['devices'][0]
+
+        self.assertEqual(device['total_entries'], 2)
+        self.assertEqual(device['status_counts'], {
+            'normal': 0, 'low': 1, 'medium': 0, 'high': 1, 'tamper': 1, 'critical': 1,
+        })
+        self.assertEqual(device['recent_activity'], {'entries_24h': 1, 'alerts_24h': 1})
+        self.assertEqual(device['current_values']['alert'], 'LOW')
+        self.assertTrue(device['current_values']['tamper'])
+
+    def test_summary_counts(self):
+        self._add_devices(3)
+        body = self.client.get('/api/device/device-analytics/summary/').json()
+
+        self.assertEqual(body['summary'], {
+            'total_devices': 3, 'total_entries': 6, 'recent_entries_24h': 3, 'recent_alerts_24h': 3,
+        })
+        self.assertEqual(body['alert_distribution'], {'low': 3, 'medium': 0, 'high': 3, 'tamper': 3})
+        self.assertEqual([d['entry_count'] for d in body['most_active_devices']], [2, 2, 2])
+
+    @override_settings(DEVICE_DATA_RETENTION={'RAW_DAYS': 1, 'HOURLY_DAYS': 7})
+    def test_counts_survive_raw_retention(self):
+        self._add_devices(2)
+        before = self.client.get('/api/device/device-analytics/status-distribution/').json()['devices']
+
+        call_command('apply_retention', stdout=StringIO())
+        after = self.client.get('/api/device/device-analytics/status-distribution/').json()['devices']
+
+        self.assertEqual(DeviceData.objects.count(), 2)
+        self.assertEqual([d['status_counts'] for d in after], [d['status_counts'] for d in before])
+        self.assertEqual([d['total_entries'] for d in after], [2, 2])
+
+
+class DeviceDataPaginationTests(DeviceAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.device = self.create_device()
+        now = timezone.now()
+        # Pairs of readings share a timestamp so the id tie-breaker is exercised
+        DeviceData.objects.bulk_create([
+            DeviceData(device=self.device, alert='LOW', count=i, refer_val=5, tamper=False,
+                       timestamp=now - timedelta(minutes=i // 2))
+            for i in range(25)
+        ])
+
+    def _walk(self, url):
+        ids, query_counts = [], []
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            query_counts.append(len(queries))
+            ids += [reading['id'] for reading in response.json()['results']]
+            url = response.json()['next']
+        return ids, query_counts
+
+    def test_pages_cover_every_reading_once_newest_first(self):
+        ids, query_counts = self._walk(f'/api/device/device-data/{self.device.id}/?page_size=4')
+
+        expected = list(DeviceData.objects.order_by('-timestamp', '-id').values_list('id', flat=True))
+        self.assertEqual(ids, expected)
+        self.assertEqual(len(query_counts), 7)
+        self.assertEqual(len(set(query_counts)), 1)
+
+    def test_since_filter_and_invalid_cursor(self):
+        since = (timezone.now() - timedelta(minutes=2, seconds=30)).isoformat()
+        ids, _ = self._walk(f'/api/device/device-data/all/?page_size=2&since={since.replace("+", "%2B")}')
+        self.assertEqual(len(ids), 6)
+
+        self.assertEqual(self.client.get('/api/device/device-data/all/?cursor=bogus').status_code, 404)
+        self.assertEqual(self.client.get('/api/device/device-data/all/?since=yesterday').status_code, 400)
+
+
+class DownsamplingTests(SimpleTestCase):
+    def test_lttb_keeps_endpoints_and_spikes(self):
+        xs = list(range(1000))
+        ys = [0] * 1000
+        ys[500] = 100
+        selected = lttb(xs, ys, 20)
+
+        self.assertEqual(len(selected), 20)
+        self.assertEqual((selected[0], selected[-1]), (0, 999))
+        self.assertIn(500, selected)
+        self.assertEqual(selected, sorted(selected))
+
+    def test_lttb_returns_short_series_unchanged(self):
+        self.assertEqual(lttb([1, 2, 3], [5, 6, 7], 10), [0, 1, 2])
+
+
+class DeviceDataHistoryTests(DeviceAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.device = self.create_device()
+        self.until = timezone.now().replace(microsecond=0)
+        self.since = self.until - timedelta(hours=10)
+        DeviceData.objects.bulk_create([
+            DeviceData(device=self.device, alert='LOW', count=i % 60, refer_val=5, tamper=False,
+                       timestamp=self.since + timedelta(minutes=i))
+            for i in range(600)
+        ])
+
+    def _history(self, **params):
+        params = {'since': self.since.isoformat(), 'until': self.until.isoformat(), **params}
+        return self.client.get(f'/api/device/device-data/{self.device.id}/history/', params)
+
+    def test_lttb_history(self):
+        body = self._history(points=50).json()
+
+        self.assertEqual(body['source_points'], 600)
+        self.assertEqual(len(body['points']), 50)
+        self.assertEqual(body['points'][0]['count'], 0)
+        # Timestamps rebuilt from epoch seconds are the stored ones
+        stored = set(DeviceData.objects.values_list('timestamp', flat=True))
+        self.assertLessEqual({parse_datetime(point['timestamp']) for point in body['points']}, stored)
+        self.assertEqual(parse_datetime(body['points'][-1]['timestamp']), self.since + timedelta(minutes=599))
+
+    def test_minmax_history(self):
+        body = self._history(points=10, mode='minmax').json()
+
+        self.assertEqual(body['source_points'], 600)
+        self.assertEqual(len(body['points']), 10)
+        self.assertEqual([(b['min'], b['max'], b['readings']) for b in body['points']], [(0, 59, 60)] * 10)
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self._history(mode='median').status_code, 400)
+        self.assertEqual(self._history(since=self.until.isoformat()).status_code, 400)
+        long_range = (self.until - timedelta(days=60)).isoformat()
+        self.assertEqual(self._history(since=long_range).status_code, 400)
+        self.assertEqual(self._history(since=long_range, mode='minmax').status_code, 200)
+        self.assertEqual(self.client.get('/api/device/device-data/9999/history/').status_code, 404)
+
+
+@mock.patch('device.services.exports.ROWS_PER_WRITE', 2)
+class StreamingDownloadTests(DeviceAPITestCase):
+    """Downloads go through the ASGI handler and must arrive chunk by chunk"""
+
+    def setUp(self):
+        super().setUp()
+        self.devices = [self.create_device(f"Dispenser {i}") for i in range(3)]
+        self.device = self.devices[0]
+        now = timezone.now()
+        save_readings([
+            DeviceData(device=self.device, alert='LOW', count=i, refer_val=5, timestamp=now - timedelta(minutes=i))
+            for i in range(5)
+        ])
+        self.auth = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+
+    async def _chunks(self, path):
+        response = await self.async_client.get(path, headers=self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)  # a sync iterator would be buffered whole under ASGI
+        return response, [chunk async for chunk in response.streaming_content]
+
+    async def test_reading_export_streams_csv(self):
+        response, chunks = await self._chunks(f'/api/device/device-data/export/?device_id={self.device.pk}')
+
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(chunks[0].decode(), ','.join(READING_EXPORT_HEADER) + '\r\n')
+        self.assertEqual(len(chunks), 4)  # header, then 2 + 2 + 1 rows
+        rows = list(csv.reader(b''.join(chunks).decode().splitlines()))
+        self.assertEqual([row[7] for row in rows[1:]], ['0', '1', '2', '3', '4'])
+
+    async def test_analytics_csv_starts_with_its_header(self):
+        response, chunks = await self._chunks('/api/device/device-analytics/download/csv/?period=weekly')
+
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(next(csv.reader([chunks[0].decode()]))[:2], ['Device ID', 'Room'])
+        rows = list(csv.reader(b''.join(chunks).decode().splitlines()))
+        self.assertEqual({row[0] for row in rows[1:]}, {str(device.pk) for device in self.devices})
+
+    async def test_analytics_ndjson_is_framed_by_line(self):
+        response, chunks = await self._chunks('/api/device/device-analytics/download/ndjson/?period=weekly')
+
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertGreater(len(chunks), 1)
+        for chunk in chunks:
+            self.assertTrue(chunk.endswith(b'\n'))  # no record is split across chunks
+        records = [json.loads(line) for line in b''.join(chunks).decode().splitlines()]
+        self.assertEqual({record['device_id'] for record in records}, {device.pk for device in self.devices})
+        self.assertEqual(sum(record['total_entries'] for record in records), 5)
+
+    async def test_analytics_ndjson_gzip_decodes_as_it_arrives(self):
+        _, plain = await self._chunks('/api/device/device-analytics/download/ndjson/?period=weekly')
+        response, chunks = await self._chunks('/api/device/device-analytics/download/ndjson/?period=weekly&gzip=1')
+
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertTrue(response['Content-Disposition'].endswith('.ndjson.gz"'))
+        self.assertEqual(gzip.decompress(b''.join(chunks)), b''.join(plain))
+        # Sync-flushed: the first chunk alone already decodes to whole lines
+        self.assertTrue(zlib.decompressobj(31).decompress(chunks[0]).endswith(b'\n'))
+
+
+class AnalyticsCacheTests(DeviceAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.devices = [self.create_device(f"Dispenser {i}") for i in range(2)]
+
+    def _ingest(self, device):
+        with self.captureOnCommitCallbacks(execute=True):
+            save_readings([DeviceData(device=device, alert='LOW', count=1, refer_val=5, tamper=False)])
+
+    def _get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response['X-Analytics-Cache'], response.json()
+
+    def test_hit_until_new_data_arrives(self):
+        url = '/api/device/device-analytics/'
+        self.assertEqual(self._get(url)[0], 'MISS')
+        with self.assertNumQueries(0):
+            state, body = self._get(url)
+        self.assertEqual(state, 'HIT')
+        self.assertEqual([d['total_entries'] for d in body], [0, 0])
+
+        self._ingest(self.devices[0])
+        state, body = self._get(url)
+        self.assertEqual(state, 'MISS')
+        self.assertEqual([d['total_entries'] for d in body], [1, 0])
+
+    def test_device_scoped_entries_survive_other_devices_ingest(self):
+        url = f'/api/device/device-analytics/time-based/?period=monthly&device_id={self.devices[0].id}'
+        self._get(url)
+        self._ingest(self.devices[1])
+        self.assertEqual(self._get(url)[0], 'HIT')
+
+        self._ingest(self.devices[0])
+        self.assertEqual(self._get(url)[0], 'MISS')
+
+    def test_bypass_and_stats(self):
+        url = '/api/device/device-analytics/'
+        self._get(url)
+        self._get(url)
+        self.assertEqual(self._get(url + '?nocache=1')[0], 'BYPASS')
+
+        stats = self.client.get('/api/device/device-analytics/cache-stats/')
+        self.assertEqual(stats.status_code, 403)
+        admin = self.create_user('ops', role='admin')
+        self.client.force_authenticate(admin)
+        counters = self.client.get('/api/device/device-analytics/cache-stats/').json()['views']['advanced_analytics']
+        self.assertEqual(counters, {'hit': 1, 'miss': 1, 'coalesced': 0, 'not_modified': 0, 'bypass': 1})
+
+
+class SingleFlightTests(SimpleTestCase):
+    def test_concurrent_calls_share_one_computation(self):
+        flights = SingleFlight()
+        release = threading.Event()
+        calls, results = [], []
+
+        def compute():
+            calls.append(1)
+            release.wait(5)
+            return 'result'
+
+        threads = [threading.Thread(target=lambda: results.append(flights.do('key', compute))) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.2)  # let every caller reach the flight before it completes
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(results), [('result', False)] + [('result', True)] * 4)
+        self.assertEqual(flights.in_flight(), 0)
+
+    def test_waits_for_result_of_another_worker(self):
+        cache.clear()
+        config = {**analytics_cache_settings(), 'WAIT_TIMEOUT': 5, 'POLL_INTERVAL': 0.01}
+        cache.add('analytics:test:lock', 1)
+        threading.Timer(0.1, lambda: cache.set('analytics:test', {'total': 3})).start()
+
+        response = _compute(cache, 'analytics:test', 'test', config, lambda: self.fail("computed twice"))
+
+        self.assertEqual(response.data, {'total': 3})
+        self.assertEqual(response['X-Analytics-Cache'], 'COALESCED')
+
+
+class ConditionalGetTests(DeviceAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.device = self.create_device()
+
+    def _revalidate(self, url):
+        etag = self.client.get(url)['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        return response, len(queries)
+
+    def test_unchanged_lists_return_304_without_queries(self):
+        for url in ('/api/device/devices/', '/api/device/notifications/',
+                    '/api/device/notifications/unread-count/', '/api/device/device-analytics/realtime-status/'):
+            response, query_count = self._revalidate(url)
+            self.assertEqual(response.status_code, 304, url)
+            self.assertEqual(query_count, 0, url)
+            self.assertEqual(response.content, b'')
+
+    def test_new_notification_changes_etag(self):
+        url = '/api/device/notifications/unread-count/'
+        etag = self.client.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            add_notification(device=self.device, message="Refill", notification_type='low')
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'count': 1, 'by_type': {'low': 1}})
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_device_metadata_update_changes_etag(self):
+        url = '/api/device/devices/'
+        etag = self.client.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            merge_device_metadata(self.device.pk, {'signal_strength': -60})
+
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_heartbeat_metadata_leaves_notification_etags_alone(self):
+        urls = ('/api/device/notifications/', '/api/device/notifications/unread-count/')
+        etags = {url: self.client.get(url)['ETag'] for url in urls}
+        with self.captureOnCommitCallbacks(execute=True):
+            merge_device_metadata(self.device.pk, {'signal_strength': -60})
+
+        for url in urls:
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etags[url]).status_code, 304, url)
+
+    def test_unread_count_ignores_device_changes(self):
+        # The notification list embeds device names; the unread count does not
+        urls = ('/api/device/notifications/', '/api/device/notifications/unread-count/')
+        etags = {url: self.client.get(url)['ETag'] for url in urls}
+        with self.captureOnCommitCallbacks(execute=True):
+            self.device.name = "Renamed"
+            self.device.save()
+
+        self.assertEqual(self.client.get(urls[0], HTTP_IF_NONE_MATCH=etags[urls[0]]).status_code, 200)
+        self.assertEqual(self.client.get(urls[1], HTTP_IF_NONE_MATCH=etags[urls[1]]).status_code, 304)
+
+
+class NotificationListTests(DeviceAPITestCase):
+    username = 'staff'
+
+    def _add(self, count, **fields):
+        for i in range(count):
+            device = self.create_device(f"Dispenser {i}", room_number='2', floor_number=3, added_by=self.user)
+            Notification.objects.create(device=device, message="Refill", **fields)
+
+    def _get(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json(), len(queries)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        self._add(2)
+        _, few = self._get('/api/device/notifications/')
+        self._add(8)
+        body, many = self._get('/api/device/notifications/')
+
+        self.assertEqual(few, many)
+        self.assertEqual(many, 1)
+        self.assertEqual(body['results'][0]['device']['added_by_username'], 'staff')
+
+    def test_filters_pagination_and_slim_mode(self):
+        self._add(3, notification_type='low')
+        self._add(2, notification_type='tamper', is_read=True)
+
+        body, _ = self._get('/api/device/notifications/?type=low&is_read=false&page_size=2&slim=1')
+        self.assertEqual(len(body['results']), 2)
+        self.assertEqual(set(body['results'][0]['device']), {'id', 'name', 'room_number', 'floor_number'})
+        rest, _ = self._get(body['next'])
+        self.assertEqual(len(rest['results']), 1)
+        self.assertIsNone(rest['next'])
+
+        device_id = Notification.objects.filter(notification_type='tamper').first().device_id
+        body, _ = self._get(f'/api/device/notifications/?device={device_id}')
+        self.assertEqual([n['device_id'] for n in body['results']], [device_id])
+        self.assertEqual(self.client.get('/api/device/notifications/?type=urgent').status_code, 400)
+
+
+class NotificationCounterTests(DeviceAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.devices = [self.create_device(f"Dispenser {i}") for i in range(2)]
+        self.notifications = [
+            add_notification(device=device, message="Alert", notification_type=notification_type)
+            for device in self.devices for notification_type in ('low', 'low', 'tamper')
+        ]
+
+    def test_counts_follow_read_delete_and_clear(self):
+        self.assertEqual(unread_counts(), {'count': 6, 'by_type': {'low': 4, 'tamper': 2}})
+
+        first, second = self.notifications[0], self.notifications[1]
+        self.client.post(f'/api/device/notifications/{first.pk}/mark-read/')
+        self.client.post(f'/api/device/notifications/{first.pk}/mark-read/')
+        self.client.delete(f'/api/device/notifications/{first.pk}/')
+        self.client.delete(f'/api/device/notifications/{second.pk}/')
+        self.assertEqual(unread_counts(), {'count': 4, 'by_type': {'low': 2, 'tamper': 2}})
+        self.assertEqual(unread_counts(self.devices[0].id), {'count': 1, 'by_type': {'tamper': 1}})
+
+        self.devices[1].delete()
+        self.assertEqual(unread_counts()['count'], 1)
+        self.client.post('/api/device/notifications/clear-all/')
+        run_pending_job()
+        self.assertEqual(unread_counts(), {'count': 0, 'by_type': {}})
+
+    def test_endpoint_is_a_single_query_and_rebuild_matches(self):
+        with self.assertNumQueries(1):
+            body = self.client.get('/api/device/notifications/unread-count/').json()
+        self.assertEqual(body, {'count': 6, 'by_type': {'low': 4, 'tamper': 2}})
+
+        Notification.objects.filter(notification_type='tamper').update(is_read=True)  # bypasses the counters
+        call_command('rebuild_notification_counters', stdout=StringIO())
+        self.assertEqual(unread_counts(), {'count': 4, 'by_type': {'low': 4}})
+
+
+class NotificationBulkTests(DeviceAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.device = self.create_device()
+        self.low = [add_notification(device=self.device, message="Low", notification_type='low') for _ in range(5)]
+        self.tamper = add_notification(device=self.device, message="Tamper", notification_type='tamper')
+
+    def _post(self, url, body):
+        return self.client.post(url, body, format='json')
+
+    def test_mark_read_by_ids_is_constant_work(self):
+        ids = [n.pk for n in self.low[:3]]
+        with CaptureQueriesContext(connection) as few:
+            self.assertEqual(self._post('/api/device/notifications/bulk/mark-read/', {'ids': ids[:1]}).json(), {'updated': 1})
+        with CaptureQueriesContext(connection) as many:
+            self.assertEqual(self._post('/api/device/notifications/bulk/mark-read/', {'ids': ids}).json(), {'updated': 2})
+
+        self.assertEqual(len(few), len(many))
+        self.assertEqual(unread_counts(), {'count': 3, 'by_type': {'low': 2, 'tamper': 1}})
+
+    def test_delete_by_filter(self):
+        self._post('/api/device/notifications/bulk/mark-read/', {'type': ['low']})
+        body = self._post('/api/device/notifications/bulk/delete/', {
+            'device': self.device.id, 'is_read': True, 'before': (timezone.now() + timedelta(minutes=1)).isoformat(),
+        }).json()
+
+        self.assertEqual(body, {'deleted': 5})
+        self.assertEqual(list(Notification.objects.values_list('pk', flat=True)), [self.tamper.pk])
+        self.assertEqual(unread_counts(), {'count': 1, 'by_type': {'tamper': 1}})
+
+    def test_delete_is_one_statement_whatever_the_selection(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(delete_notifications(Notification.objects.filter(notification_type='low')), 5)
+
+        statements = [query['sql'] for query in queries if query['sql'].startswith(('DELETE', 'SELECT'))]
+        self.assertEqual(len(statements), 1)
+        self.assertIn('RETURNING', statements[0])
+        self.assertEqual(unread_counts(), {'count': 1, 'by_type': {'tamper': 1}})
+
+    def test_rejects_empty_or_invalid_selection(self):
+        for body in ({}, {'ids': 'all'}, {'type': ['urgent']}, {'before': 'soon'}):
+            self.assertEqual(self._post('/api/device/notifications/bulk/delete/', body).status_code, 400, body)
+        self.assertEqual(Notification.objects.count(), 6)
+
+
+@override_settings(BACKGROUND_JOBS={'CHUNK_SIZE': 4})
+class BackgroundJobTests(DeviceAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.device = self.create_device()
+        self.other = self.create_device("Other", room_number='2')
+        for device in (self.device, self.other):
+            DeviceData.objects.bulk_create([
+                DeviceData(device=device, alert='LOW', count=i, refer_val=5, tamper=False) for i in range(10)
+            ])
+            HourlyReadingRollup.objects.create(device=device, bucket=timezone.now(), total=10, low=10)
+            for _ in range(3):
+                add_notification(device=device, message="Low", notification_type='low')
+
+    def test_clear_all_returns_job_and_keeps_newer_notifications(self):
+        response = self.client.post('/api/device/notifications/clear-all/')
+        self.assertEqual(response.status_code, 202)
+        job_id = response.json()['job_id']
+        self.assertEqual(Notification.objects.count(), 6)  # nothing deleted inside the request
+
+        newer = add_notification(device=self.device, message="Later", notification_type='tamper')
+        with self.captureOnCommitCallbacks(execute=True):
+            run_pending_job()
+
+        body = self.client.get(f'/api/device/jobs/{job_id}/').json()
+        self.assertEqual((body['status'], body['progress']), ('done', {'notifications': 6}))
+        self.assertEqual(list(Notification.objects.values_list('pk', flat=True)), [newer.pk])
+        self.assertEqual(unread_counts(), {'count': 1, 'by_type': {'tamper': 1}})
+
+    def test_delete_device_in_chunks(self):
+        response = self.client.delete(f'/api/device/devices/{self.device.id}/')
+        self.assertEqual(response.status_code, 202)
+        # A repeated request attaches to the queued job
+        self.assertEqual(self.client.delete(f'/api/device/devices/{self.device.id}/').json()['job_id'],
+                         response.json()['job_id'])
+
+        job = run_pending_job()
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'done')
+        self.assertEqual(job.progress, {'readings': 10, 'notifications': 3, 'hourly_rollups': 1, 'device': 1})
+        self.assertFalse(Device.objects.filter(pk=self.device.pk).exists())
+        self.assertEqual(DeviceData.objects.count(), 10)
+        self.assertEqual(unread_counts(), {'count': 3, 'by_type': {'low': 3}})
+
+    def test_interrupted_job_resumes_after_lease_expires(self):
+        job_id = self.client.delete(f'/api/device/devices/{self.device.id}/').json()['job_id']
+        job = claim_job()
+        # The worker dies after two chunks of readings
+        done = DeviceData.objects.filter(device=self.device).order_by('pk').values_list('pk', flat=True)[:8]
+        DeviceData.objects.filter(pk__in=list(done)).delete()
+        BackgroundJob.objects.filter(pk=job.pk).update(progress={'readings': 8})
+        self.assertIsNone(claim_job())  # still leased
+
+        BackgroundJob.objects.filter(pk=job_id).update(claimed_at=timezone.now() - timedelta(hours=1))
+        resumed = claim_job()
+        self.assertEqual((resumed.pk, resumed.attempts), (job_id, 2))
+        self.assertTrue(run_job(resumed))
+        self.assertEqual(resumed.progress['readings'], 10)
+        self.assertEqual(DeviceData.objects.filter(device=self.device.pk).count(), 0)
+
+    @override_settings(BACKGROUND_JOBS={'CHUNK_SIZE': 4, 'RUN_INLINE': True})
+    def test_runs_inline_without_a_worker(self):
+        response = self.client.delete(f'/api/device/devices/{self.device.id}/')
+
+        self.assertEqual(response.json()['status'], 'done')
+        self.assertFalse(Device.objects.filter(pk=self.device.pk).exists())
+        self.assertEqual(DeviceData.objects.count(), 10)
+        self.assertIsNone(run_pending_job())  # nothing left for a worker
+        self.assertEqual(self.client.post('/api/device/notifications/clear-all/').json()['status'], 'done')
+        self.assertEqual(Notification.objects.count(), 0)
+
+
+@override_settings(NOTIFICATION_RETENTION={
+    'RULES': {'info': {'days': 7, 'read_only': True}, 'critical': {'days': 90}}, 'BATCH_SIZE': 2,
+})
+class NotificationRetentionTests(DeviceAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.device = self.create_device()
+
+    def _add(self, notification_type, days_old, is_read=False):
+        notification = add_notification(device=self.device, message="Alert", notification_type=notification_type)
+        if is_read:
+            mark_read(Notification.objects.filter(pk=notification.pk))
+        Notification.objects.filter(pk=notification.pk).update(created_at=timezone.now() - timedelta(days=days_old))
+        return notification
+
+    def test_purges_per_type_rules_in_batches(self):
+        kept = [
+            self._add('info', 10),                 # unread info is kept
+            self._add('info', 3, is_read=True),    # too recent
+            self._add('critical', 30),
+            self._add('low', 400),                 # no rule for this type
+        ]
+        for _ in range(5):
+            self._add('info', 10, is_read=True)
+        self._add('critical', 100)
+
+        out = StringIO()
+        call_command('purge_notifications', '--dry-run', stdout=out)
+        self.assertIn('info: 5 notifications due for deletion', out.getvalue())
+        self.assertEqual(Notification.objects.count(), 10)
+
+        call_command('purge_notifications', stdout=StringIO())
+        self.assertEqual(set(Notification.objects.values_list('pk', flat=True)), {n.pk for n in kept})
+        self.assertEqual(unread_counts(), {'count': 3, 'by_type': {'info': 1, 'critical': 1, 'low': 1}})
+
+    @override_settings(NOTIFICATION_RETENTION={'RULES': {'urgent': {'days': 1}}})
+    def test_rejects_unknown_type(self):
+        with self.assertRaises(CommandError):
+            call_command('purge_notifications', stdout=StringIO())
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class NotificationFanOutTests(DeviceAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = self.create_user('boss', role='admin')
+        self.owner = self.create_user('owner')
+        self.stranger = self.create_user('stranger')
+        self.device = self.create_device(added_by=self.owner)
+
+    def _socket(self, user):
+        layer = get_channel_layer()
+        channel = async_to_sync(layer.new_channel)()
+        async_to_sync(layer.group_add)(f'notifications_{user.pk}', channel)
+        return layer, channel
+
+    def test_delivers_to_admins_and_owner_only(self):
+        sockets = {user.username: self._socket(user) for user in (self.admin, self.owner, self.stranger)}
+        deliver_websocket({'id': 1, 'device_id': self.device.pk, 'title': 'Low Tissue Alert'})
+
+        for username in ('boss', 'owner'):
+            layer, channel = sockets[username]
+            event = async_to_sync(layer.receive)(channel)
+            self.assertEqual(set(event), {'type', 'text'})  # the frame only, serialized once
+            self.assertEqual(json.loads(event['text'])['content']['title'], 'Low Tissue Alert')
+        layer, channel = sockets['stranger']
+        self.assertNotIn(channel, layer.channels)  # nothing was ever queued for it
+
+    def test_recipients_are_cached_until_a_device_or_user_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(recipient_ids(self.device.pk), [self.admin.pk, self.owner.pk])
+        with self.assertNumQueries(0):
+            recipient_ids(self.device.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.device.added_by = self.stranger
+            self.device.save()
+        self.assertEqual(recipient_ids(self.device.pk), [self.admin.pk, self.stranger.pk])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.owner.role = 'admin'
+            self.owner.save()
+        self.assertEqual(recipient_ids(self.device.pk), [self.admin.pk, self.owner.pk, self.stranger.pk])
+
+    def test_heartbeats_and_other_edits_keep_recipients_cached(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            recipient_ids(self.device.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            merge_device_metadata(self.device.pk, {'last_heartbeat': timezone.now().isoformat()})
+            self.device.name = "Renamed"
+            self.device.save()
+            self.owner.last_login = timezone.now()
+            self.owner.save(update_fields=['last_login'])
+            self.stranger.first_name = "Sam"
+            self.stranger.save()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(recipient_ids(self.device.pk), [self.admin.pk, self.owner.pk])
@@ -70,13 +70,23 @@ from .views.device_views import (
     check_device_status,
     update_device_status
 )
-from .views.data_views import receive_device_data, all_device_data, device_data_by_id
+from .views.data_views import (
+    receive_device_data,
+    receive_device_data_batch,
+    ingest_buffer_stats,
+    all_device_data,
+    device_data_by_id,
+    device_data_history,
+    export_device_data,
+)
 from .views.notification_views import (
     get_notifications, 
     register_push_token,
     delete_notification,
     mark_notification_as_read,
     clear_all_notifications,
+    bulk_mark_notifications_read,
+    bulk_delete_notifications,
     get_unread_count
 )
 from .views.analytics_views import (
@@ -88,11 +98,14 @@ from .views.analytics_views import (
     # download_analytics,
     download_csv_analytics,
     download_json_analytics,
+    download_ndjson_analytics,
 
     summary_analytics,
     device_status_summary,
     device_status_distribution,
+    analytics_cache_stats,
 )
+from .views.job_views import background_job_status
 
 urlpatterns = [
     # Device endpoints
@@ -102,14 +115,20 @@ urlpatterns = [
 
     # Device data endpoints
     path('device-data/submit/', receive_device_data, name='receive_device_data'),
+    path('device-data/submit/batch/', receive_device_data_batch, name='receive_device_data_batch'),
+    path('device-data/ingest-buffer/', ingest_buffer_stats, name='ingest_buffer_stats'),
     path('device-data/all/', all_device_data, name='all_device_data'),
+    path('device-data/export/', export_device_data, name='export_device_data'),
     path('device-data/<int:device_id>/', device_data_by_id, name='device_data_by_id'),
+    path('device-data/<int:device_id>/history/', device_data_history, name='device_data_history'),
 
     # Notification endpoints
     path('notifications/', get_notifications, name='get_notifications'),
     path('notifications/<int:pk>/', delete_notification, name='delete_notification'),
     path('notifications/<int:pk>/mark-read/', mark_notification_as_read, name='mark_notification_as_read'),
     path('notifications/clear-all/', clear_all_notifications, name='clear_all_notifications'),
+    path('notifications/bulk/mark-read/', bulk_mark_notifications_read, name='bulk_mark_notifications_read'),
+    path('notifications/bulk/delete/', bulk_delete_notifications, name='bulk_delete_notifications'),
     path('notifications/unread-count/', get_unread_count, name='get_unread_count'),
     path('expo-token/register/', register_push_token, name='register_push_token'),    # Analytics endpoints
     path('device-analytics/', advanced_analytics, name='advanced_analytics'),
@@ -120,6 +139,7 @@ urlpatterns = [
     path('device-analytics/realtime-status/', device_realtime_status, name='device_realtime_status'),
     path('device-analytics/status-summary/', device_status_summary, name='device_status_summary'),
     path('device-analytics/status-distribution/', device_status_distribution, name='device_status_distribution'),
+    path('device-analytics/cache-stats/', analytics_cache_stats, name='analytics_cache_stats'),
     
     # Device registration endpoints
     path('device/register/', register_device, name='register_device'),
@@ -129,8 +149,12 @@ urlpatterns = [
     path('devices/check-status/', check_device_status, name='check_device_status'),
     path('devices/update-status/', update_device_status, name='update_device_status'),
 
+    # Background jobs (clear-all, device deletion)
+    path('jobs/<int:pk>/', background_job_status, name='background_job_status'),
+
     path('device-analytics/download/csv/', download_csv_analytics, name='download_csv_analytics'),
     path('device-analytics/download/json/', download_json_analytics, name='download_json_analytics'),
+    path('device-analytics/download/ndjson/', download_ndjson_analytics, name='download_ndjson_analytics'),
 
     # test 
     path('test-csv/', test_csv_download, name='test_csv_download'),
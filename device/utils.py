@@ -1,18 +1,6 @@
-import requests
+from device.services.push import ExpoPushClient, get_push_client
 
 def send_push_notification(expo_token, title, body, data=None):
-    payload = {
-        "to": expo_token,
-        "sound": "default",
-        "title": title,
-        "body": body,
-        "data": data or {}
-    }
-
-    response = requests.post(
-        "https://exp.host/--/api/v2/push/send",
-        json=payload,
-        headers={"Content-Type": "application/json"}
-    )
-
-    return response.json()
+    """Send a single push message; returns its Expo ticket"""
+    message = ExpoPushClient.build_message(expo_token, title, body, data)
+    return get_push_client().send([message])[0]
@@ -3,7 +3,7 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
 from django.db.models import Max, Count, Q
 from django.utils import timezone
 from datetime import datetime, timedelta
@@ -12,11 +12,24 @@ import io
 import logging
 import json
 
-from device.models import Device, DeviceData
+from device.models import Device, DeviceData, DeviceState, DailyReadingRollup
+from device.permissions import IsCustomAdmin
+from device.services.analytics_cache import cache_stats, cached_analytics
+from device.services.exports import EXPORT_CHUNK_SIZE, async_stream, csv_stream, gzip_stream, ndjson_stream
+from device.services.retention import reading_counts
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
+
+def _latest_state(device):
+    """Latest reading of a device from DeviceState (None if it never reported)"""
+    try:
+        return device.state
+    except DeviceState.DoesNotExist:
+        return None
+
+
 @swagger_auto_schema(
     method='get',
     responses={200: openapi.Response('Analytics per device')},
@@ -24,18 +37,20 @@ logger = logging.getLogger(__name__)
 )
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@cached_analytics()
 def device_analytics(request):
-    devices = Device.objects.all()
+    devices = Device.objects.select_related('state')
     analytics = []
+    # All-time counts across raw readings and the rollups of expired ones
+    counts = reading_counts()
 
     for device in devices:
-        low_alerts = DeviceData.objects.filter(device=device, alert="LOW").count()
-        last_entry = DeviceData.objects.filter(device=device).order_by('-timestamp').first()
+        last_entry = _latest_state(device)
         analytics.append({
             "device_id": device.id,
             "room": device.room_number,
             "floor": device.floor_number,
-            "low_alert_count": low_alerts,
+            "low_alert_count": counts[device.id]['low'],
             "last_alert_time": last_entry.timestamp if last_entry else None
         })
 
@@ -49,25 +64,23 @@ def device_analytics(request):
 )
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@cached_analytics()
 def advanced_analytics(request):
     data = []
-    devices = Device.objects.all()
+    devices = Device.objects.select_related('state')
+    counts = reading_counts()
     for device in devices:
-        device_data = DeviceData.objects.filter(device=device)
-        low_alerts = device_data.filter(alert="LOW").count()
-        # Fix: Filter for string "true" instead of boolean True
-        tamper_count = device_data.filter(tamper="true").count()  # Changed this line
-        total_data = device_data.count()
-        last_alert = device_data.aggregate(Max('timestamp'))['timestamp__max']
+        device_counts = counts[device.id]
+        latest = _latest_state(device)
 
         data.append({
             "device_id": device.id,
             "room": device.room_number,
             "floor": device.floor_number,
-            "total_entries": total_data,
-            "low_alert_count": low_alerts,
-            "tamper_count": tamper_count,
-            "last_alert_time": last_alert
+            "total_entries": device_counts['total'],
+            "low_alert_count": device_counts['low'],
+            "tamper_count": device_counts['tamper'],
+            "last_alert_time": latest.timestamp if latest else None
         })
     return Response(data)
 
@@ -79,17 +92,18 @@ def advanced_analytics(request):
 )
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@cached_analytics(clock=True)
 def device_realtime_status(request):
     """
     Returns the current status of each device based on the latest data entry.
     This data changes as new data comes in from devices.
     """
-    devices = Device.objects.all()
+    devices = Device.objects.select_related('state')
     realtime_data = []
     
     for device in devices:
-        # Get the latest data entry for this device
-        latest_data = DeviceData.objects.filter(device=device).order_by('-timestamp').first()
+        # Latest reading for this device, maintained on ingest
+        latest_data = _latest_state(device)
         
         if latest_data:
             # Calculate time since last update
@@ -104,10 +118,10 @@ def device_realtime_status(request):
             status_priority = 0
             
             # Check current conditions
-            if latest_data.tamper == "true" and latest_data.alert == "LOW":
+            if latest_data.tamper and latest_data.alert == "LOW":
                 current_status = "critical"
                 status_priority = 3
-            elif latest_data.tamper == "true":
+            elif latest_data.tamper:
                 current_status = "tamper"
                 status_priority = 2
             elif latest_data.alert == "LOW":
@@ -129,7 +143,7 @@ def device_realtime_status(request):
                 "current_status": current_status,
                 "status_priority": status_priority,
                 "current_alert": latest_data.alert,
-                "current_tamper": latest_data.tamper == "true",
+                "current_tamper": latest_data.tamper,
                 "current_count": latest_data.count,
                 "last_updated": latest_data.timestamp,
                 "minutes_since_update": minutes_since_update,
@@ -166,17 +180,19 @@ def device_realtime_status(request):
 )
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@cached_analytics(clock=True)
 def device_status_summary(request):
     """
     Returns a summary of device statuses for dashboard display
     """
-    total_devices = Device.objects.count()
+    devices = list(Device.objects.select_related('state'))
+    total_devices = len(devices)
     now = timezone.now()
     
     # Get latest status for each device
     device_statuses = []
-    for device in Device.objects.all():
-        latest_data = DeviceData.objects.filter(device=device).order_by('-timestamp').first()
+    for device in devices:
+        latest_data = _latest_state(device)
         if latest_data:
             time_since = now - latest_data.timestamp
             is_active = time_since.total_seconds() <= 300  # 5 minutes
@@ -185,7 +201,7 @@ def device_status_summary(request):
                 'device_id': device.id,
                 'is_active': is_active,
                 'alert': latest_data.alert,
-                'tamper': latest_data.tamper == "true",
+                'tamper': latest_data.tamper,
                 'timestamp': latest_data.timestamp
             })
         else:
@@ -246,36 +262,41 @@ def device_status_summary(request):
 )
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@cached_analytics(clock=True)
 def summary_analytics(request):
     now = timezone.now()
     
-    # Overall stats
+    # Overall stats (raw readings plus the rollups of expired ones)
     total_devices = Device.objects.count()
-    total_entries = DeviceData.objects.count()
+    all_time = reading_counts(now=now).values()
+    total_entries = sum(counts['total'] for counts in all_time)
     
     # Recent activity (last 24 hours)
     last_24h = now - timedelta(hours=24)
-    recent_entries = DeviceData.objects.filter(timestamp__gte=last_24h).count()
-    recent_alerts = DeviceData.objects.filter(
-        timestamp__gte=last_24h,
-        alert__in=['LOW', 'HIGH', 'MEDIUM']
-    ).count()
+    recent = reading_counts(since=last_24h, now=now).values()
+    recent_entries = sum(counts['total'] for counts in recent)
+    recent_alerts = sum(counts['low'] + counts['high'] + counts['medium'] for counts in recent)
     
-    # Alert distribution (all time) - Fixed to use string "true"
+    # Alert distribution (all time)
     alert_distribution = {
-        'low': DeviceData.objects.filter(alert='LOW').count(),
-        'medium': DeviceData.objects.filter(alert='MEDIUM').count(),
-        'high': DeviceData.objects.filter(alert='HIGH').count(),
-        'tamper': DeviceData.objects.filter(tamper="true").count()  # Fixed this line
+        field: sum(counts[field] for counts in all_time)
+        for field in ('low', 'medium', 'high', 'tamper')
     }
     
     # Most active devices (last 7 days)
     last_week = now - timedelta(days=7)
-    active_devices = DeviceData.objects.filter(
-        timestamp__gte=last_week
-    ).values('device__id', 'device__room_number', 'device__floor_number').annotate(
-        entry_count=Count('id')
-    ).order_by('-entry_count')[:5]
+    weekly = reading_counts(since=last_week, now=now)
+    top_ids = sorted(weekly, key=lambda device_id: weekly[device_id]['total'], reverse=True)[:5]
+    rooms = Device.objects.in_bulk(top_ids)
+    active_devices = [
+        {
+            'device__id': device_id,
+            'device__room_number': rooms[device_id].room_number,
+            'device__floor_number': rooms[device_id].floor_number,
+            'entry_count': weekly[device_id]['total'],
+        }
+        for device_id in top_ids if device_id in rooms and weekly[device_id]['total']
+    ]
     
     return Response({
         'summary': {
@@ -291,7 +312,14 @@ def summary_analytics(request):
 
 
 # Helper function to get time-based analytics data
-def get_time_based_analytics_data(period, device_id=None):
+def _period_key(period, day, date_format):
+    if period == 'quarterly':
+        return f"{day.year}-Q{((day.month-1)//3)+1}"
+    return day.strftime(date_format)
+
+
+def _time_based_window(period):
+    """(start of window, period key format, period label) for a period, or None if unknown"""
     now = timezone.now()
     
     # Calculate date ranges based on period
@@ -313,30 +341,40 @@ def get_time_based_analytics_data(period, device_id=None):
         period_name = 'Year'
     else:
         return None
+    return start_date, date_format, period_name
+
+
+def iter_time_based_analytics(period, device_id=None):
+    """
+    Yield one entry per device ({device_id, room, floor, device_name, periods})
+    with counts grouped by week/month/quarter/year, served from the daily
+    rollups rather than raw DeviceData. The rollups are read in one streamed
+    pass ordered by device, so only one device's periods are held at a time.
+    Ranges start at the beginning of the first UTC day in the window.
+    """
+    start_date, date_format, period_name = _time_based_window(period)
 
     # Filter devices
-    devices = Device.objects.all()
+    devices = Device.objects.order_by('id')
+    rollups = DailyReadingRollup.objects.filter(bucket__gte=start_date.date())
     if device_id:
         devices = devices.filter(id=device_id)
-    
-    analytics_data = []
-    
-    for device in devices:
-        device_data = DeviceData.objects.filter(
-            device=device,
-            timestamp__gte=start_date
-        ).order_by('timestamp')
-        
-        # Group data by time periods
+        rollups = rollups.filter(device_id=device_id)
+    rollups = rollups.order_by('device_id', 'bucket').values_list(
+        'device_id', 'bucket', 'total', 'low', 'high', 'medium', 'tamper'
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    pending = next(rollups, None)
+
+    for device in devices.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        # Group this device's daily buckets by time period
         period_data = {}
-        
-        for data_point in device_data:
-            if period == 'quarterly':
-                quarter = f"{data_point.timestamp.year}-Q{((data_point.timestamp.month-1)//3)+1}"
-                period_key = quarter
-            else:
-                period_key = data_point.timestamp.strftime(date_format)
-            
+        while pending is not None and pending[0] <= device.id:
+            rollup_device_id, day, total, low, high, medium, tamper = pending
+            pending = next(rollups, None)
+            if rollup_device_id != device.id:
+                continue
+            period_key = _period_key(period, day, date_format)
+
             if period_key not in period_data:
                 period_data[period_key] = {
                     'total_entries': 0,
@@ -345,19 +383,14 @@ def get_time_based_analytics_data(period, device_id=None):
                     'high_alerts': 0,
                     'medium_alerts': 0
                 }
-            
-            period_data[period_key]['total_entries'] += 1
-            
-            if data_point.alert == 'LOW':
-                period_data[period_key]['low_alerts'] += 1
-            elif data_point.alert == 'HIGH':
-                period_data[period_key]['high_alerts'] += 1
-            elif data_point.alert == 'MEDIUM':
-                period_data[period_key]['medium_alerts'] += 1
-                
-            if data_point.tamper == "true":
-                period_data[period_key]['tamper_alerts'] += 1
-        
+
+            counts = period_data[period_key]
+            counts['total_entries'] += total
+            counts['low_alerts'] += low
+            counts['high_alerts'] += high
+            counts['medium_alerts'] += medium
+            counts['tamper_alerts'] += tamper
+
         # Convert to list format
         periods = []
         for period_key, data in sorted(period_data.items()):
@@ -367,19 +400,54 @@ def get_time_based_analytics_data(period, device_id=None):
                 **data
             })
         
-        analytics_data.append({
+        yield {
             'device_id': device.id,
             'room': device.room_number,
             'floor': device.floor_number,
             'device_name': getattr(device, 'name', f'Device {device.id}'),
             'periods': periods
-        })
+        }
+
+
+def get_time_based_analytics_data(period, device_id=None):
+    """Time-based analytics for all devices (or one) as a single dict; None for an unknown period"""
+    if _time_based_window(period) is None:
+        return None
     
     return {
         'period_type': period,
-        'data': analytics_data
+        'data': list(iter_time_based_analytics(period, device_id))
     }
 
+
+def _analytics_csv_rows(entries):
+    for device in entries:
+        device_id = device.get('device_id', '')
+        room = device.get('room', '')
+        floor = device.get('floor', '')
+        device_name = device.get('device_name', '')
+        
+        periods = device.get('periods', [])
+        if not periods:
+            yield [
+                device_id, room, floor, device_name, 'No data',
+                0, 0, 0, 0, 0
+            ]
+        else:
+            for period_data in periods:
+                yield [
+                    device_id,
+                    room,
+                    floor,
+                    device_name,
+                    period_data.get('period_name', ''),
+                    period_data.get('total_entries', 0),
+                    period_data.get('low_alerts', 0),
+                    period_data.get('high_alerts', 0),
+                    period_data.get('medium_alerts', 0),
+                    period_data.get('tamper_alerts', 0)
+                ]
+
 # Add this new function to your views.py
 @swagger_auto_schema(
     method='get',
@@ -411,67 +479,30 @@ def get_time_based_analytics_data(period, device_id=None):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def download_csv_analytics(request):
-    """Dedicated endpoint just for CSV downloads"""
+    """Dedicated endpoint just for CSV downloads, streamed as it is generated"""
     try:
         # Get parameters
         period = request.GET.get('period', 'weekly')
         device_id = request.GET.get('device_id')
         
-        # Get analytics data
-        analytics_data = get_time_based_analytics_data(period, device_id)
-        if analytics_data is None:
+        # Validate up front: once streaming starts, errors can no longer become a 400/500 response
+        if _time_based_window(period) is None:
             return Response({'error': 'Invalid period specified'}, status=400)
+        if device_id and not device_id.isdigit():
+            return Response({'error': 'device_id must be an integer'}, status=400)
         
         # Generate filename
         timestamp = timezone.now().strftime('%Y%m%d_%H%M%S')
         filename = f"analytics_{period}_{timestamp}"
         
-        # Create buffer
-        buffer = io.StringIO()
-        writer = csv.writer(buffer)
-        
-        # Write header row
-        writer.writerow([
+        header = [
             'Device ID', 'Room', 'Floor', 'Device Name', 'Period',
             'Total Entries', 'Low Alerts', 'High Alerts',
             'Medium Alerts', 'Tamper Alerts'
-        ])
-        
-        # Process device data
-        for device in analytics_data.get('data', []):
-            device_id = device.get('device_id', '')
-            room = device.get('room', '')
-            floor = device.get('floor', '')
-            device_name = device.get('device_name', '')
-            
-            periods = device.get('periods', [])
-            if not periods:
-                writer.writerow([
-                    device_id, room, floor, device_name, 'No data',
-                    0, 0, 0, 0, 0
-                ])
-            else:
-                for period_data in periods:
-                    writer.writerow([
-                        device_id,
-                        room,
-                        floor,
-                        device_name,
-                        period_data.get('period_name', ''),
-                        period_data.get('total_entries', 0),
-                        period_data.get('low_alerts', 0),
-                        period_data.get('high_alerts', 0),
-                        period_data.get('medium_alerts', 0),
-                        period_data.get('tamper_alerts', 0)
-                    ])
-        
-        # Get content
-        csv_content = buffer.getvalue()
-        buffer.close()
+        ]
+        rows = _analytics_csv_rows(iter_time_based_analytics(period, device_id))
         
-        # Create Django response object - key difference is forcing the content type
-        response = HttpResponse(content_type='text/csv')
-        response.write(csv_content)
+        response = StreamingHttpResponse(async_stream(csv_stream(header, rows)), content_type='text/csv')
         response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
         
         return response
@@ -549,6 +580,93 @@ def download_json_analytics(request):
 
 
 
+def _analytics_ndjson_records(period, entries):
+    """One flat record per device and period; devices without data get a single record with period null"""
+    for device in entries:
+        base = {
+            'period_type': period,
+            'device_id': device['device_id'],
+            'room': device['room'],
+            'floor': device['floor'],
+            'device_name': device['device_name'],
+        }
+        periods = device['periods'] or [{
+            'period': None,
+            'period_name': None,
+            'total_entries': 0,
+            'low_alerts': 0,
+            'tamper_alerts': 0,
+            'high_alerts': 0,
+            'medium_alerts': 0
+        }]
+        for period_data in periods:
+            yield {**base, **period_data}
+
+
+@swagger_auto_schema(
+    method='get',
+    manual_parameters=[
+        openapi.Parameter(
+            name='period',
+            in_=openapi.IN_QUERY,
+            description="Time period: weekly, monthly, quarterly, yearly",
+            type=openapi.TYPE_STRING,
+            required=False,
+            enum=['weekly', 'monthly', 'quarterly', 'yearly']
+        ),
+        openapi.Parameter(
+            name='device_id',
+            in_=openapi.IN_QUERY,
+            description="Optional device ID to filter",
+            type=openapi.TYPE_INTEGER,
+            required=False
+        ),
+        openapi.Parameter(
+            name='gzip',
+            in_=openapi.IN_QUERY,
+            description="Compress the stream (application/gzip, .ndjson.gz)",
+            type=openapi.TYPE_BOOLEAN,
+            required=False
+        )
+    ],
+    responses={
+        200: openapi.Response('Newline-delimited JSON analytics file'),
+        400: openapi.Response('Invalid request parameters')
+    },
+    operation_summary="Stream analytics as NDJSON",
+    operation_description=(
+        "Stream device analytics as newline-delimited JSON, one device/period record per line, "
+        "written as it is computed. Optionally gzip-compressed."
+    )
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def download_ndjson_analytics(request):
+    period = request.GET.get('period', 'weekly')
+    device_id = request.GET.get('device_id')
+    compress = request.GET.get('gzip', '').lower() in ('1', 'true', 'yes')
+    
+    # Validate up front: once streaming starts, errors can no longer become a 400 response
+    if _time_based_window(period) is None:
+        return Response({'error': 'Invalid period specified'}, status=400)
+    if device_id and not device_id.isdigit():
+        return Response({'error': 'device_id must be an integer'}, status=400)
+    
+    timestamp = timezone.now().strftime('%Y%m%d_%H%M%S')
+    filename = f"analytics_{period}_{timestamp}.ndjson"
+    
+    stream = ndjson_stream(_analytics_ndjson_records(period, iter_time_based_analytics(period, device_id)))
+    if compress:
+        response = StreamingHttpResponse(async_stream(gzip_stream(stream)), content_type='application/gzip')
+        filename += '.gz'
+    else:
+        response = StreamingHttpResponse(async_stream(stream), content_type='application/x-ndjson')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+
 # Original analytics endpoint
 @swagger_auto_schema(
     method='get',
@@ -561,6 +679,7 @@ def download_json_analytics(request):
 )
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@cached_analytics(clock=True)
 def time_based_analytics(request):
     period = request.GET.get('period', 'weekly')
     device_id = request.GET.get('device_id')
@@ -617,6 +736,7 @@ def test_csv_download(request):
 )
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@cached_analytics(clock=True)
 def device_status_distribution(request):
     """
     Returns detailed status distribution for each device including:
@@ -625,16 +745,20 @@ def device_status_distribution(request):
     - Status percentages
     - Last status change timestamp
     """
-    devices = Device.objects.all()
+    devices = Device.objects.select_related('state')
     distribution_data = []
+    # Historical counts for every device, across raw readings and rollups
+    now = timezone.now()
+    last_24h = now - timedelta(hours=24)
+    all_time_counts = reading_counts(now=now)
+    recent_counts = reading_counts(since=last_24h, now=now)
     
     for device in devices:
-        # Get all device data for this device
-        all_device_data = DeviceData.objects.filter(device=device)
-        total_entries = all_device_data.count()
+        device_counts = all_time_counts[device.id]
+        total_entries = device_counts['total']
         
-        # Get latest data for current status
-        latest_data = all_device_data.order_by('-timestamp').first()
+        # Latest reading for current status, maintained on ingest
+        latest_data = _latest_state(device)
         
         # Calculate status distribution
         status_counts = {
@@ -647,11 +771,11 @@ def device_status_distribution(request):
         }
         
         # Count different alert types
-        low_alerts = all_device_data.filter(alert='LOW').count()
-        medium_alerts = all_device_data.filter(alert='MEDIUM').count()
-        high_alerts = all_device_data.filter(alert='HIGH').count()
-        tamper_alerts = all_device_data.filter(tamper='true').count()
-        critical_alerts = all_device_data.filter(alert='LOW', tamper='true').count()
+        low_alerts = device_counts['low']
+        medium_alerts = device_counts['medium']
+        high_alerts = device_counts['high']
+        tamper_alerts = device_counts['tamper']
+        critical_alerts = device_counts['critical']
         
         # Normal status (everything else)
         normal_count = total_entries - low_alerts - medium_alerts - high_alerts
@@ -683,10 +807,10 @@ def device_status_distribution(request):
             is_active = time_since_update.total_seconds() <= 300  # 5 minutes
             
             if is_active:
-                if latest_data.tamper == "true" and latest_data.alert == "LOW":
+                if latest_data.tamper and latest_data.alert == "LOW":
                     current_status = "critical"
                     current_status_priority = 4
-                elif latest_data.tamper == "true":
+                elif latest_data.tamper:
                     current_status = "tamper"
                     current_status_priority = 3
                 elif latest_data.alert == "LOW":
@@ -706,28 +830,12 @@ def device_status_distribution(request):
                 current_status_priority = -1
         
         # Get recent activity (last 24 hours)
-        last_24h = timezone.now() - timedelta(hours=24)
-        recent_entries = all_device_data.filter(timestamp__gte=last_24h).count()
-        recent_alerts = all_device_data.filter(
-            timestamp__gte=last_24h,
-            alert__in=['LOW', 'MEDIUM', 'HIGH']
-        ).count()
+        device_recent = recent_counts[device.id]
+        recent_entries = device_recent['total']
+        recent_alerts = device_recent['low'] + device_recent['medium'] + device_recent['high']
         
-        # Last status change (when status actually changed)
-        last_status_change = None
-        if total_entries > 1:
-            # Get last two entries to compare
-            last_two = all_device_data.order_by('-timestamp')[:2]
-            if len(last_two) == 2:
-                current = last_two[0]
-                previous = last_two[1]
-                
-                # Check if status changed
-                current_alert_status = f"{current.alert}_{current.tamper}"
-                previous_alert_status = f"{previous.alert}_{previous.tamper}"
-                
-                if current_alert_status != previous_alert_status:
-                    last_status_change = current.timestamp
+        # Last status change (latest reading differs from the one before it)
+        last_status_change = latest_data.last_status_change if latest_data else None
         
         device_distribution = {
             'device_id': device.id,
@@ -747,11 +855,11 @@ def device_status_distribution(request):
             'timestamps': {
                 'last_updated': latest_data.timestamp if latest_data else None,
                 'last_status_change': last_status_change,
-                'first_entry': all_device_data.order_by('timestamp').first().timestamp if total_entries > 0 else None
+                'first_entry': latest_data.first_timestamp if latest_data else None
             },
             'current_values': {
                 'alert': latest_data.alert if latest_data else None,
-                'tamper': latest_data.tamper == 'true' if latest_data else False,
+                'tamper': latest_data.tamper if latest_data else False,
                 'count': latest_data.count if latest_data else 0,
                 'refer_val': latest_data.refer_val if latest_data else None
             } if latest_data else None
@@ -785,4 +893,15 @@ def device_status_distribution(request):
         'overall_statistics': overall_stats,
         'devices': distribution_data,
         'generated_at': timezone.now()
-    })
\ No newline at end of file
+    })
+
+
+@swagger_auto_schema(
+    method='get',
+    responses={200: openapi.Response('Analytics cache counters')},
+    operation_description="Get hit/miss/bypass counters of the analytics response cache and the current data versions. Admin only."
+)
+@api_view(['GET'])
+@permission_classes([IsCustomAdmin])
+def analytics_cache_stats(request):
+    return Response(cache_stats())
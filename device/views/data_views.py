@@ -165,12 +165,25 @@ from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from datetime import datetime, time, timedelta
+import logging
 
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
-from device.models import Device, DeviceData, Notification, ExpoPushToken
+from device.models import Device, DeviceData
+from device.pagination import KeysetPagination
+from device.permissions import IsCustomAdmin
 from device.serializers import DeviceDataSerializer
-from device.utils import send_push_notification
+from device.services.ingest import READING_FIELDS, build_reading, save_readings
+from device.services.notifications import evaluate_notifications, send_notifications
+from device.services.ingest_buffer import get_ingest_buffer, write_behind_enabled
+from device.services.device_registry import device_registry
+from device.services.downsampling import (
+    DEFAULT_HISTORY_POINTS, MAX_HISTORY_POINTS, MAX_LTTB_RANGE, lttb_series, minmax_series,
+)
+from device.services.exports import READING_EXPORT_HEADER, async_stream, csv_stream, filter_readings, iter_reading_rows
 
 device_data_schema = openapi.Schema(
     type=openapi.TYPE_OBJECT,
@@ -184,6 +197,19 @@ device_data_schema = openapi.Schema(
     }
 )
 
+device_data_batch_schema = openapi.Schema(
+    type=openapi.TYPE_OBJECT,
+    required=['readings'],
+    properties={
+        'readings': openapi.Schema(type=openapi.TYPE_ARRAY, items=device_data_schema),
+    }
+)
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on readings accepted in one batch request
+MAX_BATCH_READINGS = getattr(settings, 'DEVICE_DATA_MAX_BATCH_SIZE', 500)
+
 @swagger_auto_schema(
     method='post',
     request_body=device_data_schema,
@@ -194,125 +220,33 @@ device_data_schema = openapi.Schema(
 @permission_classes([AllowAny])
 def receive_device_data(request):
     try:
-        device = Device.objects.get(id=request.data.get('DID'))
-        
-        tamper_value = str(request.data.get('TAMPER')).lower()
-        
-        data = DeviceData.objects.create(
-            device=device,
-            alert=request.data.get('ALERT'),
-            count=request.data.get('count'),
-            refer_val=request.data.get('REFER_Val'),
-            tamper=tamper_value
-        )
+        device = device_registry.get_by_pk(request.data.get('DID'))
+
+        data = build_reading(device, request.data)
 
         # Check conditions for notifications
-        alert_status = request.data.get('ALERT')
-        is_low_alert = alert_status == "LOW"
-        is_tampered = tamper_value == "true"
-        
-        notifications_to_send = []
-        
-        # Check all three conditions with improved logic
-        if is_low_alert and is_tampered:
-            # Both conditions are true - CRITICAL
-            notifications_to_send.append({
-                "type": "critical",
-                "notification_type": "critical",  # Add this for consistency
-                "title": "CRITICAL Alert",
-                "message": f"  Low tissue AND tampering detected!",
-                "priority": 100
-            })
-        elif is_low_alert:
-            # Only LOW alert
-            notifications_to_send.append({
-                "type": "low",
-                "notification_type": "low",  # Add this for consistency
-                "title": "Low Tissue Alert", 
-                "message": f"Low tissue detected",
-                "priority": 80
-            })
-        elif is_tampered:
-            # Only TAMPER alert
-            notifications_to_send.append({
-                "type": "tamper",
-                "notification_type": "tamper",  # Add this for consistency
-                "title": "Tamper Alert",
-                "message": f" Device tampering detected",
-                "priority": 95
-            })
-          # Send all applicable notifications
-        for notif_data in notifications_to_send:
-            # Create notification record with enhanced fields
-            notification = Notification.objects.create(
-                device=device,
-                message=notif_data["message"],
-                title=notif_data["title"],
-                notification_type=notif_data["type"],
-                alert=alert_status,
-                tamper=tamper_value,
-                priority=notif_data["priority"]
-            )
-            
-            # Enhanced WebSocket message payload
-            channel_layer = get_channel_layer()
-            async_to_sync(channel_layer.group_send)(
-                "notifications",
-                {
-                    "type": "send_notification",
-                    "content": {
-                        "id": notification.id,
-                        "device_id": device.id,
-                        "device": {
-                            "id": device.id,
-                            "name": device.name if hasattr(device, 'name') else f"Device {device.id}",
-                            "device_id": device.id,
-                            "room_number": device.room_number,
-                            "floor_number": device.floor_number,
-                        },
-                        "room": device.room_number,
-                        "floor": device.floor_number,
-                        "timestamp": str(data.timestamp),
-                        "alert": alert_status,
-                        "tamper": tamper_value,
-                        "type": notif_data["type"],  # Primary type field
-                        "notification_type": notif_data["notification_type"],  # Secondary type field
-                        "title": notif_data["title"],
-                        "message": notif_data["message"],
-                        "priority": notif_data["priority"],
-                        "created_at": str(notification.created_at),
-                        "is_read": False,  # New notifications are unread
-                    }
-                }
-            )
-            
-            # Enhanced push notification with type
-            tokens = ExpoPushToken.objects.all()
-            for token_entry in tokens:
-                try:
-                    send_push_notification(
-                        token_entry.token,
-                        title=notif_data["title"],
-                        body=notif_data["message"],
-                        data={
-                            "device_id": device.id,
-                            "notification_id": notification.id,
-                            "type": notif_data["type"],
-                            "notification_type": notif_data["notification_type"],
-                            "priority": notif_data["priority"],
-                            "room": device.room_number,
-                            "floor": device.floor_number,
-                        }
-                    )
-                except Exception as e:
-                    print(f"Failed to send push notification to {token_entry.token}: {e}")
+        alert_status = data.alert
+        tamper_value = data.tamper
+        notifications_to_send = evaluate_notifications(alert_status, tamper_value)
+
+        # In write-behind mode routine readings are queued; alert/tamper readings
+        # are written immediately, after anything that was queued before them
+        buffered = write_behind_enabled() and not notifications_to_send
+        if buffered:
+            get_ingest_buffer().add(data)
+        else:
+            if write_behind_enabled():
+                get_ingest_buffer().flush()
+            save_readings([data])
+            send_notifications(device, data, notifications_to_send)
 
         return Response({
-            "message": "Data recorded successfully",
+            "message": "Data accepted" if buffered else "Data recorded successfully",
+            "buffered": buffered,
             "notifications_sent": len(notifications_to_send),
             "notification_types": [n["type"] for n in notifications_to_send],
             "alert_status": alert_status,
-            "tamper_status": tamper_value,
+            "tamper_status": data.tamper_text,
             "device_info": {
                 "id": device.id,
                 "room": device.room_number,
@@ -327,27 +261,292 @@ def receive_device_data(request):
         return Response({"error": str(e)}, status=500)
 
 
+def _validate_batch_item(item):
+    """Return an error message for a malformed batch item, or None if it is usable"""
+    if not isinstance(item, dict):
+        return "Reading must be an object"
+    missing = [field for field in READING_FIELDS if item.get(field) is None]
+    if missing:
+        return f"Missing fields: {', '.join(missing)}"
+    try:
+        int(item['DID'])
+        int(item['count'])
+        int(item['REFER_Val'])
+    except (TypeError, ValueError):
+        return "DID, count and REFER_Val must be integers"
+    return None
+
+
+@swagger_auto_schema(
+    method='post',
+    request_body=device_data_batch_schema,
+    responses={
+        201: openapi.Response('Per-reading results'),
+        400: 'Invalid batch'
+    },
+    operation_description=(
+        "Receive a batch of readings from a gateway (public). Accepts a JSON array of readings "
+        "or an object with a 'readings' array. Devices are resolved in one query and rows are "
+        "written with a single bulk insert; every reading is still evaluated for notifications."
+    )
+)
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def receive_device_data_batch(request):
+    payload = request.data
+    items = payload.get('readings') if isinstance(payload, dict) else payload
+
+    if not isinstance(items, list) or not items:
+        return Response({"error": "Expected a non-empty list of readings"}, status=400)
+    if len(items) > MAX_BATCH_READINGS:
+        return Response(
+            {"error": f"Batch too large: {len(items)} readings (max {MAX_BATCH_READINGS})"},
+            status=400
+        )
+
+    try:
+        errors = {}
+        for index, item in enumerate(items):
+            error = _validate_batch_item(item)
+            if error:
+                errors[index] = error
+
+        # Resolve every referenced device from the registry cache (misses in one query)
+        device_ids = {int(item['DID']) for index, item in enumerate(items) if index not in errors}
+        devices = device_registry.get_many(device_ids)
+
+        pending = []
+        for index, item in enumerate(items):
+            if index in errors:
+                continue
+            device = devices.get(int(item['DID']))
+            if device is None:
+                errors[index] = "Device not found"
+                continue
+            pending.append((index, build_reading(device, item)))
+
+        save_readings([data for _, data in pending])
+
+        results = [None] * len(items)
+        for index, data in pending:
+            notifications = evaluate_notifications(data.alert, data.tamper)
+            send_notifications(data.device, data, notifications)
+            results[index] = {
+                "index": index,
+                "status": "created",
+                "id": data.id,
+                "device_id": data.device_id,
+                "notifications_sent": len(notifications),
+                "notification_types": [n["type"] for n in notifications],
+                "alert_status": data.alert,
+                "tamper_status": data.tamper_text,
+            }
+
+        for index, error in errors.items():
+            item = items[index]
+            results[index] = {
+                "index": index,
+                "status": "error",
+                "device_id": item.get('DID') if isinstance(item, dict) else None,
+                "error": error,
+            }
+
+        return Response({
+            "message": f"{len(pending)} of {len(items)} readings recorded",
+            "created": len(pending),
+            "failed": len(errors),
+            "results": results,
+        }, status=201 if pending else 400)
+
+    except Exception as e:
+        logger.exception(f"Error in receive_device_data_batch: {str(e)}")
+        return Response({"error": str(e)}, status=500)
+
+
 @swagger_auto_schema(
     method='get',
-    responses={200: DeviceDataSerializer(many=True)},
-    operation_description="Get all recorded device data"
+    responses={200: openapi.Response('Write-behind buffer counters')},
+    operation_description="Get depth and flush latency counters of the write-behind ingest buffer. Admin only."
+)
+@api_view(['GET'])
+@permission_classes([IsCustomAdmin])
+def ingest_buffer_stats(request):
+    return Response({
+        "enabled": write_behind_enabled(),
+        **get_ingest_buffer().stats()
+    })
+
+
+def _parse_export_time(value):
+    """ISO datetime or date (midnight) as an aware datetime; raises ValueError if unparseable"""
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f"Invalid date/time: {value}")
+        parsed = datetime.combine(day, time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+reading_page_parameters = [
+    openapi.Parameter('cursor', openapi.IN_QUERY, description="Cursor from the previous page's 'next' link", type=openapi.TYPE_STRING),
+    openapi.Parameter('page_size', openapi.IN_QUERY, description="Readings per page (default 100, max 1000)", type=openapi.TYPE_INTEGER),
+    openapi.Parameter('since', openapi.IN_QUERY, description="From this ISO date/time, inclusive (optional)", type=openapi.TYPE_STRING),
+    openapi.Parameter('until', openapi.IN_QUERY, description="Up to this ISO date/time, exclusive (optional)", type=openapi.TYPE_STRING),
+]
+
+reading_page_schema = openapi.Schema(
+    type=openapi.TYPE_OBJECT,
+    properties={
+        'next': openapi.Schema(type=openapi.TYPE_STRING, format=openapi.FORMAT_URI, x_nullable=True),
+        'results': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_OBJECT)),
+    }
+)
+
+
+def _paginated_readings(request, data):
+    """Apply since/until and return one keyset page of `data`, newest first"""
+    try:
+        since = request.GET.get('since')
+        until = request.GET.get('until')
+        if since:
+            data = data.filter(timestamp__gte=_parse_export_time(since))
+        if until:
+            data = data.filter(timestamp__lt=_parse_export_time(until))
+    except ValueError as e:
+        return Response({"error": f"Invalid filter: {str(e)}"}, status=400)
+
+    paginator = KeysetPagination()
+    page = paginator.paginate_queryset(data, request)
+    serializer = DeviceDataSerializer(page, many=True)
+    return paginator.get_paginated_response(serializer.data)
+
+
+@swagger_auto_schema(
+    method='get',
+    manual_parameters=reading_page_parameters,
+    responses={200: reading_page_schema},
+    operation_description="Get recorded device data, newest first, one page at a time (follow 'next')"
 )
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def all_device_data(request):
     data = DeviceData.objects.all()
-    serializer = DeviceDataSerializer(data, many=True)
-    return Response(serializer.data)
+    return _paginated_readings(request, data)
 
 
 @swagger_auto_schema(
     method='get',
-    responses={200: DeviceDataSerializer(many=True)},
-    operation_description="Get device data by specific device ID"
+    manual_parameters=reading_page_parameters,
+    responses={200: reading_page_schema},
+    operation_description="Get device data by specific device ID, newest first, one page at a time (follow 'next')"
 )
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def device_data_by_id(request, device_id):
     data = DeviceData.objects.filter(device__id=device_id)
-    serializer = DeviceDataSerializer(data, many=True)
-    return Response(serializer.data)
+    return _paginated_readings(request, data)
+
+
+HISTORY_MODES = ('lttb', 'minmax')
+HISTORY_FIELDS = ('count', 'refer_val')
+
+
+@swagger_auto_schema(
+    method='get',
+    manual_parameters=[
+        openapi.Parameter('since', openapi.IN_QUERY, description="From this ISO date/time (default: 7 days ago)", type=openapi.TYPE_STRING),
+        openapi.Parameter('until', openapi.IN_QUERY, description="Up to this ISO date/time, exclusive (default: now)", type=openapi.TYPE_STRING),
+        openapi.Parameter('points', openapi.IN_QUERY, description=f"Target number of points (default {DEFAULT_HISTORY_POINTS}, max {MAX_HISTORY_POINTS})", type=openapi.TYPE_INTEGER),
+        openapi.Parameter('mode', openapi.IN_QUERY, description=f"'lttb' (representative readings, ranges up to {MAX_LTTB_RANGE.days} days) or 'minmax' (per-bucket min/max/avg)", type=openapi.TYPE_STRING, enum=list(HISTORY_MODES)),
+        openapi.Parameter('field', openapi.IN_QUERY, description="Reading value to chart", type=openapi.TYPE_STRING, enum=list(HISTORY_FIELDS)),
+    ],
+    responses={200: openapi.Response('Downsampled series'), 400: 'Invalid parameters', 404: 'Device not found'},
+    operation_description="Chart-sized history of one device: a time range reduced server-side to a fixed number of points"
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def device_data_history(request, device_id):
+    if not Device.objects.filter(id=device_id).exists():
+        return Response({"error": "Device not found"}, status=404)
+
+    mode = request.GET.get('mode', 'lttb')
+    field = request.GET.get('field', 'count')
+    if mode not in HISTORY_MODES:
+        return Response({"error": f"mode must be one of: {', '.join(HISTORY_MODES)}"}, status=400)
+    if field not in HISTORY_FIELDS:
+        return Response({"error": f"field must be one of: {', '.join(HISTORY_FIELDS)}"}, status=400)
+
+    try:
+        points = int(request.GET.get('points', DEFAULT_HISTORY_POINTS))
+        until = _parse_export_time(request.GET['until']) if request.GET.get('until') else timezone.now()
+        since = _parse_export_time(request.GET['since']) if request.GET.get('since') else until - timedelta(days=7)
+    except ValueError as e:
+        return Response({"error": f"Invalid parameter: {str(e)}"}, status=400)
+    if since >= until:
+        return Response({"error": "since must be before until"}, status=400)
+    if mode == 'lttb' and until - since > MAX_LTTB_RANGE:
+        return Response(
+            {"error": f"lttb covers at most {MAX_LTTB_RANGE.days} days; use mode=minmax for longer ranges"}, status=400
+        )
+    points = min(max(points, 3), MAX_HISTORY_POINTS)
+
+    readings = DeviceData.objects.filter(device_id=device_id, timestamp__gte=since, timestamp__lt=until)
+    response = {
+        "device_id": device_id,
+        "since": since,
+        "until": until,
+        "mode": mode,
+        "field": field,
+    }
+    if mode == 'lttb':
+        series, scanned = lttb_series(readings, field, points)
+        response["source_points"] = scanned
+        response["points"] = [{"timestamp": timestamp, field: value} for timestamp, value in series]
+    else:
+        buckets = minmax_series(readings, field, since, until, points)
+        response["source_points"] = sum(bucket['readings'] for bucket in buckets)
+        response["points"] = buckets
+    return Response(response)
+
+
+@swagger_auto_schema(
+    method='get',
+    manual_parameters=[
+        openapi.Parameter('device_id', openapi.IN_QUERY, description="Device ID(s), comma separated (optional)", type=openapi.TYPE_STRING),
+        openapi.Parameter('floor', openapi.IN_QUERY, description="Only devices on this floor (optional)", type=openapi.TYPE_INTEGER),
+        openapi.Parameter('room', openapi.IN_QUERY, description="Only devices in this room (optional)", type=openapi.TYPE_STRING),
+        openapi.Parameter('since', openapi.IN_QUERY, description="From this ISO date/time, inclusive (optional)", type=openapi.TYPE_STRING),
+        openapi.Parameter('until', openapi.IN_QUERY, description="Up to this ISO date/time, exclusive (optional)", type=openapi.TYPE_STRING),
+    ],
+    responses={200: openapi.Response('CSV file of raw readings'), 400: 'Invalid filters'},
+    operation_description=(
+        "Export raw readings as CSV, streamed while it is generated so large ranges start downloading "
+        "immediately. Rows are grouped by device, newest first."
+    )
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def export_device_data(request):
+    try:
+        device_ids = [int(value) for value in request.GET.get('device_id', '').split(',') if value.strip()]
+        floor = request.GET.get('floor')
+        floor = int(floor) if floor else None
+        since = request.GET.get('since')
+        until = request.GET.get('until')
+        since = _parse_export_time(since) if since else None
+        until = _parse_export_time(until) if until else None
+    except ValueError as e:
+        return Response({"error": f"Invalid filter: {str(e)}"}, status=400)
+
+    readings = filter_readings(
+        device_ids=device_ids, floor=floor, room=request.GET.get('room') or None, since=since, until=until
+    )
+    filename = f"readings_{timezone.now().strftime('%Y%m%d_%H%M%S')}.csv"
+    response = StreamingHttpResponse(
+        async_stream(csv_stream(READING_EXPORT_HEADER, iter_reading_rows(readings))), content_type='text/csv'
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
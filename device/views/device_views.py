@@ -10,9 +10,13 @@ from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 import logging
 
+from device.conditional import conditional_get
 from device.models import Device
 from device.serializers import DeviceSerializer
 from device.permissions import IsCustomAdmin
+from device.services.device_registry import device_registry, normalize_device_id, merge_device_metadata
+from device.services.jobs import enqueue_delete_device
+from device.services.versions import resource_versions
 
 logger = logging.getLogger(__name__)
 
@@ -49,6 +53,7 @@ def add_device(request):
 )
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@conditional_get(lambda request: resource_versions('devices', 'device_metadata'))
 def get_devices(request):
     paginator = PageNumberPagination()
     paginator.page_size = 20
@@ -83,8 +88,8 @@ def get_devices(request):
 )
 @swagger_auto_schema(
     method='delete',
-    responses={200: 'Device deleted successfully', 404: 'Device not found'},
-    operation_description="Delete a specific device. Requires authentication."
+    responses={202: 'Deletion started; poll jobs/<job_id>/ for progress', 404: 'Device not found'},
+    operation_description="Delete a specific device and its history in a background job. Requires authentication."
 )
 @api_view(['GET', 'PUT', 'DELETE'])
 @permission_classes([IsAuthenticated])
@@ -105,8 +110,12 @@ def device_detail(request, pk):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     elif request.method == 'DELETE':
-        device.delete()
-        return Response({'message': 'Device deleted successfully'})
+        job = enqueue_delete_device(device, requested_by=request.user)
+        return Response({
+            'message': 'Device deletion started',
+            'job_id': job.id,
+            'status': job.status,
+        }, status=status.HTTP_202_ACCEPTED)
 
 
 # ✅ Register Device (Open for ESP32 or IoT device registration) - No changes needed
@@ -172,25 +181,27 @@ def register_device_via_wifi(request):
         return Response({"error": "device_id is required"}, status=status.HTTP_400_BAD_REQUEST)
     
     # Normalize device_id (remove colons if MAC address)
-    device_id = device_id.upper().replace(':', '').replace('-', '')
+    device_id = normalize_device_id(device_id)
     
     # Check for existing device
     try:
-        existing_device = Device.objects.get(device_id=device_id)
+        existing_device = device_registry.get_by_device_id(device_id)
         
         # If metadata field exists, update it
         if hasattr(Device, 'metadata'):
             metadata = existing_device.metadata or {}
-            metadata.update({
+            patch = {
                 'model': request.data.get('model', metadata.get('model', 'ESP32')),
                 'firmware_version': request.data.get('firmware_version', metadata.get('firmware_version', '1.0.0')),
                 'ip_address': request.data.get('ip_address', metadata.get('ip_address')),
                 'mac_address': request.data.get('mac_address', metadata.get('mac_address')),
                 'signal_strength': request.data.get('signal_strength', metadata.get('signal_strength')),
                 'last_connection': timezone.now().isoformat()
-            })
+            }
+            merge_device_metadata(existing_device.pk, patch)
+            device_registry.invalidate(existing_device.pk)
+            metadata.update(patch)
             existing_device.metadata = metadata
-            existing_device.save()
         
         logger.info(f"Device {device_id} attempted to re-register. Returning existing device.")
         
@@ -289,11 +300,11 @@ def check_device_status(request):
             status=status.HTTP_400_BAD_REQUEST
         )
     
-        # Normalize device_id
-    device_id = device_id.upper().replace(':', '').replace('-', '')
+    # Normalize device_id
+    device_id = normalize_device_id(device_id)
     
     try:
-        device = Device.objects.get(device_id=device_id)
+        device = device_registry.get_by_device_id(device_id)
         serializer = DeviceSerializer(device)
         return Response({
             "exists": True,
@@ -336,23 +347,24 @@ def update_device_status(request):
         return Response({"error": "device_id is required"}, status=status.HTTP_400_BAD_REQUEST)
     
     # Normalize device_id
-    device_id = device_id.upper().replace(':', '').replace('-', '')
+    device_id = normalize_device_id(device_id)
     
     try:
-        device = Device.objects.get(device_id=device_id)
+        device = device_registry.get_by_device_id(device_id)
         
-        # Update metadata if field exists
+        # Update metadata if field exists. Merged in the database so a cached
+        # Device never writes back stale columns; the cached copy is left as is
+        # (heartbeat fields may lag there by up to the registry TTL).
         if hasattr(Device, 'metadata'):
-            metadata = device.metadata or {}
-            metadata.update({
+            patch = {
                 'last_heartbeat': timezone.now().isoformat(),
-                'ip_address': request.data.get('ip_address', metadata.get('ip_address')),
-                'signal_strength': request.data.get('signal_strength', metadata.get('signal_strength')),
                 'uptime': request.data.get('uptime'),
                 'free_heap': request.data.get('free_heap'),
-            })
-            device.metadata = metadata
-            device.save()
+            }
+            for key in ('ip_address', 'signal_strength'):
+                if key in request.data:
+                    patch[key] = request.data.get(key)
+            merge_device_metadata(device.pk, patch)
         
         logger.info(f"Device {device_id} status updated")
         
@@ -0,0 +1,23 @@
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework import status
+from drf_yasg.utils import swagger_auto_schema
+
+from device.models import BackgroundJob
+from device.serializers import BackgroundJobSerializer
+
+
+@swagger_auto_schema(
+    method='get',
+    responses={200: BackgroundJobSerializer, 404: 'Job not found'},
+    operation_description="Status and progress (rows deleted per step) of a background job, e.g. a clear-all or device deletion."
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def background_job_status(request, pk):
+    try:
+        job = BackgroundJob.objects.get(pk=pk)
+    except BackgroundJob.DoesNotExist:
+        return Response({'error': 'Job not found'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(BackgroundJobSerializer(job).data)
@@ -6,9 +6,16 @@ from rest_framework import status
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 
+from device.conditional import conditional_get
 from device.models import Notification, ExpoPushToken, Device
-from device.serializers import NotificationSerializer
+from device.pagination import NotificationPagination
+from device.serializers import NotificationSerializer, NotificationSlimSerializer
+from device.services.notification_counters import delete_notifications, mark_read, unread_counts
+from device.services.jobs import enqueue_clear_notifications
+from device.services.versions import resource_versions
 
 # @swagger_auto_schema(
 #     method='get',
@@ -160,17 +167,62 @@ from device.serializers import NotificationSerializer
 #     return Response({'message': 'Push token registered successfully'})
 
 
+NOTIFICATION_TYPES = [choice for choice, _ in Notification.NOTIFICATION_TYPE_CHOICES]
+
+
 @swagger_auto_schema(
     method='get',
-    responses={200: NotificationSerializer(many=True)},
-    operation_description="Fetch all notifications for all devices"
+    manual_parameters=[
+        openapi.Parameter('cursor', openapi.IN_QUERY, description="Cursor from the previous page's 'next' link", type=openapi.TYPE_STRING),
+        openapi.Parameter('page_size', openapi.IN_QUERY, description="Notifications per page (default 50, max 200)", type=openapi.TYPE_INTEGER),
+        openapi.Parameter('type', openapi.IN_QUERY, description=f"Comma-separated notification types ({', '.join(NOTIFICATION_TYPES)})", type=openapi.TYPE_STRING),
+        openapi.Parameter('is_read', openapi.IN_QUERY, description="Only read (true) or unread (false) notifications", type=openapi.TYPE_BOOLEAN),
+        openapi.Parameter('device', openapi.IN_QUERY, description="Only notifications of this device ID", type=openapi.TYPE_INTEGER),
+        openapi.Parameter('slim', openapi.IN_QUERY, description="Embed only the device id, name, room and floor", type=openapi.TYPE_BOOLEAN),
+    ],
+    responses={200: openapi.Response('Page of notifications', schema=openapi.Schema(
+        type=openapi.TYPE_OBJECT,
+        properties={
+            'next': openapi.Schema(type=openapi.TYPE_STRING, format=openapi.FORMAT_URI, x_nullable=True),
+            'results': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_OBJECT)),
+        }
+    ))},
+    operation_description="Fetch notifications for all devices, newest first, one page at a time (follow 'next')"
 )
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@conditional_get(lambda request: resource_versions('notifications', 'devices'))
 def get_notifications(request):
-    notifications = Notification.objects.all().order_by('-created_at')
-    serializer = NotificationSerializer(notifications, many=True)
-    return Response(serializer.data)
+    slim = request.GET.get('slim', '').lower() in ('1', 'true', 'yes')
+    if slim:
+        notifications = Notification.objects.select_related('device')
+    else:
+        notifications = Notification.objects.select_related('device__added_by')
+
+    types = [value for value in request.GET.get('type', '').split(',') if value]
+    if types:
+        unknown = sorted(set(types) - set(NOTIFICATION_TYPES))
+        if unknown:
+            return Response({'error': f"Unknown type: {', '.join(unknown)}"}, status=status.HTTP_400_BAD_REQUEST)
+        notifications = notifications.filter(notification_type__in=types)
+
+    is_read = request.GET.get('is_read')
+    if is_read is not None:
+        if is_read.lower() not in ('true', 'false', '1', '0'):
+            return Response({'error': 'is_read must be true or false'}, status=status.HTTP_400_BAD_REQUEST)
+        notifications = notifications.filter(is_read=is_read.lower() in ('true', '1'))
+
+    device = request.GET.get('device')
+    if device:
+        try:
+            notifications = notifications.filter(device_id=int(device))
+        except ValueError:
+            return Response({'error': 'device must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+    paginator = NotificationPagination()
+    page = paginator.paginate_queryset(notifications, request)
+    serializer_class = NotificationSlimSerializer if slim else NotificationSerializer
+    return paginator.get_paginated_response(serializer_class(page, many=True).data)
 
 
 @swagger_auto_schema(
@@ -181,15 +233,12 @@ def get_notifications(request):
 @api_view(['DELETE'])
 @permission_classes([IsAuthenticated])
 def delete_notification(request, pk):
-    try:
-        notification = Notification.objects.get(pk=pk)
-        notification.delete()
+    if delete_notifications(Notification.objects.filter(pk=pk)):
         return Response(status=status.HTTP_204_NO_CONTENT)
-    except Notification.DoesNotExist:
-        return Response(
-            {'error': 'Notification not found'},
-            status=status.HTTP_404_NOT_FOUND
-        )
+    return Response(
+        {'error': 'Notification not found'},
+        status=status.HTTP_404_NOT_FOUND
+    )
 
 
 @swagger_auto_schema(
@@ -201,9 +250,8 @@ def delete_notification(request, pk):
 @permission_classes([IsAuthenticated])
 def mark_notification_as_read(request, pk):
     try:
-        notification = Notification.objects.get(pk=pk)
-        notification.is_read = True
-        notification.save()
+        mark_read(Notification.objects.filter(pk=pk))
+        notification = Notification.objects.select_related('device__added_by').get(pk=pk)
         serializer = NotificationSerializer(notification)
         return Response(serializer.data)
     except Notification.DoesNotExist:
@@ -215,33 +263,134 @@ def mark_notification_as_read(request, pk):
 
 @swagger_auto_schema(
     method='post',
-    responses={200: 'All notifications cleared'},
-    operation_description="Clear all notifications (admin and users allowed)"
+    responses={202: 'Clearing started; poll jobs/<job_id>/ for progress'},
+    operation_description="Clear all notifications (admin and users allowed). The notifications existing now are deleted by a background job."
 )
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def clear_all_notifications(request):
-    deleted_count = Notification.objects.all().delete()[0]
+    job = enqueue_clear_notifications(requested_by=request.user)
     return Response({
-        'message': f'{deleted_count} notifications cleared successfully'
-    })
+        'message': 'Clearing notifications in the background',
+        'job_id': job.id,
+        'status': job.status,
+    }, status=status.HTTP_202_ACCEPTED)
+
+
+# Upper bound on ids accepted by one bulk request
+MAX_BULK_IDS = 1000
+
+bulk_selection_schema = openapi.Schema(
+    type=openapi.TYPE_OBJECT,
+    description="Either 'ids', or at least one of the filters",
+    properties={
+        'ids': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_INTEGER),
+                              description=f"Notification IDs (max {MAX_BULK_IDS})"),
+        'device': openapi.Schema(type=openapi.TYPE_INTEGER, description="Only notifications of this device ID"),
+        'type': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_STRING),
+                               description="Only these notification types"),
+        'before': openapi.Schema(type=openapi.TYPE_STRING, format=openapi.FORMAT_DATETIME,
+                                 description="Only notifications created before this ISO date/time"),
+        'is_read': openapi.Schema(type=openapi.TYPE_BOOLEAN, description="Only read (true) or unread (false) notifications"),
+    }
+)
+
+
+def _bulk_selection(data):
+    """(Notification queryset, None) for a bulk request body, or (None, error message)"""
+    notifications = Notification.objects.all()
+    ids = data.get('ids')
+    if ids is not None:
+        if not isinstance(ids, list) or not all(isinstance(pk, int) for pk in ids):
+            return None, "ids must be a list of integers"
+        if len(ids) > MAX_BULK_IDS:
+            return None, f"At most {MAX_BULK_IDS} ids per request"
+        notifications = notifications.filter(pk__in=ids)
+
+    filters = {}
+    if data.get('device') is not None:
+        try:
+            filters['device_id'] = int(data['device'])
+        except (TypeError, ValueError):
+            return None, "device must be an integer"
+    if data.get('type'):
+        types = data['type'] if isinstance(data['type'], list) else [data['type']]
+        unknown = sorted(set(types) - set(NOTIFICATION_TYPES))
+        if unknown:
+            return None, f"Unknown type: {', '.join(map(str, unknown))}"
+        filters['notification_type__in'] = types
+    if data.get('before'):
+        before = parse_datetime(str(data['before']))
+        if before is None:
+            return None, "before must be an ISO date/time"
+        if timezone.is_naive(before):
+            before = timezone.make_aware(before)
+        filters['created_at__lt'] = before
+    if data.get('is_read') is not None:
+        if not isinstance(data['is_read'], bool):
+            return None, "is_read must be true or false"
+        filters['is_read'] = data['is_read']
+
+    if ids is None and not filters:
+        # Everything is what clear-all is for; an empty body here is almost certainly a mistake
+        return None, "Provide ids or at least one filter (device, type, before, is_read)"
+    return notifications.filter(**filters), None
+
+
+@swagger_auto_schema(
+    method='post',
+    request_body=bulk_selection_schema,
+    responses={200: openapi.Response('Number of notifications marked read'), 400: 'Invalid selection'},
+    operation_description="Mark many notifications read with one UPDATE, by ids or by filter"
+)
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def bulk_mark_notifications_read(request):
+    notifications, error = _bulk_selection(request.data)
+    if error:
+        return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({'updated': mark_read(notifications)})
+
+
+@swagger_auto_schema(
+    method='post',
+    request_body=bulk_selection_schema,
+    responses={200: openapi.Response('Number of notifications deleted'), 400: 'Invalid selection'},
+    operation_description="Delete many notifications at once, by ids or by filter"
+)
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def bulk_delete_notifications(request):
+    notifications, error = _bulk_selection(request.data)
+    if error:
+        return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({'deleted': delete_notifications(notifications)})
 
 
 @swagger_auto_schema(
     method='get',
+    manual_parameters=[
+        openapi.Parameter('device', openapi.IN_QUERY, description="Only count notifications of this device ID", type=openapi.TYPE_INTEGER),
+    ],
     responses={200: openapi.Response('Unread count', schema=openapi.Schema(
         type=openapi.TYPE_OBJECT,
         properties={
-            'count': openapi.Schema(type=openapi.TYPE_INTEGER)
+            'count': openapi.Schema(type=openapi.TYPE_INTEGER),
+            'by_type': openapi.Schema(type=openapi.TYPE_OBJECT, additional_properties=openapi.Schema(type=openapi.TYPE_INTEGER)),
         }
     ))},
-    operation_description="Get unread notification count"
+    operation_description="Get unread notification count, with a per-type breakdown for badges"
 )
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@conditional_get(lambda request: resource_versions('notifications'))
 def get_unread_count(request):
-    count = Notification.objects.filter(is_read=False).count()
-    return Response({'count': count})
+    device = request.GET.get('device')
+    try:
+        device_id = int(device) if device else None
+    except ValueError:
+        return Response({'error': 'device must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(unread_counts(device_id))
 
 
 @swagger_auto_schema(